@@ -0,0 +1,295 @@
+"""
+Measure throughput and p50/p99 latency of the create, capture and webhook flows of PaypalWrapper against a local PayPal stand-in
+(mock_paypal.py) at different concurrencies. The results are saved as JSON; pass the file of an earlier run to --compare to see
+the change per flow and concurrency.
+
+    python benchmarks/bench_flows.py [--flows create capture webhook] [--concurrency 1 4 16] [--requests 200]
+        [--latency 0.05] [--jitter 0.02] [--error-rate 0.0] [--output results.json] [--compare previous.json]
+
+Orders, API records and webhook events are written to a temporary SQLite database. The webhook flow posts CHECKOUT.ORDER.APPROVED
+events to PaypalWebhookView, which verifies them through the API and captures the order.
+"""
+
+# the benchmarks report on stdout
+# ruff: noqa: T201
+
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django
+from django.conf import settings
+
+from mock_paypal import MockPaypalServer
+
+WEBHOOK_URL = 'http://testserver/paypal/webhooks/'
+
+
+def setup_django(api_url, database):
+    settings.configure(
+        DEBUG=False,
+        SECRET_KEY='benchmark',
+        ALLOWED_HOSTS=['testserver'],
+        INSTALLED_APPS=[
+            'django.contrib.contenttypes',
+            'django.contrib.auth',
+            'django_paypal',
+        ],
+        DATABASES={
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': database,
+                'OPTIONS': {'timeout': 60},
+            }
+        },
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        DEFAULT_AUTO_FIELD='django.db.models.AutoField',
+        USE_TZ=True,
+        PAYPAL=True,
+        PAYPAL_ROOT_URL='http://testserver',
+        PAYPAL_SANDBOX=True,
+        PAYPAL_SANDBOX_API_URL=api_url,
+        PAYPAL_API_CLIENT_ID='benchmark-client',
+        PAYPAL_API_SECRET='benchmark-secret',
+        PAYPAL_WEBHOOK_LOCAL_VERIFICATION=False,  # the mock signs nothing, verify through the API
+    )
+    django.setup()
+    from django.core.management import call_command
+
+    call_command('migrate', verbosity=0)
+
+
+def percentile(sorted_values, percent):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)]
+
+
+def create_orders(count):
+    from django_paypal.models import PaypalOrder
+
+    order_ids = [uuid.uuid4().hex[:17].upper() for _ in range(count)]
+    PaypalOrder.objects.bulk_create([PaypalOrder(order_id=order_id, status='APPROVED') for order_id in order_ids])
+    return order_ids
+
+
+def build_create_flow(paypal_wrapper, count):
+    from django_paypal.api_types import (
+        PaymentSource,
+        PayPalWallet,
+        PurchaseUnit,
+        PurchaseUnitAmount,
+    )
+
+    purchase_unit = PurchaseUnit(amount=PurchaseUnitAmount(currency_code='EUR', value='10.00'))
+
+    def create(index):
+        paypal_wrapper.create_order('CAPTURE', [purchase_unit], PaymentSource(paypal=PayPalWallet()))
+
+    return create
+
+
+def build_capture_flow(paypal_wrapper, count):
+    order_ids = create_orders(count)
+
+    def capture(index):
+        paypal_wrapper.capture_order(order_ids[index])
+
+    return capture
+
+
+def build_webhook_flow(paypal_wrapper, count):
+    from django.test import RequestFactory
+
+    from django_paypal.models import PaypalWebhook
+    from django_paypal.webhooks import PaypalWebhookView
+
+    if not PaypalWebhook.objects.filter(url=WEBHOOK_URL).exists():
+        PaypalWebhook.objects.create(
+            webhook_id='WH-BENCHMARK',
+            url=WEBHOOK_URL,
+            auth_hash=paypal_wrapper.api_auth_hash,
+            event_types=[],
+        )
+    order_ids = create_orders(count)
+    view = PaypalWebhookView.as_view()
+    request_factory = RequestFactory()
+
+    def webhook(index):
+        event_id = f'WH-{uuid.uuid4()}'
+        body = {
+            'id': event_id,
+            'event_type': 'CHECKOUT.ORDER.APPROVED',
+            'resource_type': 'checkout-order',
+            'resource': {'id': order_ids[index], 'status': 'APPROVED'},
+        }
+        request = request_factory.post(
+            '/paypal/webhooks/',
+            data=json.dumps(body),
+            content_type='application/json',
+            HTTP_PAYPAL_TRANSMISSION_ID=event_id,
+            HTTP_PAYPAL_TRANSMISSION_TIME='2024-01-01T10:00:00Z',
+            HTTP_PAYPAL_TRANSMISSION_SIG='signature',
+            HTTP_PAYPAL_AUTH_ALGO='SHA256withRSA',
+            HTTP_PAYPAL_CERT_URL='https://api.paypal.com/v1/notifications/certs/CERT-BENCHMARK',
+        )
+        response = view(request)
+        if response.status_code != 200:
+            raise RuntimeError(f'Webhook answered {response.status_code}')
+
+    return webhook
+
+
+FLOWS = {
+    'create': build_create_flow,
+    'capture': build_capture_flow,
+    'webhook': build_webhook_flow,
+}
+
+
+def run_flow(operation, requests, concurrency):
+    def measure(index):
+        start = time.perf_counter()
+        try:
+            operation(index)
+            error = None
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+        return time.perf_counter() - start, error
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(measure, range(requests)))
+    seconds = time.perf_counter() - start
+
+    latencies = sorted(duration for duration, error in results if error is None)
+    errors = [error for _duration, error in results if error is not None]
+    return {
+        'requests': requests,
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'seconds': round(seconds, 4),
+        'throughput': round(len(latencies) / seconds, 2),
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+            'p50': round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+            'p99': round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+            'max': round(latencies[-1] * 1000, 2) if latencies else None,
+        },
+    }
+
+
+def print_result(result, previous=None):
+    latency = result['latency_ms']
+    line = (
+        f'{result["flow"]:<8} {result["concurrency"]:>5} {result["requests"]:>8} {result["errors"]:>6} '
+        f'{result["throughput"]:>10.1f}/s {latency["p50"] or 0:>9.1f} ms {latency["p99"] or 0:>9.1f} ms'
+    )
+    if previous:
+        throughput_change = result['throughput'] / previous['throughput'] - 1 if previous['throughput'] else 0
+        p99_change = latency['p99'] / previous['latency_ms']['p99'] - 1 if previous['latency_ms']['p99'] and latency['p99'] else 0
+        line += f'   throughput {throughput_change:+.1%}, p99 {p99_change:+.1%}'
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--flows', nargs='+', choices=list(FLOWS), default=list(FLOWS))
+    parser.add_argument(
+        '--concurrency',
+        nargs='+',
+        type=int,
+        default=[1, 4, 16],
+        help='Threads calling the wrapper.',
+    )
+    parser.add_argument('--requests', type=int, default=200, help='Flows per measurement.')
+    parser.add_argument(
+        '--warmup',
+        type=int,
+        default=10,
+        help='Flows before each measurement, e.g. to fetch the token.',
+    )
+    parser.add_argument(
+        '--latency',
+        type=float,
+        default=0.05,
+        help='Seconds the mock takes per request.',
+    )
+    parser.add_argument('--jitter', type=float, default=0.02, help='Random extra seconds per request.')
+    parser.add_argument(
+        '--error-rate',
+        type=float,
+        default=0.0,
+        help='Fraction of API requests answered with 503.',
+    )
+    parser.add_argument('--output', help='JSON file for the results, default bench-flows-<time>.json')
+    parser.add_argument('--compare', help='JSON file of an earlier run to compare with.')
+    args = parser.parse_args()
+
+    server = MockPaypalServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate).start()
+    database_dir = tempfile.mkdtemp(prefix='django-paypal-bench-')
+    setup_django(server.url, os.path.join(database_dir, 'db.sqlite3'))
+
+    from django_paypal import __version__
+    from django_paypal.webhooks import get_default_credentials
+    from django_paypal.wrappers import PaypalWrapper
+
+    # the webhook view uses the shared wrapper of the default credentials, use the same one everywhere
+    paypal_wrapper = PaypalWrapper.for_credentials(get_default_credentials())
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as f:
+            previous = {(result['flow'], result['concurrency']): result for result in json.load(f)['results']}
+
+    print(f'{"flow":<8} {"conc.":>5} {"requests":>8} {"errors":>6} {"throughput":>12} {"p50":>12} {"p99":>12}')
+    results = []
+    for flow in args.flows:
+        for concurrency in args.concurrency:
+            run_flow(FLOWS[flow](paypal_wrapper, args.warmup), args.warmup, concurrency)
+            result = {
+                'flow': flow,
+                'concurrency': concurrency,
+                **run_flow(
+                    FLOWS[flow](paypal_wrapper, args.requests),
+                    args.requests,
+                    concurrency,
+                ),
+            }
+            results.append(result)
+            print_result(result, previous.get((flow, concurrency)))
+
+    output = args.output or f'bench-flows-{datetime.now().strftime("%Y%m%d-%H%M%S")}.json'
+    with open(output, 'w') as f:
+        json.dump(
+            {
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'django_paypal': __version__,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'config': vars(args),
+                'mock_requests': dict(server.requests),
+                'results': results,
+            },
+            f,
+            indent=2,
+        )
+    print(f'\nResults saved to {output}')
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Compare the memory used by the slotted api_types dataclasses with regular (`__dict__`) dataclasses of the same fields, for
+decoded OrderCaptureAPIResponse trees (see bench_serialization.build_order).
+
+    python benchmarks/bench_memory.py [--units 5] [--captures 2] [--orders 1000]
+"""
+
+# the benchmarks report on stdout
+# ruff: noqa: T201
+
+import argparse
+import dataclasses
+import gc
+import tracemalloc
+from collections import Counter
+from typing import List, Union, get_args, get_origin, get_type_hints
+
+from bench_serialization import build_order
+from dataclass_wizard import JSONWizard, fromdict
+
+from django_paypal.api_types import Amount, Capture, Link, OrderCaptureAPIResponse
+
+
+def unslotted(cls, twins):
+    """
+    Return a regular dataclass with the fields of the api_types dataclass `cls`, nested dataclasses included.
+    """
+    if cls in twins:
+        return twins[cls]
+    twins[cls] = None  # api_types has no recursive types
+    hints = get_type_hints(cls)
+    fields = []
+    for field in dataclasses.fields(cls):
+        spec = dataclasses.field(default=field.default, default_factory=field.default_factory)
+        fields.append((field.name, unslotted_type(hints[field.name], twins), spec))
+    bases = (JSONWizard,) if issubclass(cls, JSONWizard) else ()
+    namespace = {'__module__': __name__}
+    if issubclass(cls, JSONWizard):
+
+        class Meta(JSONWizard.Meta):
+            key_transform_with_dump = 'SNAKE'
+
+        namespace['_'] = Meta
+    twin = dataclasses.make_dataclass(cls.__name__, fields, bases=bases, namespace=namespace)
+    twins[cls] = twin
+    return twin
+
+
+def unslotted_type(tp, twins):
+    if dataclasses.is_dataclass(tp):
+        return unslotted(tp, twins)
+    if get_origin(tp) is Union:
+        return Union[tuple(unslotted_type(arg, twins) for arg in get_args(tp))]
+    if get_origin(tp) is list and get_args(tp):
+        return List[unslotted_type(get_args(tp)[0], twins)]
+    return tp
+
+
+def count_objects(obj, counter):
+    if dataclasses.is_dataclass(obj):
+        counter[type(obj).__name__] += 1
+        for field in dataclasses.fields(obj):
+            count_objects(getattr(obj, field.name), counter)
+    elif isinstance(obj, list):
+        for item in obj:
+            count_objects(item, counter)
+    return counter
+
+
+def measure(build, number):
+    """
+    Return the bytes allocated per object and the objects built by `build()`, kept alive `number` times.
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    objects = [build() for _ in range(number)]
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return size / number, objects
+
+
+def report(label, data, cls, twin, number):
+    slotted_size, slotted_objects = measure(lambda: fromdict(cls, data), number)
+    regular_size, regular_objects = measure(lambda: fromdict(twin, data), number)
+    assert dataclasses.asdict(slotted_objects[0]) == dataclasses.asdict(regular_objects[0])
+    dataclass_count = sum(count_objects(slotted_objects[0], Counter()).values())
+    print(
+        f'{label:<28} {dataclass_count:>8} {regular_size:>10.0f} B {slotted_size:>10.0f} B '
+        f'{(regular_size - slotted_size) / dataclass_count:>10.1f} B {1 - slotted_size / regular_size:>8.1%}'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--units', type=int, default=5, help='Purchase units per order.')
+    parser.add_argument('--captures', type=int, default=2, help='Captures per purchase unit.')
+    parser.add_argument('--orders', type=int, default=1000, help='Trees kept alive per measurement.')
+    args = parser.parse_args()
+
+    order_data = build_order(args.units, args.captures)
+    twins = {}
+    objects = count_objects(fromdict(OrderCaptureAPIResponse, order_data), Counter())
+    print(
+        f'order tree: {sum(objects.values())} dataclass instances ' + ', '.join(f'{count} {name}' for name, count in objects.most_common())
+    )
+    print(f'\n{"":<28} {"objects":>8} {"__dict__":>12} {"__slots__":>12} {"per object":>12} {"saved":>8}')
+    report(
+        'OrderCaptureAPIResponse',
+        order_data,
+        OrderCaptureAPIResponse,
+        unslotted(OrderCaptureAPIResponse, twins),
+        args.orders,
+    )
+    capture_data = order_data['purchase_units'][0]['payments']['captures'][0]
+    report('Capture', capture_data, Capture, unslotted(Capture, twins), args.orders * 10)
+    report(
+        'Link',
+        capture_data['links'][0],
+        Link,
+        unslotted(Link, twins),
+        args.orders * 10,
+    )
+    report(
+        'Amount',
+        capture_data['amount'],
+        Amount,
+        unslotted(Amount, twins),
+        args.orders * 10,
+    )
+
+
+if __name__ == '__main__':
+    main()
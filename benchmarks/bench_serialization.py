@@ -0,0 +1,202 @@
+"""
+Compare the generated api_types encoders of django_paypal.serialization with dataclass_wizard, full with lazy decoding
+(django_paypal.lazy) and json with orjson.
+
+    python benchmarks/bench_serialization.py [--units 5] [--captures 2] [--number 2000]
+"""
+
+# the benchmarks report on stdout
+# ruff: noqa: T201
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django
+from django.conf import settings
+
+settings.configure()
+django.setup()
+
+from dataclass_wizard import fromdict  # noqa: E402
+
+from django_paypal import serialization  # noqa: E402
+from django_paypal.api_types import (  # noqa: E402
+    Amount,
+    OrderCaptureAPIResponse,
+    PurchaseItem,
+    PurchaseUnit,
+    PurchaseUnitAmount,
+)
+from django_paypal.lazy import LazyView  # noqa: E402
+
+
+def amount(value='10.00'):
+    return {'currency_code': 'EUR', 'value': value}
+
+
+def build_capture(index):
+    return {
+        'id': f'CAPTURE-{index}',
+        'status': 'COMPLETED',
+        'amount': amount(),
+        'final_capture': True,
+        'seller_protection': {
+            'status': 'ELIGIBLE',
+            'dispute_categories': ['ITEM_NOT_RECEIVED', 'UNAUTHORIZED_TRANSACTION'],
+        },
+        'seller_receivable_breakdown': {
+            'gross_amount': amount(),
+            'paypal_fee': amount('0.69'),
+            'net_amount': amount('9.31'),
+        },
+        'links': [
+            {
+                'href': f'https://api.paypal.com/v2/payments/captures/{index}',
+                'rel': rel,
+                'method': 'GET',
+            }
+            for rel in ('self', 'up')
+        ],
+        'create_time': '2024-01-01T10:00:00Z',
+        'update_time': '2024-01-01T10:00:00Z',
+    }
+
+
+def build_order(units, captures):
+    purchase_unit = {
+        'reference_id': 'default',
+        'amount': {
+            **amount(),
+            'breakdown': {'item_total': amount(), 'shipping': amount('0.00')},
+        },
+        'items': [
+            {
+                'name': 'Item',
+                'quantity': '1',
+                'unit_amount': amount(),
+                'sku': 'SKU',
+                'category': 'PHYSICAL_GOODS',
+            }
+        ]
+        * 3,
+        'shipping': {
+            'name': {'full_name': 'John Doe'},
+            'address': {
+                'country_code': 'DE',
+                'address_line_1': 'Street 1',
+                'postal_code': '12345',
+            },
+        },
+        'payments': {'captures': [build_capture(index) for index in range(captures)]},
+    }
+    return {
+        'id': 'ORDER-1',
+        'status': 'COMPLETED',
+        'intent': 'CAPTURE',
+        'links': [
+            {
+                'href': 'https://api.paypal.com/v2/checkout/orders/ORDER-1',
+                'rel': 'self',
+                'method': 'GET',
+            }
+        ],
+        'payer': {
+            'payer_id': 'PAYER',
+            'name': {'given_name': 'John', 'surname': 'Doe'},
+            'email_address': 'john@example.com',
+        },
+        'payment_source': {
+            'paypal': {
+                'email_address': 'john@example.com',
+                'account_id': 'ACCOUNT',
+                'name': {'given_name': 'John'},
+            }
+        },
+        'purchase_units': [purchase_unit] * units,
+    }
+
+
+def bench(label, baseline, candidate, number):
+    # the best of a few repeats is the least disturbed by other processes
+    baseline_time = min(timeit.repeat(baseline, number=number, repeat=5)) / number * 1e6
+    candidate_time = min(timeit.repeat(candidate, number=number, repeat=5)) / number * 1e6
+    print(f'{label:<36} {baseline_time:>10.1f} µs {candidate_time:>10.1f} µs {baseline_time / candidate_time:>7.1f}x')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--units', type=int, default=5, help='Purchase units per order.')
+    parser.add_argument('--captures', type=int, default=2, help='Captures per purchase unit.')
+    parser.add_argument('--number', type=int, default=2000, help='Iterations per measurement.')
+    args = parser.parse_args()
+
+    order_data = build_order(args.units, args.captures)
+    purchase_unit = PurchaseUnit(
+        amount=PurchaseUnitAmount(currency_code='EUR', value='10.00'),
+        items=[
+            PurchaseItem(
+                name='Item',
+                quantity=1,
+                unit_amount=Amount(currency_code='EUR', value='10.00'),
+            )
+        ]
+        * 3,
+    )
+    order = OrderCaptureAPIResponse.from_dict(order_data)
+
+    # the generated code must produce exactly what dataclass_wizard does
+    assert serialization.to_dict(purchase_unit) == purchase_unit.to_dict()
+    assert serialization.to_dict(order) == order.to_dict()
+
+    print(f'{"":<36} {"dataclass_wizard":>13} {"generated":>13} {"speedup":>8}')
+    bench(
+        'PurchaseUnit.to_dict',
+        purchase_unit.to_dict,
+        lambda: serialization.to_dict(purchase_unit),
+        args.number,
+    )
+    bench(
+        'OrderCaptureAPIResponse.to_dict',
+        order.to_dict,
+        lambda: serialization.to_dict(order),
+        args.number,
+    )
+
+    def read_status_and_capture_ids(response):
+        return response.status, [capture.id for unit in response.purchase_units for capture in unit.payments.captures]
+
+    assert read_status_and_capture_ids(LazyView(OrderCaptureAPIResponse, order_data)) == read_status_and_capture_ids(order)
+    print(f'\n{"":<36} {"full":>13} {"lazy":>13} {"speedup":>8}')
+    bench(
+        'status and capture ids',
+        lambda: read_status_and_capture_ids(fromdict(OrderCaptureAPIResponse, order_data)),
+        lambda: read_status_and_capture_ids(LazyView(OrderCaptureAPIResponse, order_data)),
+        args.number,
+    )
+
+    if serialization.orjson is None:
+        print('orjson is not installed, skipping the JSON comparison')
+        return
+    body = json.dumps(order_data).encode('utf-8')
+    print(f'\n{"":<36} {"json":>13} {"orjson":>13} {"speedup":>8}')
+    bench(
+        'loads',
+        lambda: json.loads(body),
+        lambda: serialization.orjson.loads(body),
+        args.number,
+    )
+    bench(
+        'dumps',
+        lambda: json.dumps(order_data).encode('utf-8'),
+        lambda: serialization.orjson.dumps(order_data),
+        args.number,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""
+A local stand-in for the PayPal REST API, for benchmarks. It answers the OAuth token, create order, capture, order details and
+verify-webhook-signature endpoints with canned responses, after a configurable latency and with a configurable rate of errors.
+
+    python benchmarks/mock_paypal.py [--port 8765] [--latency 0.05] [--jitter 0.02] [--error-rate 0.01]
+"""
+
+# the benchmarks report on stdout
+# ruff: noqa: T201
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ORDERS_PATH = '/v2/checkout/orders'
+
+
+def amount(value='10.00'):
+    return {'currency_code': 'EUR', 'value': value}
+
+
+def build_created_order(order_id):
+    return {
+        'id': order_id,
+        'status': 'PAYER_ACTION_REQUIRED',
+        'payment_source': {'paypal': {}},
+        'links': [
+            {
+                'href': f'https://api-m.sandbox.paypal.com{ORDERS_PATH}/{order_id}',
+                'rel': 'self',
+                'method': 'GET',
+            },
+            {
+                'href': f'https://www.sandbox.paypal.com/checkoutnow?token={order_id}',
+                'rel': 'payer-action',
+                'method': 'GET',
+            },
+        ],
+    }
+
+
+def build_captured_order(order_id):
+    return {
+        'id': order_id,
+        'status': 'COMPLETED',
+        'intent': 'CAPTURE',
+        'payer': {'payer_id': 'PAYER', 'email_address': 'buyer@example.com'},
+        'purchase_units': [
+            {
+                'reference_id': 'default',
+                'amount': amount(),
+                'payments': {
+                    'captures': [
+                        {
+                            'id': f'CAPTURE-{order_id}',
+                            'status': 'COMPLETED',
+                            'amount': amount(),
+                            'final_capture': True,
+                            'seller_protection': {'status': 'ELIGIBLE'},
+                            'seller_receivable_breakdown': {
+                                'gross_amount': amount(),
+                                'paypal_fee': amount('0.69'),
+                                'net_amount': amount('9.31'),
+                            },
+                            'create_time': '2024-01-01T10:00:00Z',
+                            'update_time': '2024-01-01T10:00:00Z',
+                        }
+                    ]
+                },
+            }
+        ],
+    }
+
+
+class MockPaypalHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+    server: 'MockPaypalServer'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def get_endpoint(self, method, path):
+        if method == 'POST' and path == '/v1/oauth2/token':
+            return 'token'
+        if method == 'POST' and path == ORDERS_PATH:
+            return 'create'
+        if method == 'POST' and path.startswith(f'{ORDERS_PATH}/') and path.endswith('/capture'):
+            return 'capture'
+        if method == 'GET' and path.startswith(f'{ORDERS_PATH}/'):
+            return 'details'
+        if method == 'POST' and path == '/v1/notifications/verify-webhook-signature':
+            return 'verify'
+        return 'unknown'
+
+    def handle_request(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        self.server.wait()
+        path = self.path.split('?')[0]
+        endpoint = self.get_endpoint(method, path)
+        self.server.count(endpoint)
+
+        if endpoint == 'token':
+            # never fails, token errors aren't retried and would end the benchmark
+            return self.send_json(
+                200,
+                {
+                    'scope': 'https://uri.paypal.com/services/payments/payment',
+                    'access_token': f'A21-{uuid.uuid4().hex}',
+                    'token_type': 'Bearer',
+                    'app_id': 'APP-BENCHMARK',
+                    'expires_in': 32400,
+                    'nonce': uuid.uuid4().hex,
+                },
+            )
+        if endpoint == 'unknown':
+            return self.send_json(404, {'name': 'RESOURCE_NOT_FOUND'})
+        if self.server.should_fail():
+            self.server.count('errors')
+            return self.send_json(
+                self.server.error_status,
+                {'name': 'SERVICE_UNAVAILABLE', 'message': 'Injected error'},
+            )
+        if endpoint == 'create':
+            return self.send_json(201, build_created_order(uuid.uuid4().hex[:17].upper()))
+        if endpoint == 'capture':
+            return self.send_json(201, build_captured_order(path.split('/')[-2]))
+        if endpoint == 'details':
+            return self.send_json(200, build_captured_order(path.split('/')[-1]))
+        return self.send_json(200, {'verification_status': 'SUCCESS'})
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+
+class MockPaypalServer(ThreadingHTTPServer):
+    """
+    Serves MockPaypalHandler on a background thread. Every request waits `latency` plus up to `jitter` seconds; a fraction
+    `error_rate` of the API requests (not the token requests) is answered with `error_status`.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host='127.0.0.1',
+        port=0,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        error_status=503,
+    ):
+        super().__init__((host, port), MockPaypalHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def wait(self):
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+    def should_fail(self):
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+    def count(self, key):
+        with self._lock:
+            self.requests[key] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='mock-paypal', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds per request.')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Random extra seconds per request.')
+    parser.add_argument(
+        '--error-rate',
+        type=float,
+        default=0.0,
+        help='Fraction of API requests that fail.',
+    )
+    parser.add_argument('--error-status', type=int, default=503)
+    args = parser.parse_args()
+
+    server = MockPaypalServer(
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+    )
+    print(f'Serving a mock PayPal API on {server.url}, set PAYPAL_SANDBOX_API_URL to it')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -1 +1,6 @@
+import django
+
 __version__ = '1.1.9'
+
+if django.VERSION < (3, 2):
+    default_app_config = 'django_paypal.apps.DjangoPaypalConfig'
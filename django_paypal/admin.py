@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import PaypalOrder, PaypalAPIResponse
+from .models import PaypalOrder, PaypalAPIResponse, PaypalCapture, PaypalWebhookDelivery
 
 
 class PaypalOrderAdmin(admin.ModelAdmin):
@@ -15,3 +15,21 @@ class PaypalAPIResponseAdmin(admin.ModelAdmin):
 
 
 admin.site.register(PaypalAPIResponse, PaypalAPIResponseAdmin)
+
+
+class PaypalCaptureAdmin(admin.ModelAdmin):
+    list_display = ('capture_id', 'order', 'status', 'amount', 'currency', 'create_time')
+    list_filter = ('status', 'currency')
+    search_fields = ('capture_id', 'order__order_id')
+    raw_id_fields = ('order',)
+
+
+admin.site.register(PaypalCapture, PaypalCaptureAdmin)
+
+
+class PaypalWebhookDeliveryAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'event_type', 'status', 'attempts', 'created_at', 'processed_at')
+    list_filter = ('status', 'event_type')
+
+
+admin.site.register(PaypalWebhookDelivery, PaypalWebhookDeliveryAdmin)
@@ -1,3 +1,4 @@
+import dataclasses
 from dataclasses import dataclass
 from typing import Optional, List, Literal, NamedTuple, Dict, Any
 from dataclass_wizard import JSONWizard
@@ -27,7 +28,34 @@ ProcessingInstruction = Literal['ORDER_COMPLETE_ON_PAYMENT_APPROVAL', 'NO_INSTRU
 PhoneType = Literal['FAX', 'HOME', 'MOBILE', 'OTHER', 'PAGER']
 
 
-@dataclass
+def slotted_dataclass(cls=None, **kwargs):
+    """
+    `dataclass` whose instances keep their fields in `__slots__` instead of a `__dict__`, like `dataclass(slots=True)` of
+    Python 3.10+. Fields of slotted base classes are not slotted again.
+    """
+
+    def wrap(cls):
+        cls = dataclass(cls, **kwargs)
+        inherited = set()
+        for base in cls.__mro__[1:-1]:
+            slots = base.__dict__.get('__slots__', ())
+            inherited.update((slots,) if isinstance(slots, str) else slots)
+        field_names = tuple(field.name for field in dataclasses.fields(cls) if field.name not in inherited)
+        cls_dict = dict(cls.__dict__)
+        cls_dict['__slots__'] = field_names
+        # the defaults stay in __init__ and the dataclass fields, a class attribute would conflict with the slot
+        for name in field_names:
+            cls_dict.pop(name, None)
+        cls_dict.pop('__dict__', None)
+        cls_dict.pop('__weakref__', None)
+        slotted_cls = type(cls)(cls.__name__, cls.__bases__, cls_dict)
+        slotted_cls.__qualname__ = cls.__qualname__
+        return slotted_cls
+
+    return wrap if cls is None else wrap(cls)
+
+
+@slotted_dataclass
 class OAuthResponse:
     scope: str
     access_token: str
@@ -37,26 +65,26 @@ class OAuthResponse:
     nonce: str
 
 
-@dataclass
+@slotted_dataclass
 class Link:
     href: str
     rel: str
     method: Optional[Literal['GET', 'POST', 'PATCH', 'DELETE']] = None
 
 
-@dataclass
+@slotted_dataclass
 class PhoneNumber:
     national_number: str
     extension_number: Optional[str] = None
 
 
-@dataclass
+@slotted_dataclass
 class PhoneWithType:
     phone_number: PhoneNumber
     phone_type: Optional[PhoneType] = None
 
 
-@dataclass
+@slotted_dataclass
 class Name:
     prefix: Optional[str] = None
     given_name: Optional[str] = None
@@ -72,7 +100,7 @@ class Name:
             raise ValueError('Surname must be 140 characters or fewer')
 
 
-@dataclass
+@slotted_dataclass
 class ExperienceContext:
     brand_name: Optional[str] = None
     shipping_preference: Optional[Literal['GET_FROM_FILE', 'NO_SHIPPING', 'SET_PROVIDED_ADDRESS']] = None
@@ -84,13 +112,13 @@ class ExperienceContext:
     cancel_url: Optional[str] = None
 
 
-@dataclass
+@slotted_dataclass
 class TaxInfo:
     tax_id: Optional[str] = None
     tax_id_type: Optional[Literal['BR_CPF', 'BR_CNPJ']] = None
 
 
-@dataclass
+@slotted_dataclass
 class AddressDetails:
     street_number: Optional[str] = None
     street_name: Optional[str] = None
@@ -100,7 +128,7 @@ class AddressDetails:
     sub_building: Optional[str] = None
 
 
-@dataclass
+@slotted_dataclass
 class Address:
     country_code: str
     address_line_1: Optional[str] = None
@@ -114,14 +142,14 @@ class Address:
     address_details: Optional[AddressDetails] = None
 
 
-@dataclass
+@slotted_dataclass
 class Customer:
     id: Optional[str] = None
     email_address: Optional[str] = None
     merchant_customer_id: Optional[str] = None
 
 
-@dataclass
+@slotted_dataclass
 class Vault:
     usage_type: str
     store_in_vault: Optional[str] = None
@@ -131,13 +159,13 @@ class Vault:
     permit_multiple_payment_tokens: Optional[bool] = None
 
 
-@dataclass
+@slotted_dataclass
 class PayPalWalletAttributes:
     customer: Optional[Customer] = None
     vault: Optional[Vault] = None
 
 
-@dataclass
+@slotted_dataclass
 class PayPalWallet:
     name: Optional[Name] = None
     phone: Optional[PhoneType] = None
@@ -151,7 +179,7 @@ class PayPalWallet:
     billing_agreement_id: Optional[str] = None
 
 
-@dataclass
+@slotted_dataclass
 class PayPalWalletResponse:
     email_address: Optional[str] = None
     account_id: Optional[str] = None
@@ -164,7 +192,7 @@ class PayPalWalletResponse:
     attributes: Optional[PayPalWalletAttributes] = None
 
 
-@dataclass
+@slotted_dataclass
 class PaymentSource(JSONWizard):
     class _(JSONWizard.Meta):
         key_transform_with_dump = 'SNAKE'
@@ -172,19 +200,19 @@ class PaymentSource(JSONWizard):
     paypal: PayPalWallet
 
 
-@dataclass
+@slotted_dataclass
 class Amount:
     currency_code: str
     value: str
 
 
-@dataclass
+@slotted_dataclass
 class Tax:
     currency_code: str
     value: str
 
 
-@dataclass
+@slotted_dataclass
 class PurchaseItem:
     name: str
     quantity: int
@@ -195,7 +223,7 @@ class PurchaseItem:
     category: Optional[ItemCategories] = None
 
 
-@dataclass
+@slotted_dataclass
 class Breakdown:
     item_total: Optional[Amount] = None
     shipping: Optional[Amount] = None
@@ -205,18 +233,18 @@ class Breakdown:
     discount: Optional[Amount] = None
 
 
-@dataclass
+@slotted_dataclass
 class PurchaseUnitAmount(Amount):
     breakdown: Optional[Breakdown] = None
 
 
-@dataclass
+@slotted_dataclass
 class Payee:
     email_address: Optional[str] = None
     merchant_id: Optional[str] = None
 
 
-@dataclass
+@slotted_dataclass
 class PlatformFees:
     amount: Optional[Amount]
     payee_pricing_tier_id: Optional[str] = None
@@ -224,12 +252,12 @@ class PlatformFees:
     disbursement_mode: Optional[Literal['INSTANT', 'DELAYED']] = None
 
 
-@dataclass
+@slotted_dataclass
 class PaymentInstruction:
     platform_fees: Optional[PlatformFees] = None
 
 
-@dataclass
+@slotted_dataclass
 class ShippingOption:
     id: str
     label: str
@@ -238,7 +266,7 @@ class ShippingOption:
     amount: Optional[Amount] = None
 
 
-@dataclass
+@slotted_dataclass
 class ShippingDetail:
     type: Optional[ShippingType] = None
     options: Optional[List[ShippingOption]] = None
@@ -246,7 +274,7 @@ class ShippingDetail:
     address: Optional[Address] = None
 
 
-@dataclass
+@slotted_dataclass
 class TrackerItem:
     name: Optional[str] = None
     quantity: Optional[str] = None
@@ -255,7 +283,7 @@ class TrackerItem:
     upc: Optional[Any] = None
 
 
-@dataclass
+@slotted_dataclass
 class Tracker:
     id: Optional[str] = None
     status: Optional[Any] = None
@@ -263,18 +291,18 @@ class Tracker:
     links: Optional[List[Link]] = None
 
 
-@dataclass
+@slotted_dataclass
 class ShippingWithTrackingDetail(ShippingDetail):
     trackers: Optional[List[Tracker]] = None
 
 
-@dataclass
+@slotted_dataclass
 class Level2Data:
     invoice_id: Optional[str] = None
     tax_total: Optional[Amount] = None
 
 
-@dataclass
+@slotted_dataclass
 class LineItem:
     name: str
     quantity: int
@@ -289,7 +317,7 @@ class LineItem:
     total_amount: Optional[Amount] = None
 
 
-@dataclass
+@slotted_dataclass
 class Level3Data:
     ships_from_postal_code: Optional[str] = None
     line_items: Optional[List[LineItem]] = None
@@ -299,18 +327,18 @@ class Level3Data:
     address: Optional[Address] = None
 
 
-@dataclass
+@slotted_dataclass
 class SupplementaryCardData:
     level_2: Optional[Level2Data] = None
     level_3: Optional[Level3Data] = None
 
 
-@dataclass
+@slotted_dataclass
 class SupplementaryData:
     card: SupplementaryCardData
 
 
-@dataclass
+@slotted_dataclass
 class PreviousNetworkTransactionReference:
     id: str
     network: CardType
@@ -318,7 +346,7 @@ class PreviousNetworkTransactionReference:
     acquirer_reference_number: Optional[str] = None
 
 
-@dataclass
+@slotted_dataclass
 class StoredPaymentSource:
     payment_initiator: Literal['CUSTOMER', 'MERCHANT']
     payment_type: Literal['ONE_TIME', 'RECURRING', 'UNSCHEDULED']
@@ -326,7 +354,7 @@ class StoredPaymentSource:
     previous_network_transaction_reference: Optional[PreviousNetworkTransactionReference] = None
 
 
-@dataclass
+@slotted_dataclass
 class ApplicationContext(JSONWizard):
     class _(JSONWizard.Meta):
         key_transform_with_dump = 'SNAKE'
@@ -339,7 +367,7 @@ class APIAuthCredentials(NamedTuple):
     client_secret: str
 
 
-@dataclass
+@slotted_dataclass
 class OrderCreatedAPIResponse(JSONWizard):
     class _(JSONWizard.Meta):
         key_transform_with_dump = 'SNAKE'
@@ -350,7 +378,7 @@ class OrderCreatedAPIResponse(JSONWizard):
     status: str
 
 
-@dataclass
+@slotted_dataclass
 class Payer:
     payer_id: str
     address: Optional[Address] = None
@@ -358,25 +386,25 @@ class Payer:
     name: Optional[Name] = None
 
 
-@dataclass
+@slotted_dataclass
 class PaymentSourceResponse:
     paypal: PayPalWalletResponse
 
 
-@dataclass
+@slotted_dataclass
 class SellerReceivableBreakdown:
     gross_amount: Amount
     net_amount: Optional[Amount] = None
     paypal_fee: Optional[Amount] = None
 
 
-@dataclass
+@slotted_dataclass
 class SellerProtection:
     dispute_categories: Optional[List[str]] = None
     status: Optional[str] = None
 
 
-@dataclass
+@slotted_dataclass
 class Capture:
     amount: Optional[Amount] = None
     id: Optional[str] = None
@@ -389,7 +417,7 @@ class Capture:
     update_time: Optional[str] = None
 
 
-@dataclass
+@slotted_dataclass
 class PaymentCollection:
     authorizations: Optional[List[Any]] = None
     captures: Optional[List[Capture]] = None
@@ -408,7 +436,7 @@ class WebhookEvent(NamedTuple):
     summary: str
 
 
-@dataclass
+@slotted_dataclass
 class PurchaseUnit(JSONWizard):
     class _(JSONWizard.Meta):
         key_transform_with_dump = 'SNAKE'
@@ -427,7 +455,7 @@ class PurchaseUnit(JSONWizard):
     payments: Optional[PaymentCollection] = None
 
 
-@dataclass
+@slotted_dataclass
 class OrderDetailAPIResponse(JSONWizard):
     class _(JSONWizard.Meta):
         key_transform_with_dump = 'SNAKE'
@@ -444,6 +472,12 @@ class OrderDetailAPIResponse(JSONWizard):
     intent: Optional[Intent] = None
 
 
-@dataclass
+@slotted_dataclass
 class OrderCaptureAPIResponse(OrderDetailAPIResponse):
     pass
+
+
+class OrderDetailResult(NamedTuple):
+    order_id: str
+    response: Optional[OrderDetailAPIResponse]
+    error: Optional[Exception] = None
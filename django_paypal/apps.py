@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
+
+
+class DjangoPaypalConfig(AppConfig):
+    name = 'django_paypal'
+
+    def ready(self):
+        from django_paypal.models import PaypalWebhook
+        from django_paypal.webhook_resolver import clear_webhook_resolver
+
+        # the resolved webhooks are cleared when setup/patch/delete_webhook change them
+        post_save.connect(clear_webhook_resolver, sender=PaypalWebhook, dispatch_uid='django_paypal_webhook_resolver_save')
+        post_delete.connect(clear_webhook_resolver, sender=PaypalWebhook, dispatch_uid='django_paypal_webhook_resolver_delete')
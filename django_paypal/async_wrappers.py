@@ -0,0 +1,572 @@
+import asyncio
+import logging
+import time
+import uuid
+import warnings
+from typing import AsyncIterator, Literal, List, Any, Dict, Iterable, Mapping, Optional, Set, Tuple, Union
+
+import django
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpRequest
+
+from django_paypal import settings as django_paypal_settings
+from django_paypal.audit import get_audit_writer
+from django_paypal.captures import save_order_captures
+from django_paypal.api_types import (
+    APIAuthCredentials,
+    OAuthResponse,
+    PaymentSource,
+    ApplicationContext,
+    PurchaseUnit,
+    OrderCreatedAPIResponse,
+    OrderCaptureAPIResponse,
+    OrderDetailAPIResponse,
+    OrderDetailResult,
+    Intent,
+)
+from django_paypal.circuit_breaker import ENDPOINT_OAUTH, CircuitBreaker, get_circuit_breaker
+from django_paypal.exceptions import PaypalAuthFailure, PaypalAPIError, PaypalDeadlineExceeded, PaypalWebhookVerificationError
+from django_paypal.models import (
+    PaypalAPIOperation,
+    PaypalOrder,
+    PaypalWebhook,
+)
+from django_paypal.ratelimit import PRIORITY_HIGH, PRIORITY_LOW, TokenBucket, get_rate_limiter
+from django_paypal.retry import REQUEST_ID_HEADER
+from django_paypal.lazy import LazyView
+from django_paypal.metrics import ACCESS_TOKEN_CACHE, API_REQUEST_RETRIES, PERSISTENCE_DURATION, get_metrics, timed
+from django_paypal.serialization import dumps, from_dict, loads
+from django_paypal.sessions import httpx, require_httpx
+from django_paypal.transports import Transport, aget_transport
+from django_paypal.signals import (
+    api_request_attempted,
+    api_request_finished,
+    api_request_started,
+    order_captured,
+    order_created,
+    send_async,
+)
+from django_paypal.tokens import build_cache_entry, get_async_token_refreshes, local_token_cache, needs_renewal, read_cache_entry
+from django_paypal.webhook_verification import verify_webhook_signature
+from django_paypal.wrappers import BasePaypalWrapper
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncPaypalWrapper(BasePaypalWrapper):
+    """
+    asyncio counterpart of PaypalWrapper for ASGI deployments. All API methods are coroutines,
+    HTTP calls share a pooled httpx client per event loop and database writes use Django's async ORM (Django >= 4.2).
+    """
+
+    def __init__(self, auth: APIAuthCredentials, sandbox=None):
+        # Model.asave/adelete are new in 4.2, the async QuerySet methods and cache in 4.1
+        if django.VERSION < (4, 2):
+            raise ImproperlyConfigured(f'AsyncPaypalWrapper requires Django >= 4.2, found {django.get_version()}.')
+        # the error handling catches httpx exceptions, whichever transport is used
+        require_httpx()
+        super().__init__(auth, sandbox=sandbox)
+
+    async def _get_transport(self) -> Transport:
+        return self.transport or await aget_transport()
+
+    async def create_order(
+        self,
+        intent: Intent,
+        purchase_units: List[PurchaseUnit],
+        payment_source: PaymentSource,
+        application_context: Optional[ApplicationContext] = None,
+        success_url=django_paypal_settings.PAYPAL_SUCCESS_URL,
+        cancellation_url=django_paypal_settings.PAYPAL_CANCELLATION_URL,
+        request_id: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> OrderCreatedAPIResponse:
+        """
+        Create an order. `timeout` is the time in seconds the API call may take in total, including the access token and retries.
+        """
+        order_data = self._build_order_data(intent, purchase_units, payment_source, application_context, success_url, cancellation_url)
+        url = '{0}{1}'.format(self.api_url, self.orders_api_endpoint)
+        headers = {REQUEST_ID_HEADER: request_id or str(uuid.uuid4())}
+        order_response_dict = await self.call_api(
+            url=url, data=order_data, method='POST', headers=headers, operation=PaypalAPIOperation.CREATE, timeout=timeout
+        )
+        order_response = from_dict(OrderCreatedAPIResponse, order_response_dict)
+        with timed(PERSISTENCE_DURATION, operation=PaypalAPIOperation.CREATE):
+            new_order = await PaypalOrder.objects.acreate(order_id=order_response.id, status=order_response.status)
+            await get_audit_writer().awrite(new_order, url, order_data, order_response_dict, PaypalAPIOperation.CREATE)
+        await send_async(order_created, sender=self.__class__, order=new_order, response=order_response_dict)
+        return order_response
+
+    async def capture_order(
+        self, order_id: str, request_id: Optional[str] = None, lazy: bool = False, timeout: Optional[float] = None
+    ) -> Union[OrderCaptureAPIResponse, LazyView[OrderCaptureAPIResponse]]:
+        """
+        Capture an order. With `lazy` a LazyView of the response is returned, which only converts the fields that are read.
+        `timeout` is the time in seconds the API call may take in total, including the access token and retries.
+        """
+        order = await PaypalOrder.objects.aget(order_id=order_id)
+        url = f'{self.api_url}{self.orders_api_endpoint}/{order.order_id}/capture'
+        headers = {REQUEST_ID_HEADER: request_id or str(uuid.uuid4())}
+
+        try:
+            order_capture_response = await self.call_api(
+                url=url, method='POST', headers=headers, operation=PaypalAPIOperation.CAPTURE, timeout=timeout
+            )
+        except PaypalAPIError as e:
+            self._handle_capture_error(e)
+
+        # status and capture ids are all that is needed here, the rest is only converted if the caller reads it
+        order_capture = LazyView(OrderCaptureAPIResponse, order_capture_response)
+        if not lazy:
+            # convert the whole response before anything is saved, so a malformed one leaves no rows behind
+            order_capture = order_capture.materialize()
+        captures_id_list = self._get_new_capture_ids(order, order_capture)
+
+        order.status = order_capture.status or ''
+        order.capture_id = captures_id_list
+        with timed(PERSISTENCE_DURATION, operation=PaypalAPIOperation.CAPTURE):
+            await order.asave(update_fields=['status', 'capture_id'])
+            await sync_to_async(save_order_captures)(order, order_capture_response)
+            await get_audit_writer().awrite(order, url, {}, order_capture_response, PaypalAPIOperation.CAPTURE)
+        await send_async(order_captured, sender=self.__class__, order=order, response=order_capture_response)
+        return order_capture
+
+    async def get_order_details(
+        self, order_id: str, lazy: bool = False, timeout: Optional[float] = None
+    ) -> Union[OrderDetailAPIResponse, LazyView[OrderDetailAPIResponse]]:
+        order = await PaypalOrder.objects.aget(order_id=order_id)
+        url = f'{self.api_url}{self.orders_api_endpoint}/{order.order_id}'
+        order_details_response = await self.call_api(url=url, method='GET', operation=PaypalAPIOperation.DETAILS, timeout=timeout)
+        return self._parse_order_response(OrderDetailAPIResponse, order_details_response, lazy)
+
+    async def get_order_details_many(
+        self, order_ids: Iterable[str], concurrency: int = 10, rate_limit: Optional[float] = None, lazy: bool = False
+    ) -> AsyncIterator[OrderDetailResult]:
+        """
+        Fetch the details of many orders, with up to `concurrency` requests in flight and at most `rate_limit` requests per second.
+        Results are yielded as they complete. Errors are reported per order in `OrderDetailResult.error` instead of being raised.
+        The requests have PRIORITY_LOW for the PAYPAL_RATE_LIMITS.
+        With `lazy` the responses are LazyViews.
+        """
+        order_ids = list(dict.fromkeys(order_ids))
+        orders = await PaypalOrder.objects.ain_bulk(order_ids, field_name='order_id')
+        for result in self._get_missing_order_results(order_ids, orders):
+            yield result
+        async for result in self._fetch_order_details(list(orders), concurrency=concurrency, rate_limit=rate_limit, lazy=lazy):
+            yield result
+
+    async def _fetch_order_details(
+        self, order_ids: Iterable[str], concurrency: int = 10, rate_limit: Optional[float] = None, lazy: bool = False
+    ) -> AsyncIterator[OrderDetailResult]:
+        rate_limiter = TokenBucket(rate_limit) if rate_limit else None
+
+        async def fetch(order_id: str) -> OrderDetailResult:
+            try:
+                if rate_limiter:
+                    await rate_limiter.aacquire()
+                url = f'{self.api_url}{self.orders_api_endpoint}/{order_id}'
+                return OrderDetailResult(
+                    order_id,
+                    self._parse_order_response(
+                        OrderDetailAPIResponse,
+                        await self.call_api(url=url, method='GET', operation=PaypalAPIOperation.DETAILS, priority=PRIORITY_LOW),
+                        lazy,
+                    ),
+                )
+            except Exception as e:
+                return OrderDetailResult(order_id, None, e)
+
+        order_ids = iter(order_ids)
+        pending: Set[asyncio.Task] = set()
+        try:
+            while True:
+                for order_id in order_ids:
+                    pending.add(asyncio.ensure_future(fetch(order_id)))
+                    if len(pending) >= concurrency:
+                        break
+                if not pending:
+                    return
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call_api(
+        self,
+        url: str,
+        method: Literal['GET', 'POST', 'PATCH', 'DELETE'],
+        data=None,
+        headers: Optional[Dict[str, str]] = None,
+        operation: str = '',
+        timeout: Optional[float] = None,
+        priority: str = PRIORITY_HIGH,
+    ) -> Dict[str, Any]:
+        """
+        See PaypalWrapper.call_api.
+        """
+        if method not in ('GET', 'POST', 'PATCH', 'DELETE'):
+            raise ValueError('Invalid method')
+        deadline = self._get_deadline(timeout)
+        await send_async(api_request_started, sender=self.__class__, url=url, method=method, operation=operation)
+        start = time.monotonic()
+        status_code, exception = None, None
+        try:
+            status_code, response_dict = await self._call_api(url, method, data, headers, operation, deadline, priority)
+            return response_dict
+        except BaseException as e:
+            exception = e
+            status_code = getattr(getattr(e, 'response', None), 'status_code', None)
+            raise
+        finally:
+            duration = time.monotonic() - start
+            self._record_api_call(url, operation, duration, status_code, exception)
+            await send_async(
+                api_request_finished,
+                sender=self.__class__,
+                url=url,
+                method=method,
+                operation=operation,
+                duration=duration,
+                status_code=status_code,
+                exception=exception,
+            )
+
+    async def _call_api(
+        self,
+        url: str,
+        method: str,
+        data,
+        headers: Optional[Dict[str, str]],
+        operation: str,
+        deadline: Optional[float] = None,
+        priority: str = PRIORITY_HIGH,
+    ) -> Tuple[int, Dict[str, Any]]:
+        access_token = await self._get_access_token(deadline)
+        try:
+            return await self._send_api_request(
+                url, method, data, self._build_request_headers(access_token, headers), operation, deadline, priority
+            )
+        except PaypalAPIError as e:
+            if e.response is None or e.response.status_code != 401:
+                raise e
+            # the token was revoked or expired early: drop it and retry once with a fresh one
+            await self._invalidate_access_token(access_token)
+            return await self._send_api_request(
+                url,
+                method,
+                data,
+                self._build_request_headers(await self._get_access_token(deadline), headers),
+                operation,
+                deadline,
+                priority,
+            )
+
+    async def _send_api_request(
+        self,
+        url: str,
+        method: str,
+        data,
+        headers: Dict[str, str],
+        operation: str = '',
+        deadline: Optional[float] = None,
+        priority: str = PRIORITY_HIGH,
+    ) -> Tuple[int, Dict[str, Any]]:
+        endpoint = self._get_endpoint(url)
+        breaker = get_circuit_breaker(endpoint)
+        rate_limiter = get_rate_limiter(endpoint, self.api_auth_hash)
+        attempt = 0
+        while True:
+            attempt += 1
+            if rate_limiter:
+                await rate_limiter.aacquire(priority, deadline)
+            timeout = self._get_timeout(operation, deadline)
+            if breaker:
+                await breaker.abefore_call()
+            start = time.monotonic()
+            try:
+                status_code, response_dict = await self._perform_api_request(url, method, data, headers, timeout)
+            except (PaypalAPIError, httpx.TransportError) as e:
+                duration = time.monotonic() - start
+                tags = await self._arecord_call_result(breaker, duration, e, endpoint=endpoint, operation=operation)
+                request_sent = not isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+                delay = self._get_retry_delay(
+                    attempt, method, headers, e, request_sent=request_sent, deadline=deadline, operation=operation
+                )
+                if delay is not None:
+                    get_metrics().increment(API_REQUEST_RETRIES, tags)
+                await send_async(
+                    api_request_attempted,
+                    sender=self.__class__,
+                    url=url,
+                    method=method,
+                    operation=operation,
+                    attempt=attempt,
+                    duration=duration,
+                    status_code=getattr(getattr(e, 'response', None), 'status_code', None),
+                    exception=e,
+                    retrying=delay is not None,
+                )
+                if delay is None:
+                    raise e
+                await asyncio.sleep(delay)
+                continue
+            duration = time.monotonic() - start
+            await self._arecord_call_result(breaker, duration, endpoint=endpoint, operation=operation, status_code=status_code)
+            await send_async(
+                api_request_attempted,
+                sender=self.__class__,
+                url=url,
+                method=method,
+                operation=operation,
+                attempt=attempt,
+                duration=duration,
+                status_code=status_code,
+                exception=None,
+                retrying=False,
+            )
+            return status_code, response_dict
+
+    async def _perform_api_request(
+        self, url: str, method: str, data, headers: Dict[str, str], timeout: Optional[Tuple[float, float]] = None
+    ) -> Tuple[int, Dict[str, Any]]:
+        transport = await self._get_transport()
+        body = dumps(data) if method in ('POST', 'PATCH') and data is not None else None
+
+        try:
+            response = await transport.asend(method, url, headers, data=body, timeout=timeout or (self.connect_timeout, self.read_timeout))
+            response.raise_for_status()
+            if method == 'DELETE':
+                return response.status_code, {'deleted': True}
+            return response.status_code, loads(response.content)
+        except httpx.HTTPStatusError as e:
+            raise PaypalAPIError(str(e), response=e.response)
+
+    async def _arecord_call_result(
+        self,
+        breaker: Optional[CircuitBreaker],
+        duration: float,
+        e: Optional[Exception] = None,
+        endpoint: str = '',
+        operation: str = '',
+        status_code: Optional[int] = None,
+    ) -> Dict[str, str]:
+        """
+        _record_call_result with the async cache API for the circuit breaker.
+        """
+        tags = self._record_call_result(None, duration, e, endpoint=endpoint, operation=operation, status_code=status_code)
+        if breaker is not None:
+            if self._is_breaker_failure(e):
+                await breaker.arecord_failure()
+            else:
+                await breaker.arecord_success(duration)
+        return tags
+
+    async def setup_webhooks(self, webhook_listener: str, event_types: Optional[Iterable[str]] = None) -> PaypalWebhook:
+        """
+        Register `webhook_listener` for `event_types`, by default WebhookEvents.ORDERS.
+        Pass WebhookEvents.ALL to also receive the PAYMENT.CAPTURE.* events.
+        """
+        if await PaypalWebhook.objects.filter(url=webhook_listener, auth_hash=self.api_auth_hash).aexists():
+            raise ValueError(f'Webhook listener ({webhook_listener}) already exists')
+        from django_paypal.webhooks import WebhookEvents
+
+        if event_types is None:
+            event_types = WebhookEvents.ORDERS
+        data = {'url': webhook_listener, 'event_types': [{'name': event} for event in event_types]}
+        webhook_api = '{0}{1}'.format(self.api_url, '/v1/notifications/webhooks')
+        try:
+            response_dict = await self.call_api(url=webhook_api, method='POST', data=data, operation=PaypalAPIOperation.WEBHOOK_SETUP)
+            return await PaypalWebhook.objects.acreate(
+                webhook_id=response_dict['id'],
+                auth_hash=self.api_auth_hash,
+                url=response_dict['url'],
+                event_types=response_dict['event_types'],
+            )
+        except PaypalAPIError as e:
+            if e.response is not None:
+                response_json = e.response.json()
+                if response_json.get('name') == 'WEBHOOK_URL_ALREADY_EXISTS':
+                    webhook_list = await self.call_api(url=webhook_api, method='GET', operation=PaypalAPIOperation.WEBHOOK_LIST)
+                    for webhook in webhook_list.get('webhooks', []):
+                        if webhook['url'] == webhook_listener:
+                            return await PaypalWebhook.objects.acreate(
+                                webhook_id=webhook['id'],
+                                url=webhook['url'],
+                                event_types=webhook['event_types'],
+                                auth_hash=self.api_auth_hash,
+                            )
+            raise e
+
+    async def patch_webhook(self, webhook_id: str, patch_data: List[Dict]) -> PaypalWebhook:
+        try:
+            paypal_webhook = await PaypalWebhook.objects.aget(webhook_id=webhook_id)
+        except PaypalWebhook.DoesNotExist as e:
+            warnings.warn(f'Webhook with id {webhook_id} does not exist in the database. Set up webhooks by calling "setup_webhooks"')
+            raise e
+        url = '{0}{1}'.format(self.api_url, f'/v1/notifications/webhooks/{paypal_webhook.webhook_id}')
+        webhook_response_dict = await self.call_api(url=url, method='PATCH', data=patch_data, operation=PaypalAPIOperation.WEBHOOK_UPDATE)
+        paypal_webhook.url = webhook_response_dict['url']
+        paypal_webhook.event_types = webhook_response_dict['event_types']
+        await paypal_webhook.asave()
+        return paypal_webhook
+
+    async def delete_webhook(self, webhook_listener: str) -> bool:
+        paypal_webhook = await PaypalWebhook.objects.aget(url=webhook_listener, auth_hash=self.api_auth_hash)
+        url = '{0}{1}'.format(self.api_url, f'/v1/notifications/webhooks/{paypal_webhook.webhook_id}')
+        await self.call_api(url=url, method='DELETE', operation=PaypalAPIOperation.WEBHOOK_DELETE)
+        await paypal_webhook.adelete()
+        return True
+
+    async def verify_webhook_event(self, request: HttpRequest, webhook_id: str) -> bool:
+        return await self.verify_webhook_delivery(request.headers, request.body, webhook_id)
+
+    async def verify_webhook_delivery(self, headers: Mapping[str, str], body: Union[bytes, str], webhook_id: str) -> bool:
+        """
+        Verify a webhook delivery from its headers and raw body, e.g. one stored as PaypalWebhookDelivery.
+        The signature is checked locally first (in a thread, as the certificate may have to be fetched), then by the API.
+        """
+        if await sync_to_async(verify_webhook_signature, thread_sensitive=False)(headers, body, webhook_id):
+            return True
+        verification_payload = self._build_webhook_verification_payload(headers, body, webhook_id)
+        url = f'{self.api_url}/v1/notifications/verify-webhook-signature'
+        res = await self.call_api(url=url, method='POST', data=verification_payload, operation=PaypalAPIOperation.WEBHOOK_VERIFY)
+        if res.get('verification_status') == 'SUCCESS':
+            return True
+        raise PaypalWebhookVerificationError('Webhook verification failed', res)
+
+    async def verify_api_keys(self) -> bool:
+        await self._get_access_token()
+        return True
+
+    async def _get_access_token(self, deadline: Optional[float] = None) -> str:
+        if not self.auth_cache_timeout:
+            auth_response = await self._authorize_client(deadline)
+            return auth_response.access_token
+        else:
+            cache_key = self.auth_cache_key.format(auth_hash=self.api_auth_hash)
+            access_token, expires_at = local_token_cache.get(self.api_auth_hash)
+            if access_token:
+                get_metrics().increment(ACCESS_TOKEN_CACHE, {'result': 'local'})
+            else:
+                access_token, expires_at = read_cache_entry(await cache.aget(cache_key))
+                if not access_token:
+                    get_metrics().increment(ACCESS_TOKEN_CACHE, {'result': 'miss'})
+                    return await self._wait_for_access_token(self._refresh_access_token(cache_key), deadline)
+                get_metrics().increment(ACCESS_TOKEN_CACHE, {'result': 'shared'})
+                local_token_cache.set(self.api_auth_hash, access_token, expires_at)
+            if needs_renewal(expires_at, self.auth_refresh_margin):
+                self._refresh_access_token(cache_key, renewal=True)
+            return access_token
+
+    async def _wait_for_access_token(self, task: asyncio.Task, deadline: Optional[float] = None) -> str:
+        # shield the shared refresh, so a cancelled or timed out caller doesn't cancel it for everyone else waiting on it
+        if deadline is None:
+            return await asyncio.shield(task)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            raise PaypalDeadlineExceeded('Deadline exceeded waiting for the PayPal access token') from None
+
+    def _refresh_access_token(self, cache_key: str, renewal: bool = False) -> asyncio.Task:
+        # single-flight: all coroutines of this event loop share one in-flight refresh per cache key
+        refreshes = get_async_token_refreshes()
+        task = refreshes.get(cache_key)
+        if task is None:
+            task = asyncio.ensure_future(self._mint_access_token(cache_key, renewal=renewal))
+            refreshes[cache_key] = task
+
+            def done(finished_task: asyncio.Task):
+                refreshes.pop(cache_key, None)
+                if not finished_task.cancelled() and finished_task.exception():
+                    logger.warning('Refreshing the PayPal access token failed', exc_info=finished_task.exception())
+
+            task.add_done_callback(done)
+        return task
+
+    async def _mint_access_token(self, cache_key: str, renewal: bool = False) -> str:
+        access_token, expires_at = read_cache_entry(await cache.aget(cache_key))
+        if access_token and not needs_renewal(expires_at, self.auth_refresh_margin):
+            local_token_cache.set(self.api_auth_hash, access_token, expires_at)  # refreshed by another process
+            return access_token
+        if not self.auth_distributed_lock:
+            return await self._store_access_token(cache_key, await self._authorize_client())
+
+        lock_key = self.auth_lock_key.format(auth_hash=self.api_auth_hash)
+        if await cache.aadd(lock_key, 1, self.auth_lock_timeout):
+            try:
+                return await self._store_access_token(cache_key, await self._authorize_client())
+            finally:
+                await cache.adelete(lock_key)
+
+        # another process is minting a token right now
+        access_token, _expires_at = read_cache_entry(await cache.aget(cache_key))
+        if renewal and access_token:
+            return access_token
+        deadline = time.monotonic() + self.auth_lock_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            access_token, _expires_at = read_cache_entry(await cache.aget(cache_key))
+            if access_token:
+                return access_token
+        return await self._store_access_token(cache_key, await self._authorize_client())
+
+    async def _store_access_token(self, cache_key: str, auth_response: OAuthResponse) -> str:
+        cache_entry, timeout = build_cache_entry(auth_response, self.auth_cache_timeout)
+        await cache.aset(cache_key, cache_entry, timeout)
+        local_token_cache.set(self.api_auth_hash, cache_entry['access_token'], cache_entry['expires_at'])
+        return auth_response.access_token
+
+    async def _invalidate_access_token(self, access_token: str):
+        local_token_cache.delete(self.api_auth_hash, access_token)
+        if self.auth_cache_timeout:
+            cache_key = self.auth_cache_key.format(auth_hash=self.api_auth_hash)
+            cached_token, _expires_at = read_cache_entry(await cache.aget(cache_key))
+            if cached_token == access_token:
+                await cache.adelete(cache_key)
+
+    async def _authorize_client(self, deadline: Optional[float] = None) -> OAuthResponse:
+        if not self.auth:
+            raise ValueError('Auth credentials not set')
+
+        url = f'{self.api_url}{self.auth_url}'
+        headers = {'Accept': 'application/json', 'Content-Type': 'application/x-www-form-urlencoded'}
+        data = {'grant_type': 'client_credentials'}
+        rate_limiter = get_rate_limiter(ENDPOINT_OAUTH, self.api_auth_hash)
+        if rate_limiter:
+            await rate_limiter.aacquire(PRIORITY_HIGH, deadline)
+        timeout = self._get_timeout(PaypalAPIOperation.OAUTH, deadline)
+        transport = await self._get_transport()
+
+        breaker = get_circuit_breaker(ENDPOINT_OAUTH)
+        if breaker:
+            await breaker.abefore_call()
+        start = time.monotonic()
+
+        try:
+            response = await transport.asend(
+                'POST',
+                url,
+                headers,
+                data=data,
+                auth=(self.auth.client_id, self.auth.client_secret),
+                timeout=timeout,
+            )
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            await self._arecord_call_result(
+                breaker, time.monotonic() - start, e, endpoint=ENDPOINT_OAUTH, operation=PaypalAPIOperation.OAUTH
+            )
+            raise PaypalAuthFailure(str(e), response=e.response)
+        except httpx.TransportError as e:
+            await self._arecord_call_result(
+                breaker, time.monotonic() - start, e, endpoint=ENDPOINT_OAUTH, operation=PaypalAPIOperation.OAUTH
+            )
+            raise e
+        await self._arecord_call_result(
+            breaker, time.monotonic() - start, endpoint=ENDPOINT_OAUTH, operation=PaypalAPIOperation.OAUTH, status_code=response.status_code
+        )
+        return OAuthResponse(**response.json())
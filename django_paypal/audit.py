@@ -0,0 +1,235 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections, connections, router, transaction
+from django.utils.module_loading import import_string
+
+from django_paypal import settings as django_paypal_settings
+from django_paypal.models import PaypalAPIPostData, PaypalAPIResponse, PaypalOrder
+
+logger = logging.getLogger(__name__)
+
+_audit_writer: Optional['AuditWriter'] = None
+_audit_writer_lock = threading.Lock()
+
+
+class AuditRecord(NamedTuple):
+    order: PaypalOrder
+    url: str
+    post_data: Dict[str, Any]
+    response_data: Dict[str, Any]
+    operation: str = ''
+
+
+class AuditWriter(object):
+    """
+    Persists the PaypalAPIPostData/PaypalAPIResponse pair of an API call.
+    """
+
+    def write(self, order: PaypalOrder, url: str, post_data: Dict[str, Any], response_data: Dict[str, Any], operation: str = ''):
+        raise NotImplementedError
+
+    async def awrite(self, order: PaypalOrder, url: str, post_data: Dict[str, Any], response_data: Dict[str, Any], operation: str = ''):
+        await sync_to_async(self.write)(order, url, post_data, response_data, operation)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+
+class SyncAuditWriter(AuditWriter):
+    """
+    Writes both rows immediately, before create_order/capture_order return.
+    """
+
+    def write(self, order: PaypalOrder, url: str, post_data: Dict[str, Any], response_data: Dict[str, Any], operation: str = ''):
+        post_obj = PaypalAPIPostData.objects.create(order=order, url=url, post_data=post_data)
+        PaypalAPIResponse.objects.create(order=order, url=url, operation=operation, response_data=response_data, post=post_obj)
+
+    async def awrite(self, order: PaypalOrder, url: str, post_data: Dict[str, Any], response_data: Dict[str, Any], operation: str = ''):
+        post_obj = await PaypalAPIPostData.objects.acreate(order=order, url=url, post_data=post_data)
+        await PaypalAPIResponse.objects.acreate(order=order, url=url, operation=operation, response_data=response_data, post=post_obj)
+
+
+class BufferedAuditWriter(AuditWriter):
+    """
+    Collects records in memory and writes them with bulk_create once `batch_size` records are queued, or from a timer thread
+    `flush_interval` seconds after the first one. Records are only queued once the caller's transaction commits, so a rolled back
+    order can't fail a whole batch. The buffer is flushed on exit; records are lost if the process is killed or a batch fails.
+    """
+
+    def __init__(self, batch_size: int = 100, flush_interval: float = 5):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._records: List[AuditRecord] = []
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+
+    def write(self, order: PaypalOrder, url: str, post_data: Dict[str, Any], response_data: Dict[str, Any], operation: str = ''):
+        record = AuditRecord(order, url, post_data, response_data, operation)
+        transaction.on_commit(lambda: self._buffer(record), using=router.db_for_write(PaypalAPIPostData))
+
+    async def awrite(self, order: PaypalOrder, url: str, post_data: Dict[str, Any], response_data: Dict[str, Any], operation: str = ''):
+        # the async ORM runs every query in autocommit mode, so the order is committed already
+        if self._add(AuditRecord(order, url, post_data, response_data, operation)):
+            await sync_to_async(self.flush)()
+
+    def flush(self):
+        with self._lock:
+            records, self._records = self._records, []
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        if records:
+            try:
+                self._save(records)
+            except Exception:
+                logger.exception('Could not save %d PayPal API audit records', len(records))
+
+    def _buffer(self, record: AuditRecord):
+        if self._add(record):
+            self.flush()
+
+    def _add(self, record: AuditRecord) -> bool:
+        """
+        Queue a record and return whether the buffer is full.
+        """
+        with self._lock:
+            if not self._records:
+                self._timer = threading.Timer(self.flush_interval, self._flush_on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+            self._records.append(record)
+            return len(self._records) >= self.batch_size
+
+    def _flush_on_timer(self):
+        try:
+            self.flush()
+        finally:
+            connections.close_all()
+
+    def _save(self, records: List[AuditRecord]):
+        posts = [PaypalAPIPostData(order=record.order, url=record.url, post_data=record.post_data) for record in records]
+        db = router.db_for_write(PaypalAPIPostData)
+        with transaction.atomic(using=db):
+            if connections[db].features.can_return_rows_from_bulk_insert:
+                PaypalAPIPostData.objects.using(db).bulk_create(posts)
+            else:
+                # the responses reference their post, so without primary keys from bulk_create the posts are saved one by one
+                for post in posts:
+                    post.save(using=db)
+            PaypalAPIResponse.objects.using(db).bulk_create(
+                [
+                    PaypalAPIResponse(
+                        order=record.order, url=record.url, operation=record.operation, response_data=record.response_data, post=post
+                    )
+                    for record, post in zip(records, posts)
+                ]
+            )
+
+
+class BackgroundAuditWriter(BufferedAuditWriter):
+    """
+    Hands records to a daemon thread that writes them in batches of up to `batch_size`, at the latest after `flush_interval` seconds.
+    The request path never waits for the database. The queue is drained when the process exits normally.
+    """
+
+    def __init__(self, batch_size: int = 100, flush_interval: float = 5):
+        super().__init__(batch_size=batch_size, flush_interval=flush_interval)
+        self._queue: 'queue.Queue[Optional[AuditRecord]]' = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+
+    def write(self, order: PaypalOrder, url: str, post_data: Dict[str, Any], response_data: Dict[str, Any], operation: str = ''):
+        self._ensure_thread()
+        self._queue.put(AuditRecord(order, url, post_data, response_data, operation))
+
+    async def awrite(self, order: PaypalOrder, url: str, post_data: Dict[str, Any], response_data: Dict[str, Any], operation: str = ''):
+        self.write(order, url, post_data, response_data, operation)
+
+    def flush(self):
+        self._queue.join()
+
+    def close(self):
+        with self._thread_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._thread_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='django-paypal-audit-writer', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        stopped = False
+        while not stopped:
+            record = self._queue.get()
+            if record is None:
+                self._queue.task_done()
+                break
+            records = [record]
+            deadline = time.monotonic() + self.flush_interval
+            while len(records) < self.batch_size:
+                try:
+                    record = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if record is None:
+                    stopped = True
+                    self._queue.task_done()
+                    break
+                records.append(record)
+            try:
+                close_old_connections()
+                self._save(records)
+            except Exception:
+                logger.exception('Could not save %d PayPal API audit records', len(records))
+            finally:
+                for _ in records:
+                    self._queue.task_done()
+        connections.close_all()
+
+
+AUDIT_WRITERS = {
+    'sync': SyncAuditWriter,
+    'buffered': BufferedAuditWriter,
+    'background': BackgroundAuditWriter,
+}
+
+
+def get_audit_writer() -> AuditWriter:
+    """
+    Return the process-wide audit writer configured by `PAYPAL_AUDIT_WRITER` ('sync', 'buffered', 'background' or a dotted path).
+    """
+    global _audit_writer
+    if _audit_writer is None:
+        with _audit_writer_lock:
+            if _audit_writer is None:
+                writer_class = AUDIT_WRITERS.get(django_paypal_settings.PAYPAL_AUDIT_WRITER)
+                if writer_class is None:
+                    try:
+                        writer_class = import_string(django_paypal_settings.PAYPAL_AUDIT_WRITER)
+                    except ImportError as e:
+                        raise ImproperlyConfigured(f'Invalid PAYPAL_AUDIT_WRITER: {e}') from e
+                if issubclass(writer_class, BufferedAuditWriter):
+                    writer = writer_class(
+                        batch_size=django_paypal_settings.PAYPAL_AUDIT_BATCH_SIZE,
+                        flush_interval=django_paypal_settings.PAYPAL_AUDIT_FLUSH_INTERVAL,
+                    )
+                else:
+                    writer = writer_class()
+                atexit.register(writer.close)
+                _audit_writer = writer
+    return _audit_writer
@@ -0,0 +1,99 @@
+import dataclasses
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from django_paypal.api_types import OrderDetailAPIResponse
+from django_paypal.lazy import LazyView
+from django_paypal.models import PaypalCapture, PaypalOrder
+
+CAPTURE_UPDATE_FIELDS = ['status', 'amount', 'currency', 'final_capture', 'create_time', 'update_time', 'capture_data']
+
+
+def get_captures_data(order_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Return the raw captures of an order as returned by the Orders API (capture and details responses, order webhook resources).
+    """
+    captures = []
+    for purchase_unit in order_data.get('purchase_units') or []:
+        captures.extend(capture for capture in (purchase_unit.get('payments') or {}).get('captures') or [] if capture.get('id'))
+    return captures
+
+
+def get_response_captures_data(order_details: Union[OrderDetailAPIResponse, LazyView]) -> List[Dict[str, Any]]:
+    """
+    Like get_captures_data, for an already parsed API response.
+    """
+    if isinstance(order_details, LazyView):
+        return get_captures_data(order_details.raw)
+    captures = []
+    for purchase_unit in order_details.purchase_units or []:
+        if purchase_unit.payments and purchase_unit.payments.captures:
+            captures.extend(_strip_none(dataclasses.asdict(capture)) for capture in purchase_unit.payments.captures if capture.id)
+    return captures
+
+
+def _strip_none(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _strip_none(item) for key, item in value.items() if item is not None}
+    if isinstance(value, list):
+        return [_strip_none(item) for item in value]
+    return value
+
+
+def _parse_time(value: Optional[str]):
+    parsed = parse_datetime(value) if value else None
+    if parsed is not None and not settings.USE_TZ and timezone.is_aware(parsed):
+        parsed = timezone.make_naive(parsed)
+    return parsed
+
+
+def build_capture(order_pk: int, capture_data: Dict[str, Any]) -> PaypalCapture:
+    amount = capture_data.get('amount') or {}
+    try:
+        value = Decimal(amount['value'])
+    except (KeyError, TypeError, InvalidOperation):
+        value = None
+    return PaypalCapture(
+        order_id=order_pk,
+        capture_id=capture_data['id'],
+        status=capture_data.get('status') or '',
+        amount=value,
+        currency=amount.get('currency_code') or '',
+        final_capture=capture_data.get('final_capture'),
+        create_time=_parse_time(capture_data.get('create_time')),
+        update_time=_parse_time(capture_data.get('update_time')),
+        capture_data=capture_data,
+    )
+
+
+def save_captures(captures: Iterable[PaypalCapture]) -> int:
+    """
+    Insert new captures and update known ones with two queries plus the lookup, regardless of how many captures are saved.
+    A capture is not overwritten by data with an older `update_time`, so late webhooks can't roll back its status.
+    Return the number of captures inserted or updated.
+    """
+    captures_by_id: Dict[str, PaypalCapture] = {capture.capture_id: capture for capture in captures}
+    if not captures_by_id:
+        return 0
+    existing = PaypalCapture.objects.in_bulk(list(captures_by_id), field_name='capture_id')
+    new_captures, changed_captures = [], []
+    for capture_id, capture in captures_by_id.items():
+        stored = existing.get(capture_id)
+        if stored is None:
+            new_captures.append(capture)
+            continue
+        if stored.update_time and capture.update_time and capture.update_time < stored.update_time:
+            continue
+        capture.pk = stored.pk
+        changed_captures.append(capture)
+    PaypalCapture.objects.bulk_create(new_captures, ignore_conflicts=True)
+    PaypalCapture.objects.bulk_update(changed_captures, CAPTURE_UPDATE_FIELDS)
+    return len(new_captures) + len(changed_captures)
+
+
+def save_order_captures(order: PaypalOrder, order_data: Dict[str, Any]) -> int:
+    return save_captures(build_capture(order.pk, capture_data) for capture_data in get_captures_data(order_data))
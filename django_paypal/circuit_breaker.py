@@ -0,0 +1,178 @@
+import threading
+import time
+from typing import Dict, Optional
+
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from django_paypal import settings as django_paypal_settings
+from django_paypal.exceptions import PaypalCircuitOpenError
+from django_paypal.signals import circuit_breaker_closed, circuit_breaker_half_opened, circuit_breaker_opened, send_async
+
+ENDPOINT_OAUTH = 'oauth'
+ENDPOINT_ORDERS = 'orders'
+ENDPOINT_CAPTURE = 'capture'
+ENDPOINT_WEBHOOKS = 'webhooks'
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+_breakers: Dict[str, 'CircuitBreaker'] = {}
+_breakers_lock = threading.Lock()
+
+
+class CircuitBreaker(object):
+    """
+    Fails fast with PaypalCircuitOpenError once an endpoint had `failure_threshold` consecutive failures (errors, 429/5xx
+    responses or calls slower than `slow_call_threshold`). After `recovery_timeout` seconds a single probe call is let
+    through: the circuit closes again if it succeeds and reopens if it fails.
+
+    The state lives in a Django cache, so processes sharing a cache backend also share their circuits. The a* methods are for
+    async code and use the async cache API, unless the cache is the in-process default.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        storage: BaseCache,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30,
+        slow_call_threshold: Optional[float] = None,
+        cache_key: str = 'django-paypal-circuit-{endpoint}',
+    ):
+        self.endpoint = endpoint
+        self.storage = storage
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.slow_call_threshold = slow_call_threshold
+        self.state_key = cache_key.format(endpoint=endpoint)
+        self.failures_key = f'{self.state_key}-failures'
+        self.probe_key = f'{self.state_key}-probe'
+        self.is_local = isinstance(storage, LocMemCache)  # no I/O, so async code may use the sync methods
+
+    @property
+    def state(self) -> str:
+        opened_at = self.storage.get(self.state_key)
+        if opened_at is None:
+            return STATE_CLOSED
+        if time.time() < opened_at + self.recovery_timeout:
+            return STATE_OPEN
+        return STATE_HALF_OPEN
+
+    def before_call(self):
+        opened_at = self.storage.get(self.state_key)
+        if opened_at is None:
+            return
+        self._check_cooldown(opened_at)
+        # cooldown is over: exactly one caller gets to probe the endpoint, everybody else keeps failing fast
+        if not self.storage.add(self.probe_key, 1, self.recovery_timeout):
+            self._raise_half_open()
+        circuit_breaker_half_opened.send(sender=self.__class__, endpoint=self.endpoint)
+
+    async def abefore_call(self):
+        if self.is_local:
+            return self.before_call()
+        opened_at = await self.storage.aget(self.state_key)
+        if opened_at is None:
+            return
+        self._check_cooldown(opened_at)
+        if not await self.storage.aadd(self.probe_key, 1, self.recovery_timeout):
+            self._raise_half_open()
+        await send_async(circuit_breaker_half_opened, sender=self.__class__, endpoint=self.endpoint)
+
+    def record_success(self, duration: float):
+        if self.slow_call_threshold is not None and duration > self.slow_call_threshold:
+            self.record_failure()
+            return
+        if self.storage.get(self.state_key) is not None:
+            self.storage.delete_many([self.state_key, self.probe_key, self.failures_key])
+            circuit_breaker_closed.send(sender=self.__class__, endpoint=self.endpoint)
+        elif self.storage.get(self.failures_key):
+            self.storage.delete(self.failures_key)
+
+    async def arecord_success(self, duration: float):
+        if self.is_local:
+            return self.record_success(duration)
+        if self.slow_call_threshold is not None and duration > self.slow_call_threshold:
+            await self.arecord_failure()
+            return
+        if await self.storage.aget(self.state_key) is not None:
+            await self.storage.adelete_many([self.state_key, self.probe_key, self.failures_key])
+            await send_async(circuit_breaker_closed, sender=self.__class__, endpoint=self.endpoint)
+        elif await self.storage.aget(self.failures_key):
+            await self.storage.adelete(self.failures_key)
+
+    def record_failure(self):
+        if self.storage.get(self.state_key) is not None:
+            # the probe failed: start another cooldown
+            self._open()
+            return
+        self.storage.add(self.failures_key, 0, None)
+        try:
+            failures = self.storage.incr(self.failures_key)
+        except ValueError:  # evicted between add and incr
+            failures = 1
+        if failures >= self.failure_threshold:
+            self._open()
+
+    async def arecord_failure(self):
+        if self.is_local:
+            return self.record_failure()
+        if await self.storage.aget(self.state_key) is not None:
+            await self._aopen()
+            return
+        await self.storage.aadd(self.failures_key, 0, None)
+        try:
+            failures = await self.storage.aincr(self.failures_key)
+        except ValueError:
+            failures = 1
+        if failures >= self.failure_threshold:
+            await self._aopen()
+
+    def _check_cooldown(self, opened_at: float):
+        retry_in = opened_at + self.recovery_timeout - time.time()
+        if retry_in > 0:
+            raise PaypalCircuitOpenError(f'Circuit for PayPal {self.endpoint} API is open for {retry_in:.0f}s', endpoint=self.endpoint)
+
+    def _raise_half_open(self):
+        raise PaypalCircuitOpenError(f'Circuit for PayPal {self.endpoint} API is half-open', endpoint=self.endpoint)
+
+    def _open(self):
+        self.storage.set(self.state_key, time.time(), None)
+        self.storage.delete_many([self.probe_key, self.failures_key])
+        circuit_breaker_opened.send(sender=self.__class__, endpoint=self.endpoint)
+
+    async def _aopen(self):
+        await self.storage.aset(self.state_key, time.time(), None)
+        await self.storage.adelete_many([self.probe_key, self.failures_key])
+        await send_async(circuit_breaker_opened, sender=self.__class__, endpoint=self.endpoint)
+
+
+def _get_storage() -> BaseCache:
+    if django_paypal_settings.PAYPAL_CIRCUIT_BREAKER_CACHE:
+        return caches[django_paypal_settings.PAYPAL_CIRCUIT_BREAKER_CACHE]
+    return LocMemCache('django-paypal-circuit-breaker', {'TIMEOUT': None, 'OPTIONS': {'MAX_ENTRIES': 1000}})
+
+
+def get_circuit_breaker(endpoint: str) -> Optional[CircuitBreaker]:
+    """
+    Return the circuit breaker of an endpoint family, or None if circuit breaking is disabled.
+    """
+    if not django_paypal_settings.PAYPAL_CIRCUIT_BREAKER_ENABLED:
+        return None
+    breaker = _breakers.get(endpoint)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(endpoint)
+            if breaker is None:
+                breaker = _breakers[endpoint] = CircuitBreaker(
+                    endpoint,
+                    _get_storage(),
+                    failure_threshold=django_paypal_settings.PAYPAL_CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                    recovery_timeout=django_paypal_settings.PAYPAL_CIRCUIT_BREAKER_RECOVERY_TIMEOUT,
+                    slow_call_threshold=django_paypal_settings.PAYPAL_CIRCUIT_BREAKER_SLOW_CALL_THRESHOLD,
+                    cache_key=django_paypal_settings.PAYPAL_CIRCUIT_BREAKER_CACHE_KEY,
+                )
+    return breaker
@@ -15,3 +15,13 @@ class PaypalWebhookVerificationError(BaseException):
 
 class PaypalOrderAlreadyCapturedError(RequestException):
     pass
+
+
+class PaypalCircuitOpenError(RequestException):
+    def __init__(self, *args, endpoint=None, **kwargs):
+        super(PaypalCircuitOpenError, self).__init__(*args, **kwargs)
+        self.endpoint = endpoint
+
+
+class PaypalDeadlineExceeded(RequestException):
+    pass
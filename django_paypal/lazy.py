@@ -0,0 +1,110 @@
+"""
+Lazy views over raw Orders API responses.
+
+A LazyView exposes the fields of an api_types dataclass, but only converts what is read: nested dataclasses become lazy views
+themselves and every value is converted once, on first access. `materialize()` returns the regular dataclass.
+"""
+
+import dataclasses
+import threading
+from typing import Any, Dict, Generic, Tuple, Type, TypeVar, get_args, get_origin, get_type_hints
+
+from django_paypal.serialization import from_dict
+from django_paypal.utils import is_optional, strip_optional
+
+T = TypeVar('T')
+
+# field name -> (kind, type, default) per dataclass, kind being 'value', 'int', 'dataclass' or 'list'
+_FieldSpec = Tuple[str, Any, Any]
+_field_specs: Dict[type, Dict[str, _FieldSpec]] = {}
+_field_specs_lock = threading.Lock()
+
+
+def _build_field_specs(cls: type) -> Dict[str, _FieldSpec]:
+    hints = get_type_hints(cls)
+    specs = {}
+    for field in dataclasses.fields(cls):
+        tp = hints[field.name]
+        if is_optional(tp):
+            tp = strip_optional(tp)
+        default = field.default if field.default is not dataclasses.MISSING else None
+        if dataclasses.is_dataclass(tp):
+            specs[field.name] = ('dataclass', tp, default)
+        elif get_origin(tp) is list and get_args(tp) and dataclasses.is_dataclass(get_args(tp)[0]):
+            specs[field.name] = ('list', get_args(tp)[0], default)
+        elif tp is int:
+            specs[field.name] = ('int', tp, default)
+        else:
+            specs[field.name] = ('value', tp, default)
+    return specs
+
+
+def _get_field_specs(cls: type) -> Dict[str, _FieldSpec]:
+    specs = _field_specs.get(cls)
+    if specs is None:
+        with _field_specs_lock:
+            specs = _field_specs.setdefault(cls, _build_field_specs(cls))
+    return specs
+
+
+class LazyView(Generic[T]):
+    """
+    Read-only view of `data` with the attributes of the dataclass `cls`.
+    """
+
+    __slots__ = ('_cls', '_data', '_values')
+
+    def __init__(self, cls: Type[T], data: Dict[str, Any]):
+        self._cls = cls
+        self._data = data
+        self._values: Dict[str, Any] = {}
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('_'):  # unset slots (e.g. while copying), dunder lookups
+            raise AttributeError(name)
+        try:
+            return self._values[name]
+        except KeyError:
+            pass
+        spec = _get_field_specs(self._cls).get(name)
+        if spec is None:
+            raise AttributeError(f'{self._cls.__name__!r} has no attribute {name!r}')
+        kind, tp, default = spec
+        value = self._data.get(name, default)
+        if value is not None:
+            if kind == 'dataclass':
+                value = LazyView(tp, value)
+            elif kind == 'list':
+                value = [LazyView(tp, item) for item in value]
+            elif kind == 'int' and isinstance(value, str) and value.isdigit():
+                value = int(value)
+        self._values[name] = value
+        return value
+
+    def __setattr__(self, name: str, value: Any):
+        if name not in LazyView.__slots__:
+            raise AttributeError(f'{type(self).__name__} is read-only')
+        object.__setattr__(self, name, value)
+
+    def __dir__(self):
+        return list(_get_field_specs(self._cls)) + ['materialize', 'raw']
+
+    def __repr__(self) -> str:
+        return f'<LazyView of {self._cls.__name__}>'
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, LazyView):
+            return self._cls is other._cls and self._data == other._data
+        return NotImplemented
+
+    __hash__ = None
+
+    @property
+    def raw(self) -> Dict[str, Any]:
+        """
+        The response data the view reads from.
+        """
+        return self._data
+
+    def materialize(self) -> T:
+        return from_dict(self._cls, self._data)
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from django_paypal.captures import build_capture, get_captures_data, save_captures
+from django_paypal.models import PaypalAPIOperation, PaypalAPIResponse
+
+
+class Command(BaseCommand):
+    help = 'Create PaypalCapture rows from the stored capture responses of the Orders API.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Number of responses read and captures saved at once.')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        responses = (
+            PaypalAPIResponse.objects.filter(operation=PaypalAPIOperation.CAPTURE)
+            .order_by('pk')
+            .values_list('order_id', 'response_data')
+            .iterator(chunk_size=chunk_size)
+        )
+        captures, responses_read, captures_saved = {}, 0, 0
+        for order_pk, response_data in responses:
+            responses_read += 1
+            for capture_data in get_captures_data(response_data or {}):
+                # responses are read oldest first, so later data of the same capture wins
+                captures[capture_data['id']] = build_capture(order_pk, capture_data)
+            if len(captures) >= chunk_size:
+                captures_saved += save_captures(captures.values())
+                captures = {}
+        captures_saved += save_captures(captures.values())
+        self.stdout.write(self.style.SUCCESS(f'Read {responses_read} capture responses, saved {captures_saved} captures.'))
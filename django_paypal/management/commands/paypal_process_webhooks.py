@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from django_paypal.webhook_processing import claim_deliveries, process_delivery
+
+
+class Command(BaseCommand):
+    help = 'Process deferred PayPal webhook deliveries (PAYPAL_WEBHOOK_DEFERRED), including retries and deliveries of crashed workers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Number of deliveries claimed at once.')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Exit once no deliveries are due instead of polling.')
+
+    def handle(self, *args, **options):
+        processed = failed = 0
+        try:
+            while True:
+                close_old_connections()
+                deliveries = claim_deliveries(options['batch_size'])
+                for delivery in deliveries:
+                    if process_delivery(delivery):
+                        processed += 1
+                    else:
+                        failed += 1
+                if not deliveries:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} webhook deliveries, {failed} failed or rescheduled.'))
@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from django_paypal import settings as django_paypal_settings
+from django_paypal.retention import COMPRESSION_EXTENSIONS, prune_audit_records
+
+
+class Command(BaseCommand):
+    help = 'Archive and delete PayPal API post/response data and webhook events older than a given age.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Prune records older than this many days. Defaults to PAYPAL_RETENTION_DAYS.')
+        parser.add_argument('--chunk-size', type=int, help='Rows exported and deleted per transaction.')
+        parser.add_argument(
+            '--archive-dir', help='Directory for the compressed JSON lines archives. Defaults to PAYPAL_RETENTION_ARCHIVE_DIR.'
+        )
+        parser.add_argument('--compression', choices=list(COMPRESSION_EXTENSIONS), help='Archive compression.')
+        parser.add_argument('--no-archive', action='store_true', help='Delete records without archiving them.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the records that would be pruned.')
+        parser.add_argument(
+            '--include-undated', action='store_true', help='Also prune webhook events received before they had a creation date.'
+        )
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between chunks, to reduce database load.')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else django_paypal_settings.PAYPAL_RETENTION_DAYS
+        if days is None:
+            raise CommandError('Pass --days or set PAYPAL_RETENTION_DAYS.')
+        archive_dir = options['archive_dir'] or django_paypal_settings.PAYPAL_RETENTION_ARCHIVE_DIR
+        if not archive_dir and not options['no_archive'] and not options['dry_run']:
+            raise CommandError('Pass --archive-dir (or set PAYPAL_RETENTION_ARCHIVE_DIR), or --no-archive to delete without archiving.')
+        try:
+            all_stats = prune_audit_records(
+                max_age=timedelta(days=days),
+                chunk_size=options['chunk_size'],
+                archive_dir=archive_dir,
+                compression=options['compression'],
+                archive=not options['no_archive'],
+                dry_run=options['dry_run'],
+                include_undated=options['include_undated'],
+                pause=options['pause'],
+            )
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+        for stats in all_stats:
+            verb = 'Would prune' if options['dry_run'] else 'Pruned'
+            line = f'{verb} {stats.rows} {stats.model} records in {stats.duration:.1f}s ({stats.rows_per_second:.0f} rows/s)'
+            if stats.archive_path:
+                line += f', archived {stats.bytes_archived} bytes (uncompressed) to {stats.archive_path}'
+            self.stdout.write(line)
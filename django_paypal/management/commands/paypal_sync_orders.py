@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from django_paypal.sync import get_stale_orders, sync_orders
+from django_paypal.webhooks import get_default_credentials
+from django_paypal.wrappers import PaypalWrapper
+
+
+class Command(BaseCommand):
+    help = 'Refresh status and capture ids of stale PayPal orders from the PayPal API.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=int, help='Only sync orders older than this many seconds.')
+        parser.add_argument('--sync-interval', type=int, help='Only sync orders not synced for this many seconds.')
+        parser.add_argument('--chunk-size', type=int, help='Number of orders fetched and updated per chunk.')
+        parser.add_argument('--concurrency', type=int, help='Number of concurrent requests to PayPal.')
+        parser.add_argument('--rate-limit', type=float, help='Max. requests per second to PayPal.')
+        parser.add_argument('--limit', type=int, help='Stop after this many orders, the next run continues from there.')
+        parser.add_argument('--resume-from', type=int, help='Start after this primary key instead of the stored cursor.')
+        parser.add_argument('--reset', action='store_true', help='Ignore the stored cursor and start from the beginning.')
+
+    def handle(self, *args, **options):
+        cursor = options['resume_from']
+        if options['reset']:
+            cursor = 0
+        stats = sync_orders(
+            PaypalWrapper.for_credentials(get_default_credentials()),
+            queryset=get_stale_orders(min_age=options['min_age'], sync_interval=options['sync_interval']),
+            chunk_size=options['chunk_size'],
+            concurrency=options['concurrency'],
+            rate_limit=options['rate_limit'],
+            cursor=cursor,
+            limit=options['limit'],
+        )
+        self.stdout.write(f'Checked {stats.checked} orders: {stats.updated} updated, {stats.failed} failed.')
+        if stats.finished:
+            self.stdout.write(self.style.SUCCESS('All stale orders synced.'))
+        else:
+            self.stdout.write(f'Stopped after order pk {stats.cursor}, the next run continues from there.')
@@ -0,0 +1,165 @@
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+from django_paypal import settings as django_paypal_settings
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+# durations are in seconds
+API_CALL_DURATION = 'api_call_duration'  # call_api including the access token, retries and backoff; endpoint, operation, status
+API_REQUEST_DURATION = 'api_request_duration'  # a single HTTP request to PayPal; endpoint, operation, status
+API_REQUEST_RETRIES = 'api_request_retries'  # endpoint, operation, status
+ACCESS_TOKEN_CACHE = 'access_token_cache'  # result: 'local', 'shared' (Django cache) or 'miss'
+PERSISTENCE_DURATION = 'persistence_duration'  # database writes of create_order/capture_order; operation
+WEBHOOK_HANDLING_DURATION = 'webhook_handling_duration'  # event_type, result: 'processed', 'duplicate', 'ignored' or 'error'
+RATE_LIMIT_WAIT = 'rate_limit_wait'  # time spent waiting for the client-side rate limit; endpoint, priority
+
+_metrics: Optional['MetricsBackend'] = None
+_metrics_lock = threading.Lock()
+
+
+class MetricsBackend(object):
+    """
+    Receives the timings and counters of django_paypal. Tags are low-cardinality strings (no urls or order ids).
+    """
+
+    def timing(self, name: str, seconds: float, tags: Dict[str, str]):
+        raise NotImplementedError
+
+    def increment(self, name: str, tags: Dict[str, str], value: int = 1):
+        raise NotImplementedError
+
+
+class NoopMetricsBackend(MetricsBackend):
+    def timing(self, name: str, seconds: float, tags: Dict[str, str]):
+        pass
+
+    def increment(self, name: str, tags: Dict[str, str], value: int = 1):
+        pass
+
+
+class PrometheusMetricsBackend(MetricsBackend):
+    """
+    Records timings as prometheus_client Histograms (`<prefix>_<name>_seconds`) and counters as Counters (`<prefix>_<name>_total`)
+    in the default registry, labelled with the tags.
+    """
+
+    def __init__(self, prefix: str = 'paypal', buckets: Optional[Tuple[float, ...]] = None):
+        if prometheus_client is None:
+            raise ImproperlyConfigured('PAYPAL_METRICS_BACKEND = "prometheus" requires prometheus_client (pip install prometheus-client)')
+        self.prefix = prefix
+        self.buckets = buckets or prometheus_client.Histogram.DEFAULT_BUCKETS
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_metric(self, metric_class, name: str, tags: Dict[str, str], **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = metric_class(
+                        f'{self.prefix}_{name}', f'django_paypal {name.replace("_", " ")}', labelnames=sorted(tags), **kwargs
+                    )
+        return metric.labels(**tags) if tags else metric
+
+    def timing(self, name: str, seconds: float, tags: Dict[str, str]):
+        self._get_metric(prometheus_client.Histogram, name, tags, unit='seconds', buckets=self.buckets).observe(seconds)
+
+    def increment(self, name: str, tags: Dict[str, str], value: int = 1):
+        self._get_metric(prometheus_client.Counter, name, tags).inc(value)
+
+
+class StatsDMetricsBackend(MetricsBackend):
+    """
+    Sends timings (in milliseconds) and counters as StatsD datagrams over UDP, with DogStatsD style tags
+    (`<prefix>.<name>:12.5|ms|#endpoint:orders,status:201`). Sending never blocks or raises.
+    """
+
+    def __init__(self, host: str = 'localhost', port: int = 8125, prefix: str = 'paypal'):
+        self.prefix = prefix
+        family, _type, _proto, _name, self._address = socket.getaddrinfo(host, port, type=socket.SOCK_DGRAM)[0]  # resolved once
+        self._socket = socket.socket(family, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+
+    def _send(self, name: str, value: str, metric_type: str, tags: Dict[str, str]):
+        line = f'{self.prefix}.{name}:{value}|{metric_type}'
+        if tags:
+            line += '|#' + ','.join(f'{key}:{tag}' for key, tag in tags.items())
+        try:
+            self._socket.sendto(line.encode('utf-8'), self._address)
+        except OSError:
+            pass  # metrics must not break payments
+
+    def timing(self, name: str, seconds: float, tags: Dict[str, str]):
+        self._send(name, f'{seconds * 1000:.3f}', 'ms', tags)
+
+    def increment(self, name: str, tags: Dict[str, str], value: int = 1):
+        self._send(name, str(value), 'c', tags)
+
+
+METRICS_BACKENDS = {
+    'noop': NoopMetricsBackend,
+    'prometheus': PrometheusMetricsBackend,
+    'statsd': StatsDMetricsBackend,
+}
+
+
+def get_metrics() -> MetricsBackend:
+    """
+    Return the process-wide metrics backend configured by `PAYPAL_METRICS_BACKEND` ('noop', 'prometheus', 'statsd' or a dotted path).
+    """
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                backend_class = METRICS_BACKENDS.get(django_paypal_settings.PAYPAL_METRICS_BACKEND)
+                if backend_class is None:
+                    try:
+                        backend_class = import_string(django_paypal_settings.PAYPAL_METRICS_BACKEND)
+                    except ImportError as e:
+                        raise ImproperlyConfigured(f'Invalid PAYPAL_METRICS_BACKEND: {e}') from e
+                if issubclass(backend_class, PrometheusMetricsBackend):
+                    _metrics = backend_class(prefix=django_paypal_settings.PAYPAL_METRICS_PREFIX)
+                elif issubclass(backend_class, StatsDMetricsBackend):
+                    _metrics = backend_class(
+                        host=django_paypal_settings.PAYPAL_METRICS_STATSD_HOST,
+                        port=django_paypal_settings.PAYPAL_METRICS_STATSD_PORT,
+                        prefix=django_paypal_settings.PAYPAL_METRICS_PREFIX,
+                    )
+                else:
+                    _metrics = backend_class()
+    return _metrics
+
+
+def get_status_tag(e: Optional[BaseException] = None, status_code: Optional[int] = None) -> str:
+    """
+    The HTTP status code of a response or failed call, or the exception class for calls without a response (e.g. 'ConnectTimeout').
+    """
+    if e is None:
+        return str(status_code) if status_code else 'ok'
+    response = getattr(e, 'response', None)
+    if response is not None and getattr(response, 'status_code', None):
+        return str(response.status_code)
+    return type(e).__name__
+
+
+@contextmanager
+def timed(name: str, **tags: str) -> Iterator[Dict[str, str]]:
+    """
+    Record the duration of the block as the timing `name`, also when it raises. The block may change the yielded tags.
+    """
+    start = time.monotonic()
+    try:
+        yield tags
+    finally:
+        get_metrics().timing(name, time.monotonic() - start, tags)
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_paypal', '0009_auto_20250410_0631'),
+    ]
+
+    operations = [
+        # added without auto_now_add first, which would fill existing rows with the time of the migration instead of null
+        migrations.AddField(
+            model_name='paypalorder',
+            name='created_at',
+            field=models.DateTimeField(null=True, verbose_name='created at'),
+        ),
+        migrations.AlterField(
+            model_name='paypalorder',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, null=True, verbose_name='created at'),
+        ),
+        migrations.AddField(
+            model_name='paypalorder',
+            name='last_synced_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='last synced at'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+try:
+    # Django 3.1 and newer
+    from django.db.models import JSONField
+except ImportError:
+    # Django 2.2
+    from django.contrib.postgres.fields.jsonb import JSONField
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_paypal', '0010_paypalorder_sync_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaypalCapture',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('capture_id', models.CharField(max_length=255, unique=True, verbose_name='Capture ID')),
+                ('status', models.CharField(blank=True, db_index=True, max_length=255, verbose_name='Status')),
+                ('amount', models.DecimalField(db_index=True, decimal_places=2, max_digits=19, null=True, verbose_name='Amount')),
+                ('currency', models.CharField(blank=True, db_index=True, max_length=3, verbose_name='Currency')),
+                ('final_capture', models.BooleanField(null=True, verbose_name='Final Capture')),
+                ('create_time', models.DateTimeField(db_index=True, null=True, verbose_name='Create Time')),
+                ('update_time', models.DateTimeField(null=True, verbose_name='Update Time')),
+                ('capture_data', JSONField(verbose_name='Capture Data')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='paypal_captures', to='django_paypal.paypalorder')),
+            ],
+            options={
+                'ordering': ('create_time', 'pk'),
+            },
+        ),
+    ]
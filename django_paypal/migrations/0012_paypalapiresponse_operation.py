@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_paypal', '0011_paypalcapture'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paypalapiresponse',
+            name='operation',
+            field=models.CharField(blank=True, choices=[('oauth', 'OAuth token'), ('create', 'Create order'), ('capture', 'Capture order'), ('details', 'Order details'), ('webhook_setup', 'Setup webhook'), ('webhook_list', 'List webhooks'), ('webhook_update', 'Update webhook'), ('webhook_delete', 'Delete webhook'), ('webhook_verify', 'Verify webhook event')], db_index=True, max_length=32, verbose_name='Operation'),
+        ),
+        migrations.AddIndex(
+            model_name='paypalapiresponse',
+            index=models.Index(fields=['order', 'operation', 'created_at'], name='paypal_response_order_op_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations, transaction
+from django.db.models import Max, Min
+
+CHUNK_SIZE = 10000
+
+
+def backfill_operation(apps, schema_editor):
+    PaypalAPIResponse = apps.get_model('django_paypal', 'PaypalAPIResponse')
+    db_alias = schema_editor.connection.alias
+    responses = PaypalAPIResponse.objects.using(db_alias).filter(operation='')
+    bounds = responses.aggregate(min_pk=Min('pk'), max_pk=Max('pk'))
+    if bounds['min_pk'] is None:
+        return
+    # walk primary key ranges and commit every chunk, so large tables are not locked by one long transaction
+    for start in range(bounds['min_pk'], bounds['max_pk'] + 1, CHUNK_SIZE):
+        chunk = responses.filter(pk__gte=start, pk__lt=start + CHUNK_SIZE)
+        with transaction.atomic(using=db_alias):
+            # only create_order and capture_order stored their responses so far
+            chunk.filter(url__endswith='/capture').update(operation='capture')
+            chunk.update(operation='create')
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('django_paypal', '0012_paypalapiresponse_operation'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_operation, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_paypal', '0013_backfill_paypalapiresponse_operation'),
+    ]
+
+    operations = [
+        # added without auto_now_add first, which would fill existing rows with the time of the migration instead of null
+        migrations.AddField(
+            model_name='paypalwebhookevent',
+            name='created_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='paypalwebhookevent',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, null=True),
+        ),
+    ]
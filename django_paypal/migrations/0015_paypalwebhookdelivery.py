@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:22
+
+import django.utils.timezone
+from django.db import migrations, models
+try:
+    # Django 3.1 and newer
+    from django.db.models import JSONField
+except ImportError:
+    # Django 2.2
+    from django.contrib.postgres.fields.jsonb import JSONField
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_paypal', '0014_paypalwebhookevent_created_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaypalWebhookDelivery',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.CharField(max_length=255, verbose_name='URL')),
+                ('headers', JSONField(verbose_name='Headers')),
+                ('body', models.TextField(verbose_name='Body')),
+                ('event_type', models.CharField(blank=True, max_length=255, verbose_name='Event Type')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20, verbose_name='Status')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Attempts')),
+                ('last_error', models.TextField(blank=True, verbose_name='Last Error')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Available At')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='processed at')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'available_at'], name='paypal_delivery_queue_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_paypal', '0015_paypalwebhookdelivery'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paypalwebhookevent',
+            name='event_id',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True, verbose_name='Event ID'),
+        ),
+        migrations.AddField(
+            model_name='paypalwebhookevent',
+            name='transmission_id',
+            field=models.CharField(blank=True, db_index=True, max_length=255, verbose_name='Transmission ID'),
+        ),
+    ]
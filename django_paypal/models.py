@@ -4,11 +4,12 @@ from __future__ import unicode_literals
 from decimal import Decimal
 from typing import List
 
-from dataclass_wizard import fromdict
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from django_paypal.api_types import Capture
+from django_paypal.serialization import from_dict
 
 try:
     # Django 3.1 and newer
@@ -18,22 +19,43 @@ except ImportError:
     from django.contrib.postgres.fields import JSONField
 
 
+class PaypalAPIOperation:
+    OAUTH = 'oauth'
+    CREATE = 'create'
+    CAPTURE = 'capture'
+    DETAILS = 'details'
+    WEBHOOK_SETUP = 'webhook_setup'
+    WEBHOOK_LIST = 'webhook_list'
+    WEBHOOK_UPDATE = 'webhook_update'
+    WEBHOOK_DELETE = 'webhook_delete'
+    WEBHOOK_VERIFY = 'webhook_verify'
+
+    CHOICES = (
+        (OAUTH, _('OAuth token')),
+        (CREATE, _('Create order')),
+        (CAPTURE, _('Capture order')),
+        (DETAILS, _('Order details')),
+        (WEBHOOK_SETUP, _('Setup webhook')),
+        (WEBHOOK_LIST, _('List webhooks')),
+        (WEBHOOK_UPDATE, _('Update webhook')),
+        (WEBHOOK_DELETE, _('Delete webhook')),
+        (WEBHOOK_VERIFY, _('Verify webhook event')),
+    )
+
+
 class PaypalOrder(models.Model):
     order_id = models.CharField(_('Order ID'), max_length=255, unique=True)
     status = models.CharField(_('Status'), max_length=255, blank=True)
     capture_id = JSONField(_('Capture ID'), default=list)
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True, null=True)  # null for orders created before it was added
+    last_synced_at = models.DateTimeField(_('last synced at'), null=True, blank=True)
 
     def get_capture_api_responses(self) -> models.QuerySet:
-        return self.api_responses.filter(url__contains=f'/v2/checkout/orders/{self.order_id}/capture')
+        return self.api_responses.filter(operation=PaypalAPIOperation.CAPTURE)
 
     @property
     def captures(self) -> List[Capture]:
-        captures: List[Capture] = list()
-        for capture_response in self.get_capture_api_responses():
-            for purchase_unit in capture_response.response_data.get('purchase_units', []):
-                for capture in purchase_unit.get('payments', {}).get('captures', []):
-                    captures.append(fromdict(Capture, capture))
-        return captures
+        return [from_dict(Capture, capture.capture_data) for capture in self.paypal_captures.all()]
 
 
 class PaypalAPIPostData(models.Model):
@@ -47,9 +69,31 @@ class PaypalAPIResponse(models.Model):
     order = models.ForeignKey(PaypalOrder, related_name='api_responses', on_delete=models.CASCADE)
     post = models.ForeignKey(PaypalAPIPostData, related_name='responses', null=True, on_delete=models.CASCADE)
     url = models.CharField(_('URL'), max_length=255, blank=True)
+    operation = models.CharField(_('Operation'), max_length=32, choices=PaypalAPIOperation.CHOICES, blank=True, db_index=True)
     response_data = JSONField(_('Response Data'))
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['order', 'operation', 'created_at'], name='paypal_response_order_op_idx')]
+
+
+class PaypalCapture(models.Model):
+    order = models.ForeignKey(PaypalOrder, related_name='paypal_captures', on_delete=models.CASCADE)
+    capture_id = models.CharField(_('Capture ID'), max_length=255, unique=True)
+    status = models.CharField(_('Status'), max_length=255, blank=True, db_index=True)
+    amount = models.DecimalField(_('Amount'), max_digits=19, decimal_places=2, null=True, db_index=True)
+    currency = models.CharField(_('Currency'), max_length=3, blank=True, db_index=True)
+    final_capture = models.BooleanField(_('Final Capture'), null=True)
+    create_time = models.DateTimeField(_('Create Time'), null=True, db_index=True)
+    update_time = models.DateTimeField(_('Update Time'), null=True)
+    capture_data = JSONField(_('Capture Data'))
+
+    class Meta:
+        ordering = ('create_time', 'pk')
+
+    def __str__(self):
+        return self.capture_id
+
 
 class PaypalWebhook(models.Model):
     webhook_id = models.CharField(_('Webhook ID'), max_length=255, unique=True)
@@ -68,6 +112,44 @@ class PaypalWebhookEvent(models.Model):
     payload = JSONField(_('Payload'))
     order = models.ForeignKey(PaypalOrder, related_name='webhook_events', on_delete=models.CASCADE)
     webhook = models.ForeignKey(PaypalWebhook, related_name='events', on_delete=models.CASCADE)
+    # PayPal redelivers an event with the same id, null for events received before it was added
+    event_id = models.CharField(_('Event ID'), max_length=255, unique=True, null=True, blank=True)
+    transmission_id = models.CharField(_('Transmission ID'), max_length=255, blank=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True, null=True)  # null for events received before it was added
+
+
+class PaypalWebhookDelivery(models.Model):
+    """
+    A raw webhook delivery, stored by the webhook views when PAYPAL_WEBHOOK_DEFERRED is enabled and processed afterwards.
+    """
+
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, _('Pending')),
+        (STATUS_PROCESSING, _('Processing')),
+        (STATUS_DONE, _('Done')),
+        (STATUS_FAILED, _('Failed')),
+    )
+
+    url = models.CharField(_('URL'), max_length=255)
+    headers = JSONField(_('Headers'))
+    body = models.TextField(_('Body'))
+    event_type = models.CharField(_('Event Type'), max_length=255, blank=True)
+    status = models.CharField(_('Status'), max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(_('Attempts'), default=0)
+    last_error = models.TextField(_('Last Error'), blank=True)
+    available_at = models.DateTimeField(_('Available At'), default=timezone.now)  # next attempt, or lease end while processing
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+    processed_at = models.DateTimeField(_('processed at'), null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'available_at'], name='paypal_delivery_queue_idx')]
+
+    def __str__(self):
+        return f'{self.event_type} ({self.status})'
 
 
 # The following models solely exist to keep payments made in version <0.3.0 stored in the database.
@@ -0,0 +1,286 @@
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+
+from django_paypal import settings as django_paypal_settings
+from django_paypal.exceptions import PaypalDeadlineExceeded
+from django_paypal.metrics import RATE_LIMIT_WAIT, get_metrics
+
+PRIORITY_HIGH = 'high'  # checkout: tokens, create and capture
+PRIORITY_LOW = 'low'  # background work like the order sync
+
+_rate_limiters: Dict[Tuple[str, str], 'RateLimiter'] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+class TokenBucket(object):
+    """
+    Thread-safe token bucket allowing `rate` calls per second on average, with bursts of up to `capacity` calls.
+    Callers reserve their token right away and then sleep until it is due, so waiting callers are served in order.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1) -> float:
+        """
+        Take `tokens` from the bucket and return the seconds to wait until they are actually available.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def refund(self, tokens: float = 1):
+        """
+        Give back `tokens` taken by reserve or take, e.g. when the caller gave up waiting for them.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + tokens)
+
+    def take(self, tokens: float = 1, keep: float = 0) -> float:
+        """
+        Take `tokens` only if at least `keep` tokens are left in the bucket. Return 0 if they were taken, otherwise the seconds
+        until they could be (without reserving them).
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens - tokens >= keep:
+                self._tokens -= tokens
+                return 0.0
+            return (keep + tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1):
+        delay = self.reserve(tokens)
+        if delay:
+            time.sleep(delay)
+
+    async def aacquire(self, tokens: float = 1):
+        delay = self.reserve(tokens)
+        if delay:
+            await asyncio.sleep(delay)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+
+class RateLimiter(object):
+    """
+    Keeps the API requests of one endpoint family and set of credentials under `rate` per second. Requests with PRIORITY_LOW
+    never use the last (1 - `low_priority_share`) of the budget, which is kept for PRIORITY_HIGH.
+    """
+
+    def __init__(self, endpoint: str, rate: float, low_priority_share: float = 0.5):
+        self.endpoint = endpoint
+        self.rate = rate
+        self.low_priority_share = low_priority_share
+
+    def reserve(self, priority: str = PRIORITY_HIGH) -> Tuple[float, Optional[Any]]:
+        """
+        Return the seconds to wait and the reservation held after waiting, or None if the slot has to be reserved again.
+        """
+        raise NotImplementedError
+
+    async def areserve(self, priority: str = PRIORITY_HIGH) -> Tuple[float, Optional[Any]]:
+        return self.reserve(priority)
+
+    def release(self, reservation: Any):
+        """
+        Give back a reservation that will not be used.
+        """
+        raise NotImplementedError
+
+    async def arelease(self, reservation: Any):
+        self.release(reservation)
+
+    def acquire(self, priority: str = PRIORITY_HIGH, deadline: Optional[float] = None):
+        waited = 0.0
+        while True:
+            delay, reservation = self.reserve(priority)
+            if self._exceeds_deadline(delay, deadline):
+                if reservation is not None:
+                    self.release(reservation)
+                self._raise_deadline_exceeded()
+            if delay:
+                time.sleep(delay)
+                waited += delay
+            if reservation is not None:
+                break
+        self._record_wait(waited, priority)
+
+    async def aacquire(self, priority: str = PRIORITY_HIGH, deadline: Optional[float] = None):
+        waited = 0.0
+        while True:
+            delay, reservation = await self.areserve(priority)
+            if self._exceeds_deadline(delay, deadline):
+                if reservation is not None:
+                    await self.arelease(reservation)
+                self._raise_deadline_exceeded()
+            if delay:
+                await asyncio.sleep(delay)
+                waited += delay
+            if reservation is not None:
+                break
+        self._record_wait(waited, priority)
+
+    def _exceeds_deadline(self, delay: float, deadline: Optional[float]) -> bool:
+        return deadline is not None and time.monotonic() + delay >= deadline
+
+    def _raise_deadline_exceeded(self):
+        raise PaypalDeadlineExceeded(f'Deadline exceeded waiting for the PayPal {self.endpoint} rate limit')
+
+    def _record_wait(self, waited: float, priority: str):
+        if waited:
+            get_metrics().timing(RATE_LIMIT_WAIT, waited, {'endpoint': self.endpoint, 'priority': priority})
+
+
+class LocalRateLimiter(RateLimiter):
+    """
+    Token bucket per process, so the budget is `rate` for every process. High priority requests queue up in order, low priority
+    ones only take a token while the bucket holds more than its reserved part. The reserved part is at most capacity - 1 tokens,
+    so with a bucket of one or two tokens low priority requests still get through whenever the bucket is full.
+    """
+
+    def __init__(self, endpoint: str, rate: float, low_priority_share: float = 0.5, capacity: Optional[float] = None):
+        super().__init__(endpoint, rate, low_priority_share=low_priority_share)
+        self.bucket = TokenBucket(rate, capacity)
+        self.reserved_tokens = max(0.0, min(self.bucket.capacity * (1 - low_priority_share), self.bucket.capacity - 1))
+
+    def reserve(self, priority: str = PRIORITY_HIGH) -> Tuple[float, Optional[float]]:
+        if priority == PRIORITY_HIGH:
+            return self.bucket.reserve(), 1
+        delay = self.bucket.take(keep=self.reserved_tokens)
+        return delay, None if delay else 1
+
+    def release(self, reservation: float):
+        self.bucket.refund(reservation)
+
+
+class CacheRateLimiter(RateLimiter):
+    """
+    Counts requests in fixed windows of `window` seconds in a Django cache, so all processes sharing the cache share one budget.
+    A request that finds its window full books a slot in the next window with room, at most `max_windows` ahead.
+    The cache must support atomic incr (e.g. Redis or Memcached) to be exact across processes. aacquire uses the async cache API.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        rate: float,
+        storage: BaseCache,
+        low_priority_share: float = 0.5,
+        window: float = 1,
+        max_windows: int = 10,
+        cache_key: str = 'django-paypal-rate-limit-{endpoint}',
+    ):
+        super().__init__(endpoint, rate, low_priority_share=low_priority_share)
+        self.storage = storage
+        self.window = window
+        self.max_windows = max_windows
+        self.limit = max(1, int(rate * window))
+        self.low_priority_limit = max(1, int(self.limit * low_priority_share))
+        self.cache_key = cache_key
+
+    def reserve(self, priority: str = PRIORITY_HIGH) -> Tuple[float, Optional[str]]:
+        now = time.time()
+        window = int(now // self.window)
+        for _ in range(self.max_windows):
+            key, timeout = self._get_window_key(window, now)
+            self.storage.add(key, 0, timeout)
+            try:
+                count = self.storage.incr(key)
+            except ValueError:  # evicted between add and incr
+                self.storage.add(key, 1, timeout)
+                count = 1
+            if count <= self._get_limit(priority):
+                return max(0.0, window * self.window - now), key
+            self.release(key)
+            window += 1
+        # all windows in reach are booked, look again once the first of them is over
+        return self._get_retry_delay(now), None
+
+    async def areserve(self, priority: str = PRIORITY_HIGH) -> Tuple[float, Optional[str]]:
+        now = time.time()
+        window = int(now // self.window)
+        for _ in range(self.max_windows):
+            key, timeout = self._get_window_key(window, now)
+            await self.storage.aadd(key, 0, timeout)
+            try:
+                count = await self.storage.aincr(key)
+            except ValueError:
+                await self.storage.aadd(key, 1, timeout)
+                count = 1
+            if count <= self._get_limit(priority):
+                return max(0.0, window * self.window - now), key
+            await self.arelease(key)
+            window += 1
+        return self._get_retry_delay(now), None
+
+    def release(self, reservation: str):
+        try:
+            self.storage.decr(reservation)
+        except ValueError:  # the window is over already
+            pass
+
+    async def arelease(self, reservation: str):
+        try:
+            await self.storage.adecr(reservation)
+        except ValueError:
+            pass
+
+    def _get_limit(self, priority: str) -> int:
+        return self.limit if priority == PRIORITY_HIGH else self.low_priority_limit
+
+    def _get_window_key(self, window: int, now: float) -> Tuple[str, float]:
+        return f'{self.cache_key}-{window}', (window + 1) * self.window - now + 1
+
+    def _get_retry_delay(self, now: float) -> float:
+        return (int(now // self.window) + 1) * self.window - now
+
+
+def _get_storage() -> Optional[BaseCache]:
+    if django_paypal_settings.PAYPAL_RATE_LIMIT_CACHE:
+        return caches[django_paypal_settings.PAYPAL_RATE_LIMIT_CACHE]
+    return None
+
+
+def get_rate_limiter(endpoint: str, auth_hash: str) -> Optional[RateLimiter]:
+    """
+    Return the rate limiter of an endpoint family and set of credentials, or None if `PAYPAL_RATE_LIMITS` has no rate for it.
+    """
+    rate = django_paypal_settings.PAYPAL_RATE_LIMITS.get(endpoint)
+    if not rate:
+        return None
+    rate_limiter = _rate_limiters.get((endpoint, auth_hash))
+    if rate_limiter is None:
+        with _rate_limiters_lock:
+            rate_limiter = _rate_limiters.get((endpoint, auth_hash))
+            if rate_limiter is None:
+                storage = _get_storage()
+                if storage is None:
+                    rate_limiter = LocalRateLimiter(
+                        endpoint, rate, low_priority_share=django_paypal_settings.PAYPAL_RATE_LIMIT_LOW_PRIORITY_SHARE
+                    )
+                else:
+                    rate_limiter = CacheRateLimiter(
+                        endpoint,
+                        rate,
+                        storage,
+                        low_priority_share=django_paypal_settings.PAYPAL_RATE_LIMIT_LOW_PRIORITY_SHARE,
+                        cache_key=django_paypal_settings.PAYPAL_RATE_LIMIT_CACHE_KEY.format(endpoint=endpoint, auth_hash=auth_hash),
+                    )
+                _rate_limiters[(endpoint, auth_hash)] = rate_limiter
+    return rate_limiter
@@ -0,0 +1,162 @@
+import gzip
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import IO, List, Optional
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, router, transaction
+from django.utils import timezone
+
+from django_paypal import settings as django_paypal_settings
+from django_paypal.models import PaypalAPIPostData, PaypalAPIResponse, PaypalWebhookDelivery, PaypalWebhookEvent
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_EXTENSIONS = {'gzip': 'gz', 'zstd': 'zst'}
+
+
+@dataclass
+class PruneStats:
+    model: str
+    rows: int = 0
+    bytes_archived: int = 0
+    duration: float = 0
+    archive_path: Optional[str] = None
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.duration if self.duration else 0.0
+
+
+def open_archive(path: str, compression: str) -> IO[bytes]:
+    if compression == 'gzip':
+        return gzip.open(path, 'wb')
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ImproperlyConfigured('zstd compression requires the zstandard package (pip install zstandard)')
+        return zstandard.ZstdCompressor().stream_writer(open(path, 'wb'))
+    raise ImproperlyConfigured(f'Unknown compression {compression!r}, use one of {", ".join(COMPRESSION_EXTENSIONS)}')
+
+
+def prune_queryset(
+    queryset: models.QuerySet,
+    chunk_size: int = 1000,
+    archive: Optional[IO[bytes]] = None,
+    dry_run: bool = False,
+    pause: float = 0,
+) -> PruneStats:
+    """
+    Delete the rows of `queryset` in primary key order, `chunk_size` rows per transaction, after writing them to `archive` as JSON lines.
+    Each chunk is flushed to the archive before it is deleted. With `dry_run` the rows are only counted.
+    """
+    stats = PruneStats(model=queryset.model._meta.label)
+    db = router.db_for_write(queryset.model)
+    queryset = queryset.using(db).order_by('pk')
+    start = time.monotonic()
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        pks = list(chunk.values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            break
+        last_pk = pks[-1]
+        stats.rows += len(pks)
+        if dry_run:
+            continue
+        if archive is not None:
+            lines = ''.join(
+                json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in queryset.model.objects.using(db).filter(pk__in=pks).values()
+            )
+            data = lines.encode('utf-8')
+            archive.write(data)
+            archive.flush()
+            stats.bytes_archived += len(data)
+        with transaction.atomic(using=db):
+            queryset.model.objects.using(db).filter(pk__in=pks).delete()
+        if pause:
+            time.sleep(pause)
+    stats.duration = time.monotonic() - start
+    return stats
+
+
+def get_expired_querysets(max_age: timedelta, include_undated: bool = False) -> List[models.QuerySet]:
+    """
+    Return the querysets of records older than `max_age`, in the order they can be deleted.
+    Webhook events received before PaypalWebhookEvent.created_at existed are only included with `include_undated`.
+    """
+    cutoff = timezone.now() - max_age
+    webhook_events = PaypalWebhookEvent.objects.filter(created_at__lt=cutoff)
+    if include_undated:
+        webhook_events = PaypalWebhookEvent.objects.filter(models.Q(created_at__lt=cutoff) | models.Q(created_at__isnull=True))
+    return [
+        PaypalAPIResponse.objects.filter(created_at__lt=cutoff),
+        # posts with newer responses are kept, deleting them would cascade to the responses
+        PaypalAPIPostData.objects.filter(created_at__lt=cutoff).exclude(responses__created_at__gte=cutoff),
+        webhook_events,
+        # pending and failed deliveries are kept for the worker and for inspection
+        PaypalWebhookDelivery.objects.filter(status=PaypalWebhookDelivery.STATUS_DONE, created_at__lt=cutoff),
+    ]
+
+
+def prune_audit_records(
+    max_age: Optional[timedelta] = None,
+    chunk_size: Optional[int] = None,
+    archive_dir: Optional[str] = None,
+    compression: Optional[str] = None,
+    archive: bool = True,
+    dry_run: bool = False,
+    include_undated: bool = False,
+    pause: float = 0,
+) -> List[PruneStats]:
+    """
+    Archive and delete PaypalAPIResponse, PaypalAPIPostData, PaypalWebhookEvent and processed PaypalWebhookDelivery records older than `max_age`
+    (default `PAYPAL_RETENTION_DAYS`). Can be called from a periodic task (cron, Celery beat, ...).
+    Writes one `<model>-<timestamp>.jsonl.<gz|zst>` file per model to `archive_dir` (default `PAYPAL_RETENTION_ARCHIVE_DIR`),
+    with `archive=False` or without an archive directory the records are deleted without being archived.
+    """
+    if max_age is None:
+        if django_paypal_settings.PAYPAL_RETENTION_DAYS is None:
+            logger.info('PAYPAL_RETENTION_DAYS is not set, keeping all PayPal audit records')
+            return []
+        max_age = timedelta(days=django_paypal_settings.PAYPAL_RETENTION_DAYS)
+    chunk_size = chunk_size or django_paypal_settings.PAYPAL_RETENTION_CHUNK_SIZE
+    archive_dir = archive_dir or django_paypal_settings.PAYPAL_RETENTION_ARCHIVE_DIR
+    compression = compression or django_paypal_settings.PAYPAL_RETENTION_COMPRESSION
+    if compression not in COMPRESSION_EXTENSIONS:
+        raise ImproperlyConfigured(f'Unknown compression {compression!r}, use one of {", ".join(COMPRESSION_EXTENSIONS)}')
+
+    timestamp = timezone.now().strftime('%Y%m%dT%H%M%S')
+    all_stats = []
+    for queryset in get_expired_querysets(max_age, include_undated=include_undated):
+        if dry_run or not archive or not archive_dir:
+            all_stats.append(prune_queryset(queryset, chunk_size=chunk_size, dry_run=dry_run, pause=pause))
+            continue
+        os.makedirs(archive_dir, exist_ok=True)
+        path = os.path.join(archive_dir, f'{queryset.model._meta.label_lower}-{timestamp}.jsonl.{COMPRESSION_EXTENSIONS[compression]}')
+        with open_archive(path, compression) as archive_file:
+            stats = prune_queryset(queryset, chunk_size=chunk_size, archive=archive_file, pause=pause)
+        if stats.rows:
+            stats.archive_path = path
+        else:
+            os.remove(path)
+        all_stats.append(stats)
+    for stats in all_stats:
+        logger.info(
+            '%s %d %s records in %.1fs (%.0f rows/s)',
+            'Would prune' if dry_run else 'Pruned',
+            stats.rows,
+            stats.model,
+            stats.duration,
+            stats.rows_per_second,
+        )
+    return all_stats
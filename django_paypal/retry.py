@@ -0,0 +1,77 @@
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Iterable, Mapping, Optional
+
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'])
+REQUEST_ID_HEADER = 'PayPal-Request-Id'
+
+
+class RetryPolicy(object):
+    """
+    Decides whether a failed PayPal API call is retried and how long to wait before the next attempt.
+
+    Requests that may not have reached PayPal (connect errors) are always retried. Everything else is only retried for
+    idempotent methods, for POST requests carrying a `PayPal-Request-Id` header, which PayPal uses to deduplicate them, and for
+    the read-only POST operations in `idempotent_operations`, e.g. verifying a webhook signature.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        backoff_factor: float = 0.5,
+        backoff_max: float = 10,
+        jitter: float = 0.5,
+        status_codes: Iterable[int] = (429, 500, 502, 503, 504),
+        idempotent_operations: Iterable[str] = (),
+    ):
+        self.max_attempts = max_attempts
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+        self.status_codes = frozenset(status_codes)
+        self.idempotent_operations = frozenset(idempotent_operations)
+
+    def is_idempotent(self, method: str, headers: Mapping[str, str], operation: str = '') -> bool:
+        if method in IDEMPOTENT_METHODS or operation in self.idempotent_operations:
+            return True
+        return method == 'POST' and bool(headers.get(REQUEST_ID_HEADER))
+
+    def should_retry(
+        self,
+        attempt: int,
+        method: str,
+        headers: Mapping[str, str],
+        status_code: Optional[int] = None,
+        request_sent: bool = True,
+        operation: str = '',
+    ) -> bool:
+        if attempt >= self.max_attempts:
+            return False
+        if status_code is not None and status_code not in self.status_codes:
+            return False
+        if not request_sent:
+            return True
+        return self.is_idempotent(method, headers, operation)
+
+    def get_delay(self, attempt: int, retry_after: Optional[str] = None) -> Optional[float]:
+        """
+        Return the seconds to wait before the next attempt, or None if the server asks us to wait longer than `backoff_max`.
+        """
+        if retry_after:
+            delay = self.parse_retry_after(retry_after)
+            if delay is not None:
+                return delay if delay <= self.backoff_max else None
+        delay = min(self.backoff_max, self.backoff_factor * (2 ** (attempt - 1)))
+        return delay + random.uniform(0, delay * self.jitter)
+
+    @staticmethod
+    def parse_retry_after(retry_after: str) -> Optional[float]:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+        except (TypeError, ValueError, IndexError):
+            return None
@@ -0,0 +1,107 @@
+"""
+Fast (de)serialization of the api_types dataclasses.
+
+Per-class encoders are generated once, on first use, from the dataclass fields. Decoding is left to dataclass_wizard, which
+generates its own loaders and is as fast as a generated decoder would be.
+"""
+
+import dataclasses
+import json
+import threading
+from typing import Any, Callable, Dict, Type, TypeVar, Union, get_args, get_origin, get_type_hints
+
+from dataclass_wizard import fromdict
+from django.core.exceptions import ImproperlyConfigured
+
+from django_paypal import settings as django_paypal_settings
+from django_paypal.utils import is_optional, strip_optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+T = TypeVar('T')
+
+_encoders: Dict[type, Callable[[Any], Dict[str, Any]]] = {}
+_lock = threading.RLock()
+
+
+def _gen_encode(tp, src: str, ns: Dict[str, Any]) -> str:
+    """
+    Return an expression converting `src` (annotated as `tp`) to JSON compatible data.
+    """
+    if is_optional(tp):
+        return f'(None if {src} is None else {_gen_encode(strip_optional(tp), src, ns)})'
+    origin = get_origin(tp)
+    if dataclasses.is_dataclass(tp):
+        name = f'_encode_{len(ns)}'
+        ns[name] = _get_encoder(tp)
+        ns[f'{name}_cls'] = tp
+        # instances of a subclass carry more fields than the annotated class
+        return f'({name}({src}) if type({src}) is {name}_cls else to_dict({src}))'
+    if origin is list:
+        args = get_args(tp)
+        if args and dataclasses.is_dataclass(args[0]):
+            return f'[{_gen_encode(args[0], "_item", ns)} for _item in {src}]'
+        return f'list({src})'
+    return src
+
+
+def _build_encoder(cls: type) -> Callable[[Any], Dict[str, Any]]:
+    hints = get_type_hints(cls)
+    ns: Dict[str, Any] = {'to_dict': to_dict}
+    items = [f'        {field.name!r}: {_gen_encode(hints[field.name], "obj." + field.name, ns)},' for field in dataclasses.fields(cls)]
+    exec('\n'.join(['def encode(obj):', '    return {'] + items + ['    }']), ns)
+    return ns['encode']
+
+
+def _get_encoder(cls: type) -> Callable[[Any], Dict[str, Any]]:
+    encoder = _encoders.get(cls)
+    if encoder is None:
+        with _lock:
+            encoder = _encoders.get(cls)
+            if encoder is None:
+                built = []
+                _encoders[cls] = lambda obj: built[0](obj)
+                built.append(_build_encoder(cls))
+                encoder = _encoders[cls] = built[0]
+    return encoder
+
+
+def from_dict(cls: Type[T], data: Dict[str, Any]) -> T:
+    """
+    Same as `cls.from_dict(data)`, for api_types classes and their subclasses alike.
+    """
+    return fromdict(cls, data)
+
+
+def to_dict(obj: Any) -> Dict[str, Any]:
+    """
+    Same as `obj.to_dict()` of the api_types with snake_case keys (all fields, None included), with a generated encoder.
+    """
+    return _get_encoder(type(obj))(obj)
+
+
+def dumps(data: Any) -> bytes:
+    """
+    Serialize a request body with the JSON library configured by `PAYPAL_JSON_LIBRARY`.
+    """
+    if django_paypal_settings.PAYPAL_JSON_LIBRARY == 'orjson':
+        return _get_orjson().dumps(data)
+    return json.dumps(data, allow_nan=False).encode('utf-8')
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    Parse a response body with the JSON library configured by `PAYPAL_JSON_LIBRARY`.
+    """
+    if django_paypal_settings.PAYPAL_JSON_LIBRARY == 'orjson':
+        return _get_orjson().loads(data)
+    return json.loads(data)
+
+
+def _get_orjson():
+    if orjson is None:
+        raise ImproperlyConfigured('PAYPAL_JSON_LIBRARY = "orjson" requires the orjson package (pip install django-paypal-plus[orjson])')
+    return orjson
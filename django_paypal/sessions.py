@@ -0,0 +1,94 @@
+import asyncio
+import os
+import threading
+import weakref
+from http.cookiejar import DefaultCookiePolicy
+from typing import Optional
+
+import requests
+from django.core.exceptions import ImproperlyConfigured
+from requests.adapters import HTTPAdapter
+
+from django_paypal import settings as django_paypal_settings
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+_session: Optional[requests.Session] = None
+_session_pid: Optional[int] = None
+_session_lock = threading.Lock()
+
+# httpx connection pools are bound to the event loop they were opened in, so there is one client per running loop
+_async_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]' = weakref.WeakKeyDictionary()
+
+
+def _build_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=django_paypal_settings.PAYPAL_HTTP_POOL_CONNECTIONS,
+        pool_maxsize=django_paypal_settings.PAYPAL_HTTP_POOL_MAXSIZE,
+        pool_block=django_paypal_settings.PAYPAL_HTTP_POOL_BLOCK,
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    # the session is shared between threads and API credentials, so it must never carry cookies from one call to the next
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    Return the process-wide, connection-pooled session used for all PayPal API calls.
+    A new session is created lazily after a fork, so pooled sockets are never shared between worker processes.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                _session = _build_session()
+                _session_pid = pid
+    return _session
+
+
+def close_session() -> None:
+    global _session, _session_pid
+    with _session_lock:
+        if _session is not None and _session_pid == os.getpid():
+            _session.close()
+        _session = None
+        _session_pid = None
+
+
+def require_httpx():
+    if httpx is None:
+        raise ImproperlyConfigured('AsyncPaypalWrapper requires httpx. Install it with "pip install django-paypal-plus[async]".')
+
+
+def get_async_client() -> 'httpx.AsyncClient':
+    """
+    Return the connection-pooled httpx client of the running event loop, used by AsyncPaypalWrapper.
+    """
+    require_httpx()
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=django_paypal_settings.PAYPAL_HTTP_ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=django_paypal_settings.PAYPAL_HTTP_ASYNC_MAX_CONNECTIONS,
+            ),
+            timeout=httpx.Timeout(
+                django_paypal_settings.PAYPAL_HTTP_READ_TIMEOUT, connect=django_paypal_settings.PAYPAL_HTTP_CONNECT_TIMEOUT
+            ),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def aclose_async_client() -> None:
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
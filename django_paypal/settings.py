@@ -14,9 +14,100 @@ PAYPAL_SANDBOX = getattr(settings, 'PAYPAL_SANDBOX', True)
 PAYPAL_AUTH_URL = getattr(settings, 'PAYPAL_AUTH_URL', '/v1/oauth2/token')
 PAYPAL_AUTH_CACHE_TIMEOUT = getattr(settings, 'PAYPAL_AUTH_CACHE_TIMEOUT', 600)  # 10 minutes
 PAYPAL_AUTH_CACHE_KEY = getattr(settings, 'PAYPAL_AUTH_CACHE_KEY', 'django-paypal-auth-{auth_hash}')
+PAYPAL_AUTH_LOCAL_CACHE_TIMEOUT = getattr(settings, 'PAYPAL_AUTH_LOCAL_CACHE_TIMEOUT', 60)  # in-process token cache, 0 to disable
+PAYPAL_AUTH_REFRESH_MARGIN = getattr(settings, 'PAYPAL_AUTH_REFRESH_MARGIN', 60)  # seconds before expiry to renew tokens in the background
+PAYPAL_AUTH_DISTRIBUTED_LOCK = getattr(settings, 'PAYPAL_AUTH_DISTRIBUTED_LOCK', False)  # single-flight token refresh across processes
+PAYPAL_AUTH_LOCK_KEY = getattr(settings, 'PAYPAL_AUTH_LOCK_KEY', 'django-paypal-auth-lock-{auth_hash}')
+PAYPAL_AUTH_LOCK_TIMEOUT = getattr(settings, 'PAYPAL_AUTH_LOCK_TIMEOUT', 30)  # seconds
 PAYPAL_ORDERS_API_ENDPOINT = getattr(settings, 'PAYPAL_ORDERS_API_ENDPOINT', '/v2/checkout/orders')
 PAYPAL_WEBHOOK_LISTENER = getattr(settings, 'PAYPAL_WEBHOOK_LISTENER', None)
 
+# http connection pool
+PAYPAL_HTTP_POOL_CONNECTIONS = getattr(settings, 'PAYPAL_HTTP_POOL_CONNECTIONS', 10)  # number of hosts to keep pools for
+PAYPAL_HTTP_POOL_MAXSIZE = getattr(settings, 'PAYPAL_HTTP_POOL_MAXSIZE', 10)  # max. keep-alive connections per host
+PAYPAL_HTTP_POOL_BLOCK = getattr(settings, 'PAYPAL_HTTP_POOL_BLOCK', False)  # wait for a free connection instead of opening a new one
+PAYPAL_HTTP_CONNECT_TIMEOUT = getattr(settings, 'PAYPAL_HTTP_CONNECT_TIMEOUT', 5)  # seconds
+PAYPAL_HTTP_READ_TIMEOUT = getattr(settings, 'PAYPAL_HTTP_READ_TIMEOUT', 30)  # seconds
+PAYPAL_HTTP_OPERATION_TIMEOUTS = getattr(settings, 'PAYPAL_HTTP_OPERATION_TIMEOUTS', {})  # (connect, read) by operation, e.g. 'capture'
+PAYPAL_HTTP_ASYNC_MAX_CONNECTIONS = getattr(settings, 'PAYPAL_HTTP_ASYNC_MAX_CONNECTIONS', 100)  # per event loop, AsyncPaypalWrapper only
+
+# retries of failed API calls
+PAYPAL_RETRY_MAX_ATTEMPTS = getattr(settings, 'PAYPAL_RETRY_MAX_ATTEMPTS', 3)  # including the first attempt, 1 disables retries
+PAYPAL_RETRY_BACKOFF_FACTOR = getattr(settings, 'PAYPAL_RETRY_BACKOFF_FACTOR', 0.5)  # seconds, doubled with every attempt
+PAYPAL_RETRY_BACKOFF_MAX = getattr(settings, 'PAYPAL_RETRY_BACKOFF_MAX', 10)  # seconds, also the longest Retry-After we wait for
+PAYPAL_RETRY_JITTER = getattr(settings, 'PAYPAL_RETRY_JITTER', 0.5)  # random extra delay, as a fraction of the backoff
+PAYPAL_RETRY_STATUS_CODES = getattr(settings, 'PAYPAL_RETRY_STATUS_CODES', (429, 500, 502, 503, 504))
+
+# circuit breaker, failing fast while PayPal is degraded
+PAYPAL_CIRCUIT_BREAKER_ENABLED = getattr(settings, 'PAYPAL_CIRCUIT_BREAKER_ENABLED', False)
+PAYPAL_CIRCUIT_BREAKER_FAILURE_THRESHOLD = getattr(settings, 'PAYPAL_CIRCUIT_BREAKER_FAILURE_THRESHOLD', 5)  # consecutive failures
+PAYPAL_CIRCUIT_BREAKER_SLOW_CALL_THRESHOLD = getattr(settings, 'PAYPAL_CIRCUIT_BREAKER_SLOW_CALL_THRESHOLD', None)  # seconds
+PAYPAL_CIRCUIT_BREAKER_RECOVERY_TIMEOUT = getattr(settings, 'PAYPAL_CIRCUIT_BREAKER_RECOVERY_TIMEOUT', 30)  # seconds
+PAYPAL_CIRCUIT_BREAKER_CACHE = getattr(settings, 'PAYPAL_CIRCUIT_BREAKER_CACHE', None)  # cache alias to share state, None for per process
+PAYPAL_CIRCUIT_BREAKER_CACHE_KEY = getattr(settings, 'PAYPAL_CIRCUIT_BREAKER_CACHE_KEY', 'django-paypal-circuit-{endpoint}')
+
+# client-side rate limits per endpoint family and credentials, keeping the API calls under PayPal's limits
+PAYPAL_RATE_LIMITS = getattr(settings, 'PAYPAL_RATE_LIMITS', {})  # requests per second by 'oauth', 'orders', 'capture' or 'webhooks'
+PAYPAL_RATE_LIMIT_LOW_PRIORITY_SHARE = getattr(settings, 'PAYPAL_RATE_LIMIT_LOW_PRIORITY_SHARE', 0.5)  # of the budget, e.g. the order sync
+PAYPAL_RATE_LIMIT_CACHE = getattr(settings, 'PAYPAL_RATE_LIMIT_CACHE', None)  # cache alias to share the budget, None for per process
+PAYPAL_RATE_LIMIT_CACHE_KEY = getattr(settings, 'PAYPAL_RATE_LIMIT_CACHE_KEY', 'django-paypal-rate-limit-{endpoint}-{auth_hash}')
+
+# deferred webhook processing
+PAYPAL_WEBHOOK_DEFERRED = getattr(settings, 'PAYPAL_WEBHOOK_DEFERRED', False)  # store deliveries and acknowledge them right away
+PAYPAL_WEBHOOK_PROCESSOR = getattr(settings, 'PAYPAL_WEBHOOK_PROCESSOR', 'thread')  # 'thread', 'database' or a dotted path
+PAYPAL_WEBHOOK_THREADS = getattr(settings, 'PAYPAL_WEBHOOK_THREADS', 4)  # workers of the 'thread' processor
+PAYPAL_WEBHOOK_MAX_ATTEMPTS = getattr(settings, 'PAYPAL_WEBHOOK_MAX_ATTEMPTS', 5)
+PAYPAL_WEBHOOK_RETRY_DELAY = getattr(settings, 'PAYPAL_WEBHOOK_RETRY_DELAY', 60)  # seconds, doubled with every attempt
+PAYPAL_WEBHOOK_LEASE_TIMEOUT = getattr(settings, 'PAYPAL_WEBHOOK_LEASE_TIMEOUT', 300)  # seconds before a stuck delivery is picked up again
+
+# registered webhooks are resolved from memory instead of a query per delivery, cleared when a PaypalWebhook is saved or deleted
+# saving or deleting a PaypalWebhook clears the current process and the Django cache, other processes keep their copy up to the timeout
+PAYPAL_WEBHOOK_RESOLVER_TIMEOUT = getattr(settings, 'PAYPAL_WEBHOOK_RESOLVER_TIMEOUT', 5 * 60)  # seconds in process memory, 0 disables
+PAYPAL_WEBHOOK_RESOLVER_CACHE_TIMEOUT = getattr(settings, 'PAYPAL_WEBHOOK_RESOLVER_CACHE_TIMEOUT', None)  # seconds in the Django cache
+PAYPAL_WEBHOOK_RESOLVER_CACHE_KEY = getattr(settings, 'PAYPAL_WEBHOOK_RESOLVER_CACHE_KEY', 'django-paypal-webhooks')
+
+# ids of processed webhook events are remembered in the cache, so redeliveries are acknowledged without a PayPal call or a query
+PAYPAL_WEBHOOK_DEDUPE_TIMEOUT = getattr(settings, 'PAYPAL_WEBHOOK_DEDUPE_TIMEOUT', 60 * 60)  # seconds, 0 disables the cache check
+PAYPAL_WEBHOOK_DEDUPE_CACHE_KEY = getattr(settings, 'PAYPAL_WEBHOOK_DEDUPE_CACHE_KEY', 'django-paypal-webhook-event-{event_id}')
+
+# local webhook signature verification (requires cryptography), falls back to the verify-webhook-signature API
+PAYPAL_WEBHOOK_LOCAL_VERIFICATION = getattr(settings, 'PAYPAL_WEBHOOK_LOCAL_VERIFICATION', True)
+PAYPAL_WEBHOOK_CERT_DOMAINS = getattr(settings, 'PAYPAL_WEBHOOK_CERT_DOMAINS', ('paypal.com',))  # certificates are only fetched from these
+PAYPAL_WEBHOOK_CERT_CACHE_TIMEOUT = getattr(settings, 'PAYPAL_WEBHOOK_CERT_CACHE_TIMEOUT', 60 * 60 * 24)  # seconds
+PAYPAL_WEBHOOK_CERT_CACHE_KEY = getattr(settings, 'PAYPAL_WEBHOOK_CERT_CACHE_KEY', 'django-paypal-webhook-cert-{url_hash}')
+
+# JSON library for request and response bodies: 'json' or 'orjson' (requires orjson)
+PAYPAL_JSON_LIBRARY = getattr(settings, 'PAYPAL_JSON_LIBRARY', 'json')
+
+# HTTP transport of the wrappers, e.g. to record PayPal's responses and replay them without network (see django_paypal.transports)
+PAYPAL_TRANSPORT = getattr(settings, 'PAYPAL_TRANSPORT', 'http')  # 'http', 'recording', 'replay' or a dotted path
+PAYPAL_TRANSPORT_FIXTURES = getattr(settings, 'PAYPAL_TRANSPORT_FIXTURES', None)  # JSON lines file, None replays PaypalAPIResponse
+
+# metrics of API calls, token cache, database writes and webhook handling (see django_paypal.metrics)
+PAYPAL_METRICS_BACKEND = getattr(settings, 'PAYPAL_METRICS_BACKEND', 'noop')  # 'noop', 'prometheus', 'statsd' or a dotted path
+PAYPAL_METRICS_PREFIX = getattr(settings, 'PAYPAL_METRICS_PREFIX', 'paypal')
+PAYPAL_METRICS_STATSD_HOST = getattr(settings, 'PAYPAL_METRICS_STATSD_HOST', 'localhost')
+PAYPAL_METRICS_STATSD_PORT = getattr(settings, 'PAYPAL_METRICS_STATSD_PORT', 8125)
+
+# persistence of PaypalAPIPostData/PaypalAPIResponse
+PAYPAL_AUDIT_WRITER = getattr(settings, 'PAYPAL_AUDIT_WRITER', 'sync')  # 'sync', 'buffered', 'background' or a dotted path
+PAYPAL_AUDIT_BATCH_SIZE = getattr(settings, 'PAYPAL_AUDIT_BATCH_SIZE', 100)  # records per bulk_create
+PAYPAL_AUDIT_FLUSH_INTERVAL = getattr(settings, 'PAYPAL_AUDIT_FLUSH_INTERVAL', 5)  # seconds
+
+# order status sync
+PAYPAL_ORDER_SYNC_MIN_AGE = getattr(settings, 'PAYPAL_ORDER_SYNC_MIN_AGE', 900)  # seconds, orders younger than this are left alone
+PAYPAL_ORDER_SYNC_INTERVAL = getattr(settings, 'PAYPAL_ORDER_SYNC_INTERVAL', 3600)  # seconds between two syncs of the same order
+PAYPAL_ORDER_SYNC_CHUNK_SIZE = getattr(settings, 'PAYPAL_ORDER_SYNC_CHUNK_SIZE', 500)
+PAYPAL_ORDER_SYNC_CONCURRENCY = getattr(settings, 'PAYPAL_ORDER_SYNC_CONCURRENCY', 10)
+PAYPAL_ORDER_SYNC_RATE_LIMIT = getattr(settings, 'PAYPAL_ORDER_SYNC_RATE_LIMIT', None)  # requests per second
+PAYPAL_ORDER_SYNC_CURSOR_KEY = getattr(settings, 'PAYPAL_ORDER_SYNC_CURSOR_KEY', 'django-paypal-order-sync-cursor')
+
+# retention of PaypalAPIPostData/PaypalAPIResponse/PaypalWebhookEvent (manage.py paypal_prune_audit_log)
+PAYPAL_RETENTION_DAYS = getattr(settings, 'PAYPAL_RETENTION_DAYS', None)  # None keeps records forever
+PAYPAL_RETENTION_CHUNK_SIZE = getattr(settings, 'PAYPAL_RETENTION_CHUNK_SIZE', 1000)  # rows exported and deleted per transaction
+PAYPAL_RETENTION_ARCHIVE_DIR = getattr(settings, 'PAYPAL_RETENTION_ARCHIVE_DIR', None)  # None deletes without archiving
+PAYPAL_RETENTION_COMPRESSION = getattr(settings, 'PAYPAL_RETENTION_COMPRESSION', 'gzip')  # 'gzip' or 'zstd' (requires zstandard)
+
 # checkout urls
 PAYPAL_SUCCESS_URL = getattr(settings, 'PAYPAL_SUCCESS_URL', '/')
 PAYPAL_CANCELLATION_URL = getattr(settings, 'PAYDIREKT_CANCELLATION_URL', '/')
@@ -1,6 +1,26 @@
 import django.dispatch
+from asgiref.sync import sync_to_async
 
 order_created = django.dispatch.Signal()
 order_approved = django.dispatch.Signal()
 order_captured = django.dispatch.Signal()
 order_completed = django.dispatch.Signal()
+
+# sent once per call_api, before the access token is fetched, with url, method and operation; and after the call (all retries
+# included) with url, method, operation, duration (seconds), status_code and exception, e.g. to open and close a tracing span
+api_request_started = django.dispatch.Signal()
+api_request_finished = django.dispatch.Signal()
+
+# sent after every attempt of a PayPal API call with url, method, operation, attempt, duration (seconds), exception and retrying
+api_request_attempted = django.dispatch.Signal()
+
+# sent with the endpoint family (oauth, orders, capture, webhooks) when a circuit breaker changes its state
+circuit_breaker_opened = django.dispatch.Signal()
+circuit_breaker_half_opened = django.dispatch.Signal()
+circuit_breaker_closed = django.dispatch.Signal()
+
+
+async def send_async(signal: django.dispatch.Signal, **kwargs):
+    if hasattr(signal, 'asend'):  # Django 5.0 and newer
+        return await signal.asend(**kwargs)
+    return await sync_to_async(signal.send)(**kwargs)
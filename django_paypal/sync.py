@@ -0,0 +1,130 @@
+import logging
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from django.core.cache import cache
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+from django_paypal import settings as django_paypal_settings
+from django_paypal.api_types import OrderDetailAPIResponse
+from django_paypal.captures import build_capture, get_response_captures_data, save_captures
+from django_paypal.models import PaypalOrder
+from django_paypal.wrappers import PaypalWrapper
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_ORDER_STATUSES = ('COMPLETED', 'VOIDED')
+
+
+@dataclass
+class OrderSyncStats:
+    checked: int = 0
+    updated: int = 0
+    failed: int = 0
+    cursor: Optional[int] = None
+    finished: bool = False
+
+
+def get_stale_orders(min_age: Optional[int] = None, sync_interval: Optional[int] = None) -> models.QuerySet:
+    """
+    Return the orders in a non-terminal status that are older than `min_age` seconds and were not synced for `sync_interval` seconds.
+    Orders created before `PaypalOrder.created_at` existed count as old enough.
+    """
+    if min_age is None:
+        min_age = django_paypal_settings.PAYPAL_ORDER_SYNC_MIN_AGE
+    if sync_interval is None:
+        sync_interval = django_paypal_settings.PAYPAL_ORDER_SYNC_INTERVAL
+    now = timezone.now()
+    return (
+        PaypalOrder.objects.exclude(status__in=TERMINAL_ORDER_STATUSES)
+        .filter(Q(created_at__isnull=True) | Q(created_at__lte=now - timedelta(seconds=min_age)))
+        .filter(Q(last_synced_at__isnull=True) | Q(last_synced_at__lte=now - timedelta(seconds=sync_interval)))
+    )
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """
+    True for 4xx responses other than 429, e.g. the 404 of an expired order: fetching the order again won't help.
+    """
+    status_code = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status_code is not None and 400 <= status_code < 500 and status_code != 429
+
+
+def get_capture_ids(order_details: OrderDetailAPIResponse) -> List[str]:
+    capture_ids = []
+    for purchase_unit in order_details.purchase_units or []:
+        if purchase_unit.payments and purchase_unit.payments.captures:
+            capture_ids.extend(capture.id for capture in purchase_unit.payments.captures if capture.id)
+    return capture_ids
+
+
+def sync_orders(
+    paypal_wrapper: PaypalWrapper,
+    queryset: Optional[models.QuerySet] = None,
+    chunk_size: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    rate_limit: Optional[float] = None,
+    cursor: Optional[int] = None,
+    limit: Optional[int] = None,
+) -> OrderSyncStats:
+    """
+    Refresh `status`, `capture_id` and the PaypalCapture rows of stale orders (see get_stale_orders) from PayPal.
+
+    Orders are walked in primary key order, `chunk_size` at a time, and written back with one bulk_update per chunk.
+    After every chunk the last primary key is stored in the Django cache, so an interrupted (or `limit`ed) run continues
+    where it stopped. Pass `cursor` to start after a specific primary key instead; a complete run resets the cursor.
+    Orders that could not be fetched are logged. Permanent failures (4xx other than 429, see is_permanent_error) count as synced
+    and are retried after `PAYPAL_ORDER_SYNC_INTERVAL` like any other order, all other failures are retried on the next run.
+    """
+    if queryset is None:
+        queryset = get_stale_orders()
+    chunk_size = chunk_size or django_paypal_settings.PAYPAL_ORDER_SYNC_CHUNK_SIZE
+    concurrency = concurrency or django_paypal_settings.PAYPAL_ORDER_SYNC_CONCURRENCY
+    if rate_limit is None:
+        rate_limit = django_paypal_settings.PAYPAL_ORDER_SYNC_RATE_LIMIT
+    cursor_key = django_paypal_settings.PAYPAL_ORDER_SYNC_CURSOR_KEY
+    if cursor is None:
+        cursor = cache.get(cursor_key, 0)
+
+    stats = OrderSyncStats(cursor=cursor)
+    queryset = queryset.order_by('pk').only('pk', 'order_id', 'status', 'capture_id')
+    while limit is None or stats.checked < limit:
+        size = chunk_size if limit is None else min(chunk_size, limit - stats.checked)
+        chunk: Dict[str, PaypalOrder] = {order.order_id: order for order in queryset.filter(pk__gt=stats.cursor)[:size]}
+        if not chunk:
+            stats.finished = True
+            cache.delete(cursor_key)
+            break
+
+        synced, captures = [], []
+        for result in paypal_wrapper._fetch_order_details(list(chunk), concurrency=concurrency, rate_limit=rate_limit, lazy=True):
+            if result.error is not None:
+                logger.warning('Could not sync PayPal order %s: %s', result.order_id, result.error)
+                stats.failed += 1
+                if is_permanent_error(result.error):
+                    order = chunk[result.order_id]
+                    order.last_synced_at = timezone.now()
+                    synced.append(order)
+                continue
+            order = chunk[result.order_id]
+            status = result.response.status or order.status
+            capture_ids = order.capture_id + [
+                capture_id for capture_id in get_capture_ids(result.response) if capture_id not in order.capture_id
+            ]
+            if status != order.status or capture_ids != order.capture_id:
+                stats.updated += 1
+            order.status = status
+            order.capture_id = capture_ids
+            order.last_synced_at = timezone.now()
+            synced.append(order)
+            captures.extend(build_capture(order.pk, capture_data) for capture_data in get_response_captures_data(result.response))
+        PaypalOrder.objects.bulk_update(synced, ['status', 'capture_id', 'last_synced_at'])
+        save_captures(captures)
+
+        stats.checked += len(chunk)
+        stats.cursor = max(order.pk for order in chunk.values())
+        cache.set(cursor_key, stats.cursor, None)
+    return stats
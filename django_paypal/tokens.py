@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from django_paypal import settings as django_paypal_settings
+from django_paypal.api_types import OAuthResponse
+
+_token_locks: Dict[str, threading.Lock] = {}
+_token_locks_guard = threading.Lock()
+
+# in-flight token refreshes of AsyncPaypalWrapper, per event loop and cache key
+_async_refreshes: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Task]]' = weakref.WeakKeyDictionary()
+
+
+class LocalTokenCache(object):
+    """
+    Small in-process cache of access tokens keyed by api_auth_hash, in front of Django's cache.
+    Entries expire after `timeout` seconds or with the token itself, whichever comes first.
+    """
+
+    def __init__(self, timeout: int, max_entries: int = 100):
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, Tuple[str, Optional[float], float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, auth_hash: str) -> Tuple[Optional[str], Optional[float]]:
+        entry = self._entries.get(auth_hash)
+        if entry is None:
+            return None, None
+        access_token, expires_at, evict_at = entry
+        if time.monotonic() >= evict_at:
+            self.delete(auth_hash, access_token)
+            return None, None
+        return access_token, expires_at
+
+    def set(self, auth_hash: str, access_token: str, expires_at: Optional[float]):
+        if not self.timeout:
+            return
+        ttl = self.timeout if expires_at is None else min(self.timeout, expires_at - time.time())
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries.pop(auth_hash, None)
+            self._entries[auth_hash] = (access_token, expires_at, time.monotonic() + ttl)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, auth_hash: str, access_token: Optional[str] = None):
+        """
+        Drop the entry of `auth_hash`. If `access_token` is given, only drop it while it still holds that token.
+        """
+        with self._lock:
+            entry = self._entries.get(auth_hash)
+            if entry is not None and (access_token is None or entry[0] == access_token):
+                del self._entries[auth_hash]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_token_cache = LocalTokenCache(django_paypal_settings.PAYPAL_AUTH_LOCAL_CACHE_TIMEOUT)
+
+
+def get_token_lock(cache_key: str) -> threading.Lock:
+    """
+    Return the process-wide lock that serializes token refreshes for one set of API credentials.
+    """
+    lock = _token_locks.get(cache_key)
+    if lock is None:
+        with _token_locks_guard:
+            lock = _token_locks.setdefault(cache_key, threading.Lock())
+    return lock
+
+
+def get_async_token_refreshes() -> Dict[str, asyncio.Task]:
+    return _async_refreshes.setdefault(asyncio.get_running_loop(), {})
+
+
+def build_cache_entry(auth_response: OAuthResponse, cache_timeout: int) -> Tuple[Dict[str, Any], int]:
+    """
+    Return the cache entry for a freshly minted token and the timeout to store it with.
+    The token never outlives the `expires_in` PayPal returned for it.
+    """
+    timeout = min(cache_timeout, auth_response.expires_in) if auth_response.expires_in else cache_timeout
+    return {'access_token': auth_response.access_token, 'expires_at': time.time() + timeout}, timeout
+
+
+def read_cache_entry(value: Any) -> Tuple[Optional[str], Optional[float]]:
+    if not value:
+        return None, None
+    if isinstance(value, str):  # plain tokens cached by versions <= 1.1.9 carry no expiry
+        return value, None
+    return value.get('access_token'), value.get('expires_at')
+
+
+def needs_renewal(expires_at: Optional[float], margin: int) -> bool:
+    return expires_at is not None and time.time() >= expires_at - margin
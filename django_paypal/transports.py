@@ -0,0 +1,299 @@
+import http
+import json
+import logging
+import re
+import secrets
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+from requests.structures import CaseInsensitiveDict
+
+from django_paypal import settings as django_paypal_settings
+from django_paypal.models import PaypalAPIOperation, PaypalAPIResponse
+from django_paypal.sessions import get_async_client, get_session, httpx, require_httpx
+
+logger = logging.getLogger(__name__)
+
+_transport: Optional['Transport'] = None
+_transport_lock = threading.Lock()
+
+# resources addressed by id, the id is matched as a wildcard when replaying
+RESOURCE_PATH_RE = re.compile(
+    r'^(?P<collection>/v\d+/(?:checkout/orders|payments/captures|notifications/webhooks))/(?P<id>[^/]+)(?P<rest>/.*)?$'
+)
+RECORDED_HEADERS = ('Content-Type', 'Retry-After')
+MIN_REWRITTEN_ID_LENGTH = 8  # shorter ids are too likely to appear as other values of a response
+
+Timeout = Optional[Tuple[float, float]]  # (connect, read) in seconds
+
+
+class Transport(object):
+    """
+    Sends the HTTP requests of the wrappers: `send` for PaypalWrapper returns a requests.Response, `asend` for AsyncPaypalWrapper
+    an httpx.Response. `data` is the encoded body or a dict of form fields.
+    """
+
+    def send(self, method: str, url: str, headers: Dict[str, str], data=None, auth=None, timeout: Timeout = None) -> requests.Response:
+        raise NotImplementedError
+
+    async def asend(
+        self, method: str, url: str, headers: Dict[str, str], data=None, auth=None, timeout: Timeout = None
+    ) -> 'httpx.Response':
+        raise NotImplementedError
+
+
+class HTTPTransport(Transport):
+    """
+    Talks to PayPal through the pooled requests session and httpx clients of django_paypal.sessions.
+    """
+
+    def send(self, method: str, url: str, headers: Dict[str, str], data=None, auth=None, timeout: Timeout = None) -> requests.Response:
+        return get_session().request(method, url, headers=headers, data=data, auth=auth, timeout=timeout)
+
+    async def asend(
+        self, method: str, url: str, headers: Dict[str, str], data=None, auth=None, timeout: Timeout = None
+    ) -> 'httpx.Response':
+        client = get_async_client()
+        body = {'data': data} if isinstance(data, dict) else {'content': data}
+        if timeout is not None:
+            connect_timeout, read_timeout = timeout
+            return await client.request(
+                method, url, headers=headers, auth=auth, timeout=httpx.Timeout(read_timeout, connect=connect_timeout), **body
+            )
+        return await client.request(method, url, headers=headers, auth=auth, **body)
+
+
+class RecordingTransport(Transport):
+    """
+    Sends requests through `transport` and appends every response to the JSON lines file `path`, for ReplayTransport.
+    Request headers and bodies are not recorded and access tokens are redacted.
+    """
+
+    def __init__(self, path: str, transport: Optional[Transport] = None):
+        self.path = path
+        self.transport = transport or HTTPTransport()
+        self._lock = threading.Lock()
+
+    def send(self, method: str, url: str, headers: Dict[str, str], data=None, auth=None, timeout: Timeout = None) -> requests.Response:
+        response = self.transport.send(method, url, headers, data=data, auth=auth, timeout=timeout)
+        self.record(method, url, response.status_code, response.headers, response.content)
+        return response
+
+    async def asend(
+        self, method: str, url: str, headers: Dict[str, str], data=None, auth=None, timeout: Timeout = None
+    ) -> 'httpx.Response':
+        response = await self.transport.asend(method, url, headers, data=data, auth=auth, timeout=timeout)
+        await sync_to_async(self.record)(method, url, response.status_code, response.headers, response.content)
+        return response
+
+    def record(self, method: str, url: str, status_code: int, headers, content: bytes):
+        try:
+            body = json.loads(content) if content else None
+        except ValueError:
+            body = content.decode('utf-8', 'replace')
+        if isinstance(body, dict) and 'access_token' in body:
+            body = {**body, 'access_token': 'REDACTED'}
+        line = json.dumps(
+            {
+                'method': method,
+                'url': url,
+                'status_code': status_code,
+                'headers': {name: headers[name] for name in RECORDED_HEADERS if name in headers},
+                'body': body,
+            }
+        )
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+class RecordedResponse(object):
+    def __init__(self, status_code: int, body: Any, headers: Optional[Dict[str, str]] = None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+
+class ReplayTransport(Transport):
+    """
+    Answers requests from recorded responses, without network. Responses are matched by method and url path, ids in the path of
+    orders, captures and webhooks match any id, and several responses for the same request are served in turn.
+
+    With `rewrite_ids` the ids in a served response are replaced: the id of the requested resource by the requested id, all others
+    by new random ids of the same length, so replayed orders and captures can be saved again and again. Token requests are answered
+    with a fake token unless one was recorded; requests without a recording get a 404.
+    """
+
+    def __init__(self, responses: Iterable[Tuple[str, str, RecordedResponse]] = (), rewrite_ids: bool = True):
+        self.rewrite_ids = rewrite_ids
+        self._responses: Dict[Tuple[str, str], List[RecordedResponse]] = {}
+        self._served: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        for method, url, response in responses:
+            self.add(method, url, response)
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> 'ReplayTransport':
+        """
+        Load the JSON lines file written by RecordingTransport.
+        """
+        responses = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    responses.append(
+                        (entry['method'], entry['url'], RecordedResponse(entry['status_code'], entry['body'], entry.get('headers')))
+                    )
+        return cls(responses, **kwargs)
+
+    @classmethod
+    def from_database(cls, limit: int = 1000, using: Optional[str] = None, **kwargs) -> 'ReplayTransport':
+        """
+        Load the `limit` latest create and capture responses of each kind from PaypalAPIResponse.
+        """
+        responses = []
+        for operation in (PaypalAPIOperation.CREATE, PaypalAPIOperation.CAPTURE):
+            rows = PaypalAPIResponse.objects.using(using).filter(operation=operation).order_by('-created_at')
+            for url, response_data in rows.values_list('url', 'response_data')[:limit]:
+                responses.append(('POST', url, RecordedResponse(201, response_data, {'Content-Type': 'application/json'})))
+        return cls(responses, **kwargs)
+
+    def add(self, method: str, url: str, response: RecordedResponse):
+        self._responses.setdefault(self._get_key(method, url)[0], []).append(response)
+
+    def send(self, method: str, url: str, headers: Dict[str, str], data=None, auth=None, timeout: Timeout = None) -> requests.Response:
+        status_code, headers, content = self._get_response(method, url)
+        response = requests.Response()
+        response.status_code = status_code
+        response.reason = self._get_reason(status_code)
+        response.headers = CaseInsensitiveDict(headers)
+        response.url = url
+        response.encoding = 'utf-8'
+        response._content = content
+        response.request = requests.Request(method, url).prepare()
+        return response
+
+    async def asend(
+        self, method: str, url: str, headers: Dict[str, str], data=None, auth=None, timeout: Timeout = None
+    ) -> 'httpx.Response':
+        require_httpx()
+        status_code, headers, content = self._get_response(method, url)
+        return httpx.Response(status_code, headers=headers, content=content, request=httpx.Request(method, url))
+
+    def _get_key(self, method: str, url: str) -> Tuple[Tuple[str, str], Optional[str]]:
+        """
+        Return the match key of a request and the id of the requested resource.
+        """
+        path = urlsplit(url).path.rstrip('/')
+        match = RESOURCE_PATH_RE.match(path)
+        if match is None:
+            return (method.upper(), path), None
+        return (method.upper(), f'{match["collection"]}/{{id}}{match["rest"] or ""}'), match['id']
+
+    def _get_response(self, method: str, url: str) -> Tuple[int, Dict[str, str], bytes]:
+        key, resource_id = self._get_key(method, url)
+        responses = self._responses.get(key)
+        if not responses:
+            if key == ('POST', django_paypal_settings.PAYPAL_AUTH_URL):
+                return 200, {'Content-Type': 'application/json'}, json.dumps(self._build_token()).encode('utf-8')
+            logger.warning('No recorded PayPal response for %s %s', method, url)
+            body = {'name': 'RESOURCE_NOT_FOUND', 'message': f'No recorded response for {method} {key[1]}'}
+            return 404, {'Content-Type': 'application/json'}, json.dumps(body).encode('utf-8')
+
+        with self._lock:
+            served = self._served.get(key, 0)
+            self._served[key] = served + 1
+        response = responses[served % len(responses)]
+        if response.body is None:
+            return response.status_code, response.headers, b''
+        content = response.body if isinstance(response.body, str) else json.dumps(response.body)
+        if self.rewrite_ids and isinstance(response.body, dict):
+            content = self._rewrite_ids(content, response.body, resource_id)
+        return response.status_code, response.headers, content.encode('utf-8')
+
+    def _rewrite_ids(self, content: str, body: Dict[str, Any], resource_id: Optional[str]) -> str:
+        replacements = {}
+        for recorded_id in self._find_ids(body):
+            if len(recorded_id) >= MIN_REWRITTEN_ID_LENGTH and recorded_id not in replacements:
+                replacements[recorded_id] = self._build_id(recorded_id)
+        if resource_id and isinstance(body.get('id'), str):
+            replacements[body['id']] = resource_id
+        for recorded_id, new_id in replacements.items():
+            content = content.replace(f'"{recorded_id}"', f'"{new_id}"').replace(f'/{recorded_id}', f'/{new_id}')
+        return content
+
+    def _find_ids(self, data: Union[Dict, List, Any]) -> Iterable[str]:
+        if isinstance(data, dict):
+            if isinstance(data.get('id'), str):
+                yield data['id']
+            for value in data.values():
+                yield from self._find_ids(value)
+        elif isinstance(data, list):
+            for item in data:
+                yield from self._find_ids(item)
+
+    def _build_id(self, recorded_id: str) -> str:
+        return secrets.token_hex(len(recorded_id)).upper()[: len(recorded_id)]
+
+    def _build_token(self) -> Dict[str, Any]:
+        return {
+            'scope': 'https://uri.paypal.com/services/payments/payment',
+            'access_token': 'REPLAY',
+            'token_type': 'Bearer',
+            'app_id': 'APP-REPLAY',
+            'expires_in': 32400,
+            'nonce': 'replay',
+        }
+
+    def _get_reason(self, status_code: int) -> str:
+        try:
+            return http.HTTPStatus(status_code).phrase
+        except ValueError:
+            return ''
+
+
+TRANSPORTS = {
+    'http': HTTPTransport,
+    'recording': RecordingTransport,
+    'replay': ReplayTransport,
+}
+
+
+def get_transport() -> Transport:
+    """
+    Return the process-wide transport configured by `PAYPAL_TRANSPORT` ('http', 'recording', 'replay' or a dotted path).
+    """
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                transport_class = TRANSPORTS.get(django_paypal_settings.PAYPAL_TRANSPORT)
+                if transport_class is None:
+                    try:
+                        transport_class = import_string(django_paypal_settings.PAYPAL_TRANSPORT)
+                    except ImportError as e:
+                        raise ImproperlyConfigured(f'Invalid PAYPAL_TRANSPORT: {e}') from e
+                fixtures = django_paypal_settings.PAYPAL_TRANSPORT_FIXTURES
+                if issubclass(transport_class, RecordingTransport):
+                    if not fixtures:
+                        raise ImproperlyConfigured('PAYPAL_TRANSPORT = "recording" requires PAYPAL_TRANSPORT_FIXTURES')
+                    _transport = transport_class(fixtures)
+                elif issubclass(transport_class, ReplayTransport):
+                    _transport = transport_class.from_file(fixtures) if fixtures else transport_class.from_database()
+                else:
+                    _transport = transport_class()
+    return _transport
+
+
+async def aget_transport() -> Transport:
+    """
+    get_transport for async code, ReplayTransport may load its responses from the database on first use.
+    """
+    if _transport is not None:
+        return _transport
+    return await sync_to_async(get_transport)()
@@ -1,3 +1,5 @@
+from typing import Union, get_args, get_origin
+
 from django_paypal import settings as django_paypal_settings
 
 
@@ -5,3 +7,15 @@ def build_paypal_full_uri(url):
     if url.startswith('/'):
         url = '{0}{1}'.format(django_paypal_settings.PAYPAL_ROOT_URL, url)
     return url
+
+
+def is_optional(tp) -> bool:
+    return get_origin(tp) is Union and type(None) in get_args(tp)
+
+
+def strip_optional(tp):
+    """
+    Return `tp` without None, e.g. `str` for `Optional[str]`.
+    """
+    args = [arg for arg in get_args(tp) if arg is not type(None)]
+    return args[0] if len(args) == 1 else Union[tuple(args)]
@@ -0,0 +1,173 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import List, Optional
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections, connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from django_paypal import settings as django_paypal_settings
+from django_paypal.exceptions import PaypalOrderAlreadyCapturedError, PaypalWebhookVerificationError
+from django_paypal.models import PaypalWebhookDelivery
+
+logger = logging.getLogger(__name__)
+
+_webhook_processor: Optional['WebhookProcessor'] = None
+_webhook_processor_lock = threading.Lock()
+
+
+class WebhookProcessor(object):
+    """
+    Processes the deliveries stored by the webhook views when PAYPAL_WEBHOOK_DEFERRED is enabled.
+    """
+
+    def submit(self, delivery: PaypalWebhookDelivery):
+        raise NotImplementedError
+
+
+class ThreadPoolWebhookProcessor(WebhookProcessor):
+    """
+    Processes deliveries on an in-process thread pool. Deliveries lost with the process (or waiting for a retry) stay in the
+    database and are picked up by the paypal_process_webhooks command.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def submit(self, delivery: PaypalWebhookDelivery):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='django-paypal-webhooks')
+        self._executor.submit(self._process, delivery.pk)
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _process(self, delivery_pk: int):
+        close_old_connections()
+        try:
+            delivery = claim_delivery(delivery_pk)
+            if delivery is not None:
+                process_delivery(delivery)
+        except Exception:
+            logger.exception('Could not process PayPal webhook delivery %s', delivery_pk)
+        finally:
+            close_old_connections()
+
+
+class DatabaseWebhookProcessor(WebhookProcessor):
+    """
+    Leaves deliveries in the database, where the paypal_process_webhooks worker command picks them up.
+    """
+
+    def submit(self, delivery: PaypalWebhookDelivery):
+        pass
+
+
+WEBHOOK_PROCESSORS = {
+    'thread': ThreadPoolWebhookProcessor,
+    'database': DatabaseWebhookProcessor,
+}
+
+
+def get_webhook_processor() -> WebhookProcessor:
+    """
+    Return the process-wide webhook processor configured by `PAYPAL_WEBHOOK_PROCESSOR` ('thread', 'database' or a dotted path).
+    """
+    global _webhook_processor
+    if _webhook_processor is None:
+        with _webhook_processor_lock:
+            if _webhook_processor is None:
+                processor_class = WEBHOOK_PROCESSORS.get(django_paypal_settings.PAYPAL_WEBHOOK_PROCESSOR)
+                if processor_class is None:
+                    try:
+                        processor_class = import_string(django_paypal_settings.PAYPAL_WEBHOOK_PROCESSOR)
+                    except ImportError as e:
+                        raise ImproperlyConfigured(f'Invalid PAYPAL_WEBHOOK_PROCESSOR: {e}') from e
+                if issubclass(processor_class, ThreadPoolWebhookProcessor):
+                    _webhook_processor = processor_class(max_workers=django_paypal_settings.PAYPAL_WEBHOOK_THREADS)
+                else:
+                    _webhook_processor = processor_class()
+    return _webhook_processor
+
+
+def _get_lease_end():
+    return timezone.now() + timedelta(seconds=django_paypal_settings.PAYPAL_WEBHOOK_LEASE_TIMEOUT)
+
+
+def _get_claimable_deliveries():
+    # deliveries stuck in processing (e.g. their worker died) become claimable again once their lease ran out
+    return PaypalWebhookDelivery.objects.filter(
+        status__in=[PaypalWebhookDelivery.STATUS_PENDING, PaypalWebhookDelivery.STATUS_PROCESSING], available_at__lte=timezone.now()
+    )
+
+
+def claim_delivery(delivery_pk: int) -> Optional[PaypalWebhookDelivery]:
+    """
+    Lease a single delivery for processing. Returns None if it is done or leased by another worker.
+    """
+    claimed = (
+        _get_claimable_deliveries()
+        .filter(pk=delivery_pk)
+        .update(status=PaypalWebhookDelivery.STATUS_PROCESSING, available_at=_get_lease_end(), attempts=F('attempts') + 1)
+    )
+    return PaypalWebhookDelivery.objects.get(pk=delivery_pk) if claimed else None
+
+
+def claim_deliveries(limit: int) -> List[PaypalWebhookDelivery]:
+    """
+    Lease up to `limit` due deliveries, oldest first. Rows locked by concurrent workers are skipped where the database supports it.
+    """
+    db = router.db_for_write(PaypalWebhookDelivery)
+    skip_locked = connections[db].features.has_select_for_update_skip_locked
+    with transaction.atomic(using=db):
+        pks = list(
+            _get_claimable_deliveries()
+            .using(db)
+            .select_for_update(skip_locked=skip_locked)
+            .order_by('available_at')
+            .values_list('pk', flat=True)[:limit]
+        )
+        PaypalWebhookDelivery.objects.using(db).filter(pk__in=pks).update(
+            status=PaypalWebhookDelivery.STATUS_PROCESSING, available_at=_get_lease_end(), attempts=F('attempts') + 1
+        )
+    return list(PaypalWebhookDelivery.objects.using(db).filter(pk__in=pks).order_by('available_at'))
+
+
+def process_delivery(delivery: PaypalWebhookDelivery) -> bool:
+    """
+    Process a claimed delivery and record the outcome. Failed deliveries are retried with exponential backoff until
+    PAYPAL_WEBHOOK_MAX_ATTEMPTS is reached; deliveries that fail verification are not retried.
+    """
+    from django_paypal.webhooks import get_default_credentials, process_webhook_delivery
+    from django_paypal.wrappers import PaypalWrapper
+
+    try:
+        process_webhook_delivery(PaypalWrapper.for_credentials(get_default_credentials()), delivery)
+    except PaypalOrderAlreadyCapturedError:
+        pass  # captured by an earlier attempt or another delivery of the same event
+    except (Exception, PaypalWebhookVerificationError) as e:  # the verification error is a BaseException
+        logger.warning('Could not process PayPal webhook delivery %s: %r', delivery.pk, e)
+        delivery.last_error = repr(e)
+        if isinstance(e, PaypalWebhookVerificationError) or delivery.attempts >= django_paypal_settings.PAYPAL_WEBHOOK_MAX_ATTEMPTS:
+            delivery.status = PaypalWebhookDelivery.STATUS_FAILED
+        else:
+            delivery.status = PaypalWebhookDelivery.STATUS_PENDING
+            delay = django_paypal_settings.PAYPAL_WEBHOOK_RETRY_DELAY * 2 ** (delivery.attempts - 1)
+            delivery.available_at = timezone.now() + timedelta(seconds=delay)
+        delivery.save(update_fields=['status', 'last_error', 'available_at'])
+        return False
+    delivery.status = PaypalWebhookDelivery.STATUS_DONE
+    delivery.processed_at = timezone.now()
+    delivery.save(update_fields=['status', 'processed_at'])
+    return True
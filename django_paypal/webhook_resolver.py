@@ -0,0 +1,93 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+
+from django_paypal import settings as django_paypal_settings
+from django_paypal.models import PaypalWebhook
+
+WebhookKey = Tuple[str, str]
+
+
+class WebhookResolver(object):
+    """
+    Resolves (url, auth_hash) to the registered PaypalWebhook without a query per webhook delivery.
+    All webhooks are loaded at once and kept in process memory for `PAYPAL_WEBHOOK_RESOLVER_TIMEOUT` seconds and, with
+    `PAYPAL_WEBHOOK_RESOLVER_CACHE_TIMEOUT`, in the Django cache. Both are cleared whenever a PaypalWebhook is saved or deleted, but
+    only in the process that saved it: other processes see a changed or deleted webhook after up to `PAYPAL_WEBHOOK_RESOLVER_TIMEOUT`
+    seconds. Newly registered webhooks are found right away, since a miss falls back to a query.
+    """
+
+    def __init__(self):
+        self._webhooks: Optional[Dict[WebhookKey, PaypalWebhook]] = None
+        self._expires_at = 0.0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _get_local(self) -> Optional[Dict[WebhookKey, PaypalWebhook]]:
+        webhooks = self._webhooks
+        if webhooks is None or time.monotonic() >= self._expires_at:
+            return None
+        return webhooks
+
+    def _load(self) -> Dict[WebhookKey, PaypalWebhook]:
+        generation = self._generation
+        cache_timeout = django_paypal_settings.PAYPAL_WEBHOOK_RESOLVER_CACHE_TIMEOUT
+        rows = cache.get(django_paypal_settings.PAYPAL_WEBHOOK_RESOLVER_CACHE_KEY) if cache_timeout else None
+        if rows is None:
+            rows = list(PaypalWebhook.objects.values('id', 'webhook_id', 'auth_hash', 'url', 'event_types'))
+            if cache_timeout:
+                cache.set(django_paypal_settings.PAYPAL_WEBHOOK_RESOLVER_CACHE_KEY, rows, cache_timeout)
+        webhooks = {(row['url'], row['auth_hash']): PaypalWebhook(**row) for row in rows}
+        with self._lock:
+            # don't keep what was loaded while the table changed
+            if generation == self._generation:
+                self._webhooks = webhooks
+                self._expires_at = time.monotonic() + django_paypal_settings.PAYPAL_WEBHOOK_RESOLVER_TIMEOUT
+        return webhooks
+
+    def get(self, url: str, auth_hash: str) -> PaypalWebhook:
+        """
+        Return the webhook registered for `url` and `auth_hash`. Raises PaypalWebhook.DoesNotExist like a query would.
+        """
+        if not django_paypal_settings.PAYPAL_WEBHOOK_RESOLVER_TIMEOUT:
+            return PaypalWebhook.objects.get(url=url, auth_hash=auth_hash)
+        webhooks = self._get_local()
+        if webhooks is None:
+            webhooks = self._load()
+        try:
+            return webhooks[(url, auth_hash)]
+        except KeyError:
+            pass
+        # the webhook may have been registered by another process after the webhooks were loaded
+        paypal_webhook = PaypalWebhook.objects.get(url=url, auth_hash=auth_hash)
+        self.clear()
+        return paypal_webhook
+
+    async def aget(self, url: str, auth_hash: str) -> PaypalWebhook:
+        webhooks = self._get_local() if django_paypal_settings.PAYPAL_WEBHOOK_RESOLVER_TIMEOUT else None
+        if webhooks is not None and (url, auth_hash) in webhooks:
+            return webhooks[(url, auth_hash)]
+        return await sync_to_async(self.get)(url, auth_hash)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._webhooks = None
+        if django_paypal_settings.PAYPAL_WEBHOOK_RESOLVER_CACHE_TIMEOUT:
+            cache.delete(django_paypal_settings.PAYPAL_WEBHOOK_RESOLVER_CACHE_KEY)
+
+
+webhook_resolver = WebhookResolver()
+
+
+def clear_webhook_resolver(sender, **kwargs):
+    """
+    post_save/post_delete receiver for PaypalWebhook, connected in DjangoPaypalConfig.ready.
+    """
+    webhook_resolver.clear()
+    # other threads may reload the old rows until the transaction is committed
+    transaction.on_commit(webhook_resolver.clear)
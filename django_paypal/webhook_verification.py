@@ -0,0 +1,125 @@
+import base64
+import binascii
+import hashlib
+import logging
+import threading
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, Mapping, Optional, Union
+from urllib.parse import urlsplit
+
+from django.core.cache import cache
+
+from django_paypal import settings as django_paypal_settings
+from django_paypal.sessions import get_session
+
+try:
+    from cryptography import x509
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import padding
+except ImportError:
+    x509 = None
+
+logger = logging.getLogger(__name__)
+
+# PayPal-Auth-Algo values (Java names) supported for local verification
+SIGNATURE_HASHES = {
+    'SHA256withRSA': 'SHA256',
+    'SHA384withRSA': 'SHA384',
+    'SHA512withRSA': 'SHA512',
+}
+
+_certificates: Dict[str, 'x509.Certificate'] = {}
+_certificates_lock = threading.Lock()
+_certificates_max_entries = 32
+
+
+def is_allowed_cert_url(cert_url: str) -> bool:
+    """
+    Only https URLs on PAYPAL_WEBHOOK_CERT_DOMAINS (or their subdomains) are fetched, so a forged delivery can't make us load
+    a certificate (or any other URL) of its choice.
+    """
+    parts = urlsplit(cert_url)
+    host = (parts.hostname or '').lower()
+    if parts.scheme != 'https' or parts.username or parts.password:
+        return False
+    return any(host == domain or host.endswith('.' + domain) for domain in django_paypal_settings.PAYPAL_WEBHOOK_CERT_DOMAINS)
+
+
+def _is_valid_now(certificate: 'x509.Certificate') -> bool:
+    now = datetime.now(timezone.utc)
+    # the *_utc properties exist since cryptography 42, the naive ones are deprecated there
+    not_before = getattr(certificate, 'not_valid_before_utc', None) or certificate.not_valid_before.replace(tzinfo=timezone.utc)
+    not_after = getattr(certificate, 'not_valid_after_utc', None) or certificate.not_valid_after.replace(tzinfo=timezone.utc)
+    return not_before <= now <= not_after
+
+
+def get_certificate(cert_url: str) -> Optional['x509.Certificate']:
+    """
+    Return the parsed certificate of `cert_url`, from the in-process cache, the Django cache or PayPal, in that order.
+    """
+    certificate = _certificates.get(cert_url)
+    if certificate is not None and _is_valid_now(certificate):
+        return certificate
+    if not is_allowed_cert_url(cert_url):
+        logger.warning('Refusing to load webhook certificate from %s', cert_url)
+        return None
+
+    cache_key = django_paypal_settings.PAYPAL_WEBHOOK_CERT_CACHE_KEY.format(url_hash=hashlib.sha256(cert_url.encode('utf-8')).hexdigest())
+    pem = cache.get(cache_key)
+    if pem is None:
+        response = get_session().get(
+            cert_url, timeout=(django_paypal_settings.PAYPAL_HTTP_CONNECT_TIMEOUT, django_paypal_settings.PAYPAL_HTTP_READ_TIMEOUT)
+        )
+        response.raise_for_status()
+        pem = response.content
+    certificate = x509.load_pem_x509_certificate(pem)
+    if not _is_valid_now(certificate):
+        logger.warning('Webhook certificate %s is expired or not yet valid', cert_url)
+        cache.delete(cache_key)
+        return None
+    cache.set(cache_key, pem, django_paypal_settings.PAYPAL_WEBHOOK_CERT_CACHE_TIMEOUT)
+    with _certificates_lock:
+        if len(_certificates) >= _certificates_max_entries:
+            _certificates.clear()
+        _certificates[cert_url] = certificate
+    return certificate
+
+
+def get_signed_message(headers: Mapping[str, str], body: Union[bytes, str], webhook_id: str) -> bytes:
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    transmission_id = headers['Paypal-Transmission-Id']
+    transmission_time = headers['Paypal-Transmission-Time']
+    return f'{transmission_id}|{transmission_time}|{webhook_id}|{zlib.crc32(body)}'.encode('utf-8')
+
+
+def verify_webhook_signature(headers: Mapping[str, str], body: Union[bytes, str], webhook_id: str) -> bool:
+    """
+    Verify the signature of a webhook delivery without calling PayPal (apart from fetching its certificate once).
+    Returns False if the delivery can't be verified locally, callers should then ask the verify-webhook-signature API.
+    """
+    if x509 is None or not django_paypal_settings.PAYPAL_WEBHOOK_LOCAL_VERIFICATION:
+        return False
+    hash_name = SIGNATURE_HASHES.get(headers.get('Paypal-Auth-Algo'))
+    cert_url = headers.get('Paypal-Cert-Url')
+    if hash_name is None or not cert_url:
+        return False
+    try:
+        certificate = get_certificate(cert_url)
+        if certificate is None:
+            return False
+        certificate.public_key().verify(
+            base64.b64decode(headers['Paypal-Transmission-Sig']),
+            get_signed_message(headers, body, webhook_id),
+            padding.PKCS1v15(),
+            getattr(hashes, hash_name)(),
+        )
+    except InvalidSignature:
+        logger.info('Local verification of webhook %s failed', headers.get('Paypal-Transmission-Id'))
+        return False
+    except (KeyError, TypeError, ValueError, binascii.Error, OSError) as e:  # missing headers, broken certificates, fetch errors
+        logger.warning('Could not verify webhook %s locally: %r', headers.get('Paypal-Transmission-Id'), e)
+        return False
+    return True
@@ -1,33 +1,287 @@
 import json
-from typing import Any, Dict
+import logging
+from typing import Any, Dict, Mapping, Optional, Union
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from django.http import HttpResponse, HttpRequest
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import View
 
 from .api_types import APIAuthCredentials
-from .models import PaypalWebhook, PaypalWebhookEvent, PaypalOrder
-from .signals import order_approved, order_completed
-from .wrappers import PaypalWrapper
+from .async_wrappers import AsyncPaypalWrapper
+from .exceptions import PaypalOrderAlreadyCapturedError
+from .metrics import WEBHOOK_HANDLING_DURATION, timed
+from .captures import build_capture, save_captures, save_order_captures
+from .models import PaypalWebhook, PaypalWebhookDelivery, PaypalWebhookEvent, PaypalOrder
+from .signals import order_approved, order_completed, send_async
+from .webhook_processing import get_webhook_processor
+from .webhook_resolver import webhook_resolver
+from .wrappers import WEBHOOK_VERIFICATION_HEADERS, PaypalWrapper
 from django_paypal import settings as django_paypal_settings
 
+logger = logging.getLogger(__name__)
+
+# results of saving a webhook event, also used as `result` of WEBHOOK_HANDLING_DURATION
+EVENT_SAVED = 'processed'
+EVENT_DUPLICATE = 'duplicate'
+EVENT_IGNORED = 'ignored'
+
 
 class WebhookEvents:
     ORDERS = ['CHECKOUT.ORDER.COMPLETED', 'CHECKOUT.ORDER.APPROVED', 'CHECKOUT.PAYMENT-APPROVAL.REVERSED']
+    # events whose resource is a capture (refund events carry the refund instead)
+    CAPTURES = ['PAYMENT.CAPTURE.COMPLETED', 'PAYMENT.CAPTURE.DECLINED', 'PAYMENT.CAPTURE.DENIED', 'PAYMENT.CAPTURE.PENDING']
+    ALL = ORDERS + CAPTURES
 
 
-def verify_and_save_webhook_event(request: HttpRequest, paypal_wrapper: PaypalWrapper, payload: Dict[str, Any]):
-    if not settings.DEBUG:
-        paypal_webhook = PaypalWebhook.objects.get(url=request.build_absolute_uri(), auth_hash=paypal_wrapper.api_auth_hash)
-        paypal_wrapper.verify_webhook_event(request, paypal_webhook.webhook_id)
-        try:
-            paypal_order = PaypalOrder.objects.get(order_id=payload['resource']['id'])
-        except (KeyError, TypeError):  # if the payload does not contain the order id
-            paypal_order = None
-        event_data = {'payload': payload, 'webhook': paypal_webhook, 'order': paypal_order}
+def get_event_order_id(payload: Dict[str, Any]) -> str:
+    """
+    Return the PayPal order id of an event. Raises KeyError or TypeError if the payload does not contain one.
+    """
+    if payload.get('event_type') in WebhookEvents.CAPTURES:
+        return payload['resource']['supplementary_data']['related_ids']['order_id']
+    return payload['resource']['id']
+
+
+def save_event_captures(order: PaypalOrder, payload: Dict[str, Any]):
+    if payload.get('event_type') in WebhookEvents.CAPTURES:
+        save_captures([build_capture(order.pk, payload['resource'])])
+    else:
+        save_order_captures(order, payload['resource'])
+
+
+def get_event_id(payload: Dict[str, Any], headers: Mapping[str, str]) -> Optional[str]:
+    """
+    Return the id PayPal keeps for all deliveries of an event, or the transmission id if the payload has none.
+    """
+    return payload.get('id') or headers.get('Paypal-Transmission-Id') or None
+
+
+def _get_dedupe_cache_key(event_id: str) -> str:
+    return django_paypal_settings.PAYPAL_WEBHOOK_DEDUPE_CACHE_KEY.format(event_id=event_id)
+
+
+def is_processed_event(event_id: Optional[str]) -> bool:
+    """
+    Cheap check whether an event was already processed, without verifying it or touching the database.
+    """
+    if not event_id or not django_paypal_settings.PAYPAL_WEBHOOK_DEDUPE_TIMEOUT:
+        return False
+    return cache.get(_get_dedupe_cache_key(event_id)) is not None
+
+
+async def ais_processed_event(event_id: Optional[str]) -> bool:
+    if not event_id or not django_paypal_settings.PAYPAL_WEBHOOK_DEDUPE_TIMEOUT:
+        return False
+    return await cache.aget(_get_dedupe_cache_key(event_id)) is not None
+
+
+def _get_event_data(
+    paypal_webhook: PaypalWebhook, paypal_order: Optional[PaypalOrder], headers: Mapping[str, str], payload: Dict[str, Any]
+):
+    return {
+        'payload': payload,
+        'webhook': paypal_webhook,
+        'order': paypal_order,
+        'transmission_id': headers.get('Paypal-Transmission-Id') or '',
+    }
+
+
+def _get_event_order_id(payload: Dict[str, Any]) -> Optional[str]:
+    try:
+        return get_event_order_id(payload)
+    except (KeyError, TypeError):  # if the payload does not contain the order id
+        return None
+
+
+def _log_ignored_event(payload: Dict[str, Any], headers: Mapping[str, str], order_id: Optional[str]):
+    logger.warning(
+        'Ignoring PayPal webhook event %s (%s) of unknown order %s', get_event_id(payload, headers), payload.get('event_type'), order_id
+    )
+
+
+def _save_webhook_event(
+    paypal_wrapper: PaypalWrapper, url: str, headers: Mapping[str, str], body: Union[bytes, str], payload: Dict[str, Any]
+) -> str:
+    paypal_webhook = webhook_resolver.get(url, paypal_wrapper.api_auth_hash)
+    paypal_wrapper.verify_webhook_delivery(headers, body, paypal_webhook.webhook_id)
+    order_id = _get_event_order_id(payload)
+    paypal_order = PaypalOrder.objects.filter(order_id=order_id).first() if order_id else None
+    if paypal_order is None:
+        # e.g. a capture of an order created outside of this shop: acknowledge it, PayPal would redeliver it forever otherwise
+        _log_ignored_event(payload, headers, order_id)
+        return EVENT_IGNORED
+    event_data = _get_event_data(paypal_webhook, paypal_order, headers, payload)
+    event_id = get_event_id(payload, headers)
+    if event_id is None:
         PaypalWebhookEvent.objects.create(**event_data)
+    else:
+        # insert or ignore, the unique event_id makes concurrent deliveries of the same event end up with a single row
+        _, created = PaypalWebhookEvent.objects.get_or_create(event_id=event_id, defaults=event_data)
+        if not created:
+            return EVENT_DUPLICATE
+    save_event_captures(paypal_order, payload)
+    return EVENT_SAVED
+
+
+def save_webhook_event(
+    paypal_wrapper: PaypalWrapper, url: str, headers: Mapping[str, str], body: Union[bytes, str], payload: Dict[str, Any]
+) -> bool:
+    """
+    Verify and save a webhook event. Returns False if the event was already saved by an earlier delivery, or if its order is
+    missing or unknown, in which case it is only logged.
+    """
+    if settings.DEBUG:
+        return True
+    return _save_webhook_event(paypal_wrapper, url, headers, body, payload) == EVENT_SAVED
+
+
+async def _asave_webhook_event(
+    paypal_wrapper: AsyncPaypalWrapper, url: str, headers: Mapping[str, str], body: Union[bytes, str], payload: Dict[str, Any]
+) -> str:
+    paypal_webhook = await webhook_resolver.aget(url, paypal_wrapper.api_auth_hash)
+    await paypal_wrapper.verify_webhook_delivery(headers, body, paypal_webhook.webhook_id)
+    order_id = _get_event_order_id(payload)
+    paypal_order = await PaypalOrder.objects.filter(order_id=order_id).afirst() if order_id else None
+    if paypal_order is None:
+        _log_ignored_event(payload, headers, order_id)
+        return EVENT_IGNORED
+    event_data = _get_event_data(paypal_webhook, paypal_order, headers, payload)
+    event_id = get_event_id(payload, headers)
+    if event_id is None:
+        await PaypalWebhookEvent.objects.acreate(**event_data)
+    else:
+        _, created = await PaypalWebhookEvent.objects.aget_or_create(event_id=event_id, defaults=event_data)
+        if not created:
+            return EVENT_DUPLICATE
+    await sync_to_async(save_event_captures)(paypal_order, payload)
+    return EVENT_SAVED
+
+
+async def asave_webhook_event(
+    paypal_wrapper: AsyncPaypalWrapper, url: str, headers: Mapping[str, str], body: Union[bytes, str], payload: Dict[str, Any]
+) -> bool:
+    if settings.DEBUG:
+        return True
+    return await _asave_webhook_event(paypal_wrapper, url, headers, body, payload) == EVENT_SAVED
+
+
+def verify_and_save_webhook_event(request: HttpRequest, paypal_wrapper: PaypalWrapper, payload: Dict[str, Any]) -> bool:
+    return save_webhook_event(paypal_wrapper, request.build_absolute_uri(), request.headers, request.body, payload)
+
+
+async def averify_and_save_webhook_event(request: HttpRequest, paypal_wrapper: AsyncPaypalWrapper, payload: Dict[str, Any]) -> bool:
+    return await asave_webhook_event(paypal_wrapper, request.build_absolute_uri(), request.headers, request.body, payload)
+
+
+def handle_webhook_event(paypal_wrapper: PaypalWrapper, payload: Dict[str, Any], sender: type):
+    event_type = payload.get('event_type')
+    if event_type == 'CHECKOUT.ORDER.APPROVED':
+        order_approved.send(sender=sender, resource=payload.get('resource'))
+        try:
+            paypal_wrapper.capture_order(payload.get('resource').get('id'))
+        except PaypalOrderAlreadyCapturedError:
+            pass  # e.g. captured when the buyer returned to the shop
+    if event_type == 'CHECKOUT.ORDER.COMPLETED':
+        order_completed.send(sender=sender, resource=payload.get('resource'))
+
+
+async def ahandle_webhook_event(paypal_wrapper: AsyncPaypalWrapper, payload: Dict[str, Any], sender: type):
+    event_type = payload.get('event_type')
+    if event_type == 'CHECKOUT.ORDER.APPROVED':
+        await send_async(order_approved, sender=sender, resource=payload.get('resource'))
+        try:
+            await paypal_wrapper.capture_order(payload.get('resource').get('id'))
+        except PaypalOrderAlreadyCapturedError:
+            pass  # e.g. captured when the buyer returned to the shop
+    if event_type == 'CHECKOUT.ORDER.COMPLETED':
+        await send_async(order_completed, sender=sender, resource=payload.get('resource'))
+
+
+def process_webhook_event(
+    paypal_wrapper: PaypalWrapper, url: str, headers: Mapping[str, str], body: Union[bytes, str], payload: Dict[str, Any], sender: type
+) -> bool:
+    """
+    Verify, save and handle a webhook event once. Returns False for redeliveries of an event that was already processed
+    and for events of unknown orders.
+    """
+    event_id = get_event_id(payload, headers)
+    with timed(WEBHOOK_HANDLING_DURATION, event_type=payload.get('event_type') or '', result='error') as tags:
+        if not settings.DEBUG:
+            result = _save_webhook_event(paypal_wrapper, url, headers, body, payload)
+            if result != EVENT_SAVED:
+                tags['result'] = result
+                return False
+        try:
+            handle_webhook_event(paypal_wrapper, payload, sender=sender)
+        except BaseException:
+            # forget the event, so PayPal's redelivery processes it again
+            if event_id is not None:
+                PaypalWebhookEvent.objects.filter(event_id=event_id).delete()
+            raise
+        if event_id is not None and django_paypal_settings.PAYPAL_WEBHOOK_DEDUPE_TIMEOUT:
+            cache.set(_get_dedupe_cache_key(event_id), True, django_paypal_settings.PAYPAL_WEBHOOK_DEDUPE_TIMEOUT)
+        tags['result'] = EVENT_SAVED
+        return True
+
+
+async def aprocess_webhook_event(
+    paypal_wrapper: AsyncPaypalWrapper,
+    url: str,
+    headers: Mapping[str, str],
+    body: Union[bytes, str],
+    payload: Dict[str, Any],
+    sender: type,
+) -> bool:
+    event_id = get_event_id(payload, headers)
+    with timed(WEBHOOK_HANDLING_DURATION, event_type=payload.get('event_type') or '', result='error') as tags:
+        if not settings.DEBUG:
+            result = await _asave_webhook_event(paypal_wrapper, url, headers, body, payload)
+            if result != EVENT_SAVED:
+                tags['result'] = result
+                return False
+        try:
+            await ahandle_webhook_event(paypal_wrapper, payload, sender=sender)
+        except BaseException:
+            if event_id is not None:
+                await PaypalWebhookEvent.objects.filter(event_id=event_id).adelete()
+            raise
+        if event_id is not None and django_paypal_settings.PAYPAL_WEBHOOK_DEDUPE_TIMEOUT:
+            await cache.aset(_get_dedupe_cache_key(event_id), True, django_paypal_settings.PAYPAL_WEBHOOK_DEDUPE_TIMEOUT)
+        tags['result'] = EVENT_SAVED
+        return True
+
+
+def process_webhook_delivery(paypal_wrapper: PaypalWrapper, delivery: PaypalWebhookDelivery) -> bool:
+    """
+    Verify, save and handle a stored delivery, like PaypalWebhookView does for a live request.
+    """
+    payload = json.loads(delivery.body)
+    return process_webhook_event(paypal_wrapper, delivery.url, delivery.headers, delivery.body, payload, sender=PaypalWebhookView)
+
+
+def build_webhook_delivery(request: HttpRequest, event_type: str) -> PaypalWebhookDelivery:
+    return PaypalWebhookDelivery(
+        url=request.build_absolute_uri(),
+        headers={name: request.headers[name] for name in WEBHOOK_VERIFICATION_HEADERS if name in request.headers},
+        body=request.body.decode('utf-8'),
+        event_type=event_type,
+    )
+
+
+def get_default_credentials() -> APIAuthCredentials:
+    client_id_val = django_paypal_settings.PAYPAL_API_CLIENT_ID
+    client_secret_val = django_paypal_settings.PAYPAL_API_SECRET
+
+    # Add runtime assertions
+    assert isinstance(client_id_val, str), "PAYPAL_API_CLIENT_ID setting must be a string"
+    assert isinstance(client_secret_val, str), "PAYPAL_API_SECRET setting must be a string"
+
+    return APIAuthCredentials(client_id=client_id_val, client_secret=client_secret_val)
 
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -35,29 +289,48 @@ class PaypalWebhookView(View):
     def post(self, request, *args, **kwargs):
         post_dict = json.loads(request.body.decode('utf-8'))
         event_type = post_dict.get('event_type')
-        if event_type not in WebhookEvents.ORDERS:
+        if event_type not in WebhookEvents.ALL:
             return HttpResponse(status=400)
-        
-        client_id_val = django_paypal_settings.PAYPAL_API_CLIENT_ID
-        client_secret_val = django_paypal_settings.PAYPAL_API_SECRET
-
-        # Add runtime assertions
-        assert isinstance(client_id_val, str), "PAYPAL_API_CLIENT_ID setting must be a string"
-        assert isinstance(client_secret_val, str), "PAYPAL_API_SECRET setting must be a string"
-
-        paypal_wrapper = PaypalWrapper(
-            auth=APIAuthCredentials(
-                client_id=client_id_val, 
-                client_secret=client_secret_val
-            )
-        )
+        if is_processed_event(get_event_id(post_dict, request.headers)):
+            return HttpResponse(status=200)
+
+        if django_paypal_settings.PAYPAL_WEBHOOK_DEFERRED:
+            delivery = build_webhook_delivery(request, event_type)
+            delivery.save()
+            transaction.on_commit(lambda: get_webhook_processor().submit(delivery))
+            return HttpResponse(status=200)
+
+        paypal_wrapper = PaypalWrapper.for_credentials(get_default_credentials())
+
+        process_webhook_event(paypal_wrapper, request.build_absolute_uri(), request.headers, request.body, post_dict, sender=self.__class__)
+
+        return HttpResponse(status=200)
+
 
-        verify_and_save_webhook_event(request, paypal_wrapper, payload=post_dict)
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncPaypalWebhookView(View):
+    """
+    Async variant of PaypalWebhookView, to be served by ASGI. Verification, persistence and capturing don't block a worker thread.
+    """
+
+    async def post(self, request, *args, **kwargs):
+        post_dict = json.loads(request.body.decode('utf-8'))
+        event_type = post_dict.get('event_type')
+        if event_type not in WebhookEvents.ALL:
+            return HttpResponse(status=400)
+        if await ais_processed_event(get_event_id(post_dict, request.headers)):
+            return HttpResponse(status=200)
+
+        if django_paypal_settings.PAYPAL_WEBHOOK_DEFERRED:
+            delivery = build_webhook_delivery(request, event_type)
+            await delivery.asave()
+            get_webhook_processor().submit(delivery)
+            return HttpResponse(status=200)
 
-        if event_type == 'CHECKOUT.ORDER.APPROVED':
-            order_approved.send(sender=self.__class__, resource=post_dict.get('resource'))
-            paypal_wrapper.capture_order(post_dict.get('resource').get('id'))
-        if event_type == 'CHECKOUT.ORDER.COMPLETED':
-            order_completed.send(sender=self.__class__, resource=post_dict.get('resource'))
+        paypal_wrapper = AsyncPaypalWrapper.for_credentials(get_default_credentials())
+
+        await aprocess_webhook_event(
+            paypal_wrapper, request.build_absolute_uri(), request.headers, request.body, post_dict, sender=self.__class__
+        )
 
         return HttpResponse(status=200)
@@ -1,9 +1,15 @@
 from __future__ import unicode_literals
 
+import functools
 import hashlib
 import json
+import logging
+import threading
+import time
+import uuid
 import warnings
-from typing import Literal, List, Any, Dict, Optional
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Literal, List, Any, Dict, Iterable, Iterator, Mapping, Optional, Set, Tuple, Union
 
 from django.core.cache import cache
 import requests
@@ -11,11 +17,26 @@ from django.http import HttpRequest
 from requests.auth import HTTPBasicAuth
 
 from django_paypal import settings as django_paypal_settings
-from django_paypal.exceptions import PaypalAuthFailure, PaypalAPIError, PaypalWebhookVerificationError, PaypalOrderAlreadyCapturedError
+from django_paypal.audit import get_audit_writer
+from django_paypal.captures import save_order_captures
+from django_paypal.circuit_breaker import (
+    ENDPOINT_CAPTURE,
+    ENDPOINT_OAUTH,
+    ENDPOINT_ORDERS,
+    ENDPOINT_WEBHOOKS,
+    CircuitBreaker,
+    get_circuit_breaker,
+)
+from django_paypal.exceptions import (
+    PaypalAuthFailure,
+    PaypalAPIError,
+    PaypalDeadlineExceeded,
+    PaypalWebhookVerificationError,
+    PaypalOrderAlreadyCapturedError,
+)
 from django_paypal.models import (
+    PaypalAPIOperation,
     PaypalOrder,
-    PaypalAPIPostData,
-    PaypalAPIResponse,
     PaypalWebhook,
 )
 from django_paypal.api_types import (
@@ -28,13 +49,51 @@ from django_paypal.api_types import (
     OrderCreatedAPIResponse,
     OrderCaptureAPIResponse,
     OrderDetailAPIResponse,
+    OrderDetailResult,
     Intent,
 )
+from django_paypal.ratelimit import PRIORITY_HIGH, PRIORITY_LOW, TokenBucket, get_rate_limiter
+from django_paypal.retry import REQUEST_ID_HEADER, RetryPolicy
+from django_paypal.lazy import LazyView
+from django_paypal.metrics import (
+    ACCESS_TOKEN_CACHE,
+    API_CALL_DURATION,
+    API_REQUEST_DURATION,
+    API_REQUEST_RETRIES,
+    PERSISTENCE_DURATION,
+    get_metrics,
+    get_status_tag,
+    timed,
+)
+from django_paypal.serialization import dumps, from_dict, loads, to_dict
+from django_paypal.transports import Transport, get_transport
+from django_paypal.tokens import build_cache_entry, get_token_lock, local_token_cache, needs_renewal, read_cache_entry
 from django_paypal.utils import build_paypal_full_uri
-from django_paypal.signals import order_captured, order_created
+from django_paypal.webhook_verification import verify_webhook_signature
+from django_paypal.signals import api_request_attempted, api_request_finished, api_request_started, order_captured, order_created
+
+logger = logging.getLogger(__name__)
+
+_wrapper_registry: Dict[Any, 'BasePaypalWrapper'] = {}
+_wrapper_registry_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=128)
+def get_api_auth_hash(auth: APIAuthCredentials) -> str:
+    return hashlib.md5(f'{auth.client_id}{auth.client_secret}'.encode()).hexdigest()
+
+
+# headers PayPal signs webhook deliveries with
+WEBHOOK_VERIFICATION_HEADERS = (
+    'Paypal-Auth-Algo',
+    'Paypal-Cert-Url',
+    'Paypal-Transmission-Id',
+    'Paypal-Transmission-Time',
+    'Paypal-Transmission-Sig',
+)
 
 
-class PaypalWrapper(object):
+class BasePaypalWrapper(object):
     interface_version = 'django_paypal_v{}'.format(django_paypal_settings.DJANGO_PAYPAL_VERSION)
 
     api_url = django_paypal_settings.PAYPAL_API_URL
@@ -43,24 +102,61 @@ class PaypalWrapper(object):
     auth_url = django_paypal_settings.PAYPAL_AUTH_URL
     auth_cache_timeout = django_paypal_settings.PAYPAL_AUTH_CACHE_TIMEOUT
     auth_cache_key = django_paypal_settings.PAYPAL_AUTH_CACHE_KEY
+    auth_refresh_margin = django_paypal_settings.PAYPAL_AUTH_REFRESH_MARGIN
+    auth_distributed_lock = django_paypal_settings.PAYPAL_AUTH_DISTRIBUTED_LOCK
+    auth_lock_key = django_paypal_settings.PAYPAL_AUTH_LOCK_KEY
+    auth_lock_timeout = django_paypal_settings.PAYPAL_AUTH_LOCK_TIMEOUT
+    connect_timeout = django_paypal_settings.PAYPAL_HTTP_CONNECT_TIMEOUT
+    read_timeout = django_paypal_settings.PAYPAL_HTTP_READ_TIMEOUT
+    operation_timeouts = django_paypal_settings.PAYPAL_HTTP_OPERATION_TIMEOUTS
+    retry_policy = RetryPolicy(
+        max_attempts=django_paypal_settings.PAYPAL_RETRY_MAX_ATTEMPTS,
+        backoff_factor=django_paypal_settings.PAYPAL_RETRY_BACKOFF_FACTOR,
+        backoff_max=django_paypal_settings.PAYPAL_RETRY_BACKOFF_MAX,
+        jitter=django_paypal_settings.PAYPAL_RETRY_JITTER,
+        status_codes=django_paypal_settings.PAYPAL_RETRY_STATUS_CODES,
+        idempotent_operations=(PaypalAPIOperation.WEBHOOK_VERIFY,),
+    )
 
     auth: Optional[APIAuthCredentials] = None
+    transport: Optional[Transport] = None  # PAYPAL_TRANSPORT if None
 
     def __init__(self, auth: APIAuthCredentials, sandbox=None):
-        super(PaypalWrapper, self).__init__()
+        super(BasePaypalWrapper, self).__init__()
         self.auth = auth
         if sandbox or django_paypal_settings.PAYPAL_SANDBOX:
             self.api_url = self.sandbox_url
 
-    def create_order(
+    @classmethod
+    def for_credentials(cls, auth: APIAuthCredentials, sandbox=None):
+        """
+        Return a shared wrapper instance for the given credentials, creating it on first use.
+        Wrappers hold no per-request state, so one instance per process can serve all threads.
+        """
+        registry_key = (cls, auth, bool(sandbox))
+        paypal_wrapper = _wrapper_registry.get(registry_key)
+        if paypal_wrapper is None:
+            with _wrapper_registry_lock:
+                paypal_wrapper = _wrapper_registry.get(registry_key)
+                if paypal_wrapper is None:
+                    paypal_wrapper = _wrapper_registry[registry_key] = cls(auth=auth, sandbox=sandbox)
+        return paypal_wrapper
+
+    @property
+    def api_auth_hash(self) -> str:
+        if not self.auth:
+            raise ValueError('Auth credentials not set')
+        return get_api_auth_hash(self.auth)
+
+    def _build_order_data(
         self,
         intent: Intent,
         purchase_units: List[PurchaseUnit],
         payment_source: PaymentSource,
-        application_context: Optional[ApplicationContext] = None,
-        success_url=django_paypal_settings.PAYPAL_SUCCESS_URL,
-        cancellation_url=django_paypal_settings.PAYPAL_CANCELLATION_URL,
-    ) -> OrderCreatedAPIResponse:
+        application_context: Optional[ApplicationContext],
+        success_url: str,
+        cancellation_url: str,
+    ) -> Dict[str, Any]:
         if payment_source.paypal and (success_url or cancellation_url):
             if not payment_source.paypal.experience_context:
                 payment_source.paypal.experience_context = ExperienceContext(
@@ -73,36 +169,125 @@ class PaypalWrapper(object):
                 if not payment_source.paypal.experience_context.cancel_url:
                     payment_source.paypal.experience_context.cancel_url = build_paypal_full_uri(cancellation_url)
 
-        order_data = {'intent': intent, 'purchase_units': [purchase_unit.to_dict() for purchase_unit in purchase_units]}
+        order_data = {'intent': intent, 'purchase_units': [to_dict(purchase_unit) for purchase_unit in purchase_units]}
         if payment_source:
-            order_data.update({'payment_source': payment_source.to_dict()})
+            order_data.update({'payment_source': to_dict(payment_source)})
         if application_context:
-            order_data.update({'application_context': application_context.to_dict()})
+            order_data.update({'application_context': to_dict(application_context)})
+        return order_data
 
-        url = '{0}{1}'.format(self.api_url, self.orders_api_endpoint)
-        order_response_dict = self.call_api(url=url, data=order_data, method='POST')
-        order_response = OrderCreatedAPIResponse.from_dict(order_response_dict)
-        new_order = PaypalOrder.objects.create(order_id=order_response.id, status=order_response.status)
-        post_obj = PaypalAPIPostData.objects.create(order=new_order, url=url, post_data=order_data)
-        PaypalAPIResponse.objects.create(order=new_order, url=url, response_data=order_response_dict, post=post_obj)
-        order_created.send(sender=self.__class__, order=new_order, response=order_response_dict)
-        return order_response
+    def _build_request_headers(self, access_token: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        request_headers = {'Authorization': f'Bearer {access_token}', 'Content-Type': 'application/json'}
+        if headers:
+            request_headers.update(headers)
+        return request_headers
 
-    def capture_order(self, order_id: str) -> OrderCaptureAPIResponse:
-        order = PaypalOrder.objects.get(order_id=order_id)
-        url = f'{self.api_url}{self.orders_api_endpoint}/{order.order_id}/capture'
+    def _get_retry_delay(
+        self,
+        attempt: int,
+        method: str,
+        headers: Dict[str, str],
+        e: Exception,
+        request_sent: bool = True,
+        deadline: Optional[float] = None,
+        operation: str = '',
+    ) -> Optional[float]:
+        """
+        Return the seconds to wait before retrying a failed attempt, or None if it must not be retried or the retry would miss the deadline.
+        """
+        response = getattr(e, 'response', None)
+        status_code = response.status_code if response is not None else None
+        if not self.retry_policy.should_retry(
+            attempt, method, headers, status_code=status_code, request_sent=request_sent, operation=operation
+        ):
+            return None
+        delay = self.retry_policy.get_delay(attempt, response.headers.get('Retry-After') if response is not None else None)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+        return delay
 
-        try:
-            order_capture_response = self.call_api(url=url, method='POST')
-        except PaypalAPIError as e:
-            if e.response and e.response.status_code == 422:
-                order_capture_response = e.response.json()
-                if order_capture_response.get('name') == 'UNPROCESSABLE_ENTITY':
-                    if order_capture_response['details'][0]['issue'] == 'ORDER_ALREADY_CAPTURED':
-                        raise PaypalOrderAlreadyCapturedError(str(e), response=e.response)
-            raise e
+    def _get_deadline(self, timeout: Optional[float]) -> Optional[float]:
+        return time.monotonic() + timeout if timeout is not None else None
+
+    def _get_timeout(self, operation: str, deadline: Optional[float] = None) -> Tuple[float, float]:
+        """
+        Return the (connect, read) timeout of an HTTP request of `operation`, capped to what is left until the deadline.
+        """
+        connect_timeout, read_timeout = self.operation_timeouts.get(operation, (self.connect_timeout, self.read_timeout))
+        if deadline is None:
+            return connect_timeout, read_timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise PaypalDeadlineExceeded(f'Deadline exceeded before the PayPal {operation or "API"} request')
+        return min(connect_timeout, remaining), min(read_timeout, remaining)
 
-        order_capture = OrderCaptureAPIResponse.from_dict(order_capture_response)
+    def _get_transport(self) -> Transport:
+        return self.transport or get_transport()
+
+    def _get_endpoint(self, url: str) -> str:
+        if url.endswith(self.auth_url):
+            return ENDPOINT_OAUTH
+        if '/v1/notifications/' in url:
+            return ENDPOINT_WEBHOOKS
+        if url.endswith('/capture'):
+            return ENDPOINT_CAPTURE
+        return ENDPOINT_ORDERS
+
+    def _get_metric_tags(
+        self, endpoint: str, operation: str, status_code: Optional[int] = None, e: Optional[BaseException] = None
+    ) -> Dict[str, str]:
+        return {'endpoint': endpoint, 'operation': operation, 'status': get_status_tag(e, status_code)}
+
+    def _record_call_result(
+        self,
+        breaker: Optional[CircuitBreaker],
+        duration: float,
+        e: Optional[Exception] = None,
+        endpoint: str = '',
+        operation: str = '',
+        status_code: Optional[int] = None,
+    ) -> Dict[str, str]:
+        """
+        Report a finished HTTP request to the circuit breaker and the metrics backend. Returns its metric tags.
+        """
+        tags = self._get_metric_tags(endpoint, operation, status_code, e)
+        get_metrics().timing(API_REQUEST_DURATION, duration, tags)
+        if breaker is None:
+            return tags
+        if self._is_breaker_failure(e):
+            breaker.record_failure()
+        else:
+            breaker.record_success(duration)
+        return tags
+
+    def _is_breaker_failure(self, e: Optional[Exception]) -> bool:
+        response = getattr(e, 'response', None)
+        # client errors don't mean PayPal is unhealthy
+        return e is not None and (response is None or response.status_code >= 500 or response.status_code == 429)
+
+    def _record_api_call(self, url: str, operation: str, duration: float, status_code: Optional[int], e: Optional[BaseException]):
+        get_metrics().timing(API_CALL_DURATION, duration, self._get_metric_tags(self._get_endpoint(url), operation, status_code, e))
+
+    def _get_missing_order_results(self, order_ids: List[str], orders: Dict[str, PaypalOrder]) -> List[OrderDetailResult]:
+        return [
+            OrderDetailResult(order_id, None, PaypalOrder.DoesNotExist(f'PaypalOrder with order_id {order_id} does not exist'))
+            for order_id in order_ids
+            if order_id not in orders
+        ]
+
+    def _handle_capture_error(self, e: PaypalAPIError):
+        if e.response is not None and e.response.status_code == 422:  # a 4xx Response is falsy
+            order_capture_response = e.response.json()
+            if order_capture_response.get('name') == 'UNPROCESSABLE_ENTITY':
+                if order_capture_response['details'][0]['issue'] == 'ORDER_ALREADY_CAPTURED':
+                    raise PaypalOrderAlreadyCapturedError(str(e), response=e.response)
+        raise e
+
+    @staticmethod
+    def _parse_order_response(cls: type, response_dict: Dict[str, Any], lazy: bool = False):
+        return LazyView(cls, response_dict) if lazy else from_dict(cls, response_dict)
+
+    def _get_new_capture_ids(self, order: PaypalOrder, order_capture: OrderCaptureAPIResponse) -> List[str]:
         captures_id_list = []
 
         if order_capture.purchase_units:
@@ -113,52 +298,316 @@ class PaypalWrapper(object):
                             if capture.id in order.capture_id:
                                 raise PaypalOrderAlreadyCapturedError('Order already captured')
                             captures_id_list.append(capture.id)
+        return captures_id_list
+
+    def _build_webhook_verification_payload(self, headers: Mapping[str, str], body: Union[bytes, str], webhook_id: str) -> Dict[str, Any]:
+        auth_algo = headers.get('Paypal-Auth-Algo')
+        cert_url = headers.get('Paypal-Cert-Url')
+        transmission_id = headers.get('Paypal-Transmission-Id')
+        transmission_time = headers.get('Paypal-Transmission-Time')
+        transmission_sig = headers.get('Paypal-Transmission-Sig')
+        request_data = json.loads(body.decode('utf-8') if isinstance(body, bytes) else body)
+        return {
+            'auth_algo': auth_algo,
+            'cert_url': cert_url,
+            'transmission_id': transmission_id,
+            'transmission_time': transmission_time,
+            'transmission_sig': transmission_sig,
+            'webhook_id': webhook_id,
+            'webhook_event': request_data,
+        }
+
+
+class PaypalWrapper(BasePaypalWrapper):
+    def create_order(
+        self,
+        intent: Intent,
+        purchase_units: List[PurchaseUnit],
+        payment_source: PaymentSource,
+        application_context: Optional[ApplicationContext] = None,
+        success_url=django_paypal_settings.PAYPAL_SUCCESS_URL,
+        cancellation_url=django_paypal_settings.PAYPAL_CANCELLATION_URL,
+        request_id: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> OrderCreatedAPIResponse:
+        """
+        Create an order. `timeout` is the time in seconds the API call may take in total, including the access token and retries.
+        """
+        order_data = self._build_order_data(intent, purchase_units, payment_source, application_context, success_url, cancellation_url)
+        url = '{0}{1}'.format(self.api_url, self.orders_api_endpoint)
+        headers = {REQUEST_ID_HEADER: request_id or str(uuid.uuid4())}
+        order_response_dict = self.call_api(
+            url=url, data=order_data, method='POST', headers=headers, operation=PaypalAPIOperation.CREATE, timeout=timeout
+        )
+        order_response = from_dict(OrderCreatedAPIResponse, order_response_dict)
+        with timed(PERSISTENCE_DURATION, operation=PaypalAPIOperation.CREATE):
+            new_order = PaypalOrder.objects.create(order_id=order_response.id, status=order_response.status)
+            get_audit_writer().write(new_order, url, order_data, order_response_dict, PaypalAPIOperation.CREATE)
+        order_created.send(sender=self.__class__, order=new_order, response=order_response_dict)
+        return order_response
+
+    def capture_order(
+        self, order_id: str, request_id: Optional[str] = None, lazy: bool = False, timeout: Optional[float] = None
+    ) -> Union[OrderCaptureAPIResponse, LazyView[OrderCaptureAPIResponse]]:
+        """
+        Capture an order. With `lazy` a LazyView of the response is returned, which only converts the fields that are read.
+        `timeout` is the time in seconds the API call may take in total, including the access token and retries.
+        """
+        order = PaypalOrder.objects.get(order_id=order_id)
+        url = f'{self.api_url}{self.orders_api_endpoint}/{order.order_id}/capture'
+        headers = {REQUEST_ID_HEADER: request_id or str(uuid.uuid4())}
+
+        try:
+            order_capture_response = self.call_api(
+                url=url, method='POST', headers=headers, operation=PaypalAPIOperation.CAPTURE, timeout=timeout
+            )
+        except PaypalAPIError as e:
+            self._handle_capture_error(e)
+
+        # status and capture ids are all that is needed here, the rest is only converted if the caller reads it
+        order_capture = LazyView(OrderCaptureAPIResponse, order_capture_response)
+        if not lazy:
+            # convert the whole response before anything is saved, so a malformed one leaves no rows behind
+            order_capture = order_capture.materialize()
+        captures_id_list = self._get_new_capture_ids(order, order_capture)
 
         order.status = order_capture.status or ''
         order.capture_id = captures_id_list
-        order.save(update_fields=['status', 'capture_id'])
-        post_obj = PaypalAPIPostData.objects.create(order=order, url=url, post_data={})
-        PaypalAPIResponse.objects.create(order=order, url=url, response_data=order_capture_response, post=post_obj)
+        with timed(PERSISTENCE_DURATION, operation=PaypalAPIOperation.CAPTURE):
+            order.save(update_fields=['status', 'capture_id'])
+            save_order_captures(order, order_capture_response)
+            get_audit_writer().write(order, url, {}, order_capture_response, PaypalAPIOperation.CAPTURE)
         order_captured.send(sender=self.__class__, order=order, response=order_capture_response)
         return order_capture
 
-    def get_order_details(self, order_id: str) -> OrderDetailAPIResponse:
+    def get_order_details(
+        self, order_id: str, lazy: bool = False, timeout: Optional[float] = None
+    ) -> Union[OrderDetailAPIResponse, LazyView[OrderDetailAPIResponse]]:
         order = PaypalOrder.objects.get(order_id=order_id)
         url = f'{self.api_url}{self.orders_api_endpoint}/{order.order_id}'
-        order_details_response = self.call_api(url=url, method='GET')
-        return OrderDetailAPIResponse.from_dict(order_details_response)
+        order_details_response = self.call_api(url=url, method='GET', operation=PaypalAPIOperation.DETAILS, timeout=timeout)
+        return self._parse_order_response(OrderDetailAPIResponse, order_details_response, lazy)
 
-    def call_api(self, url: str, method: Literal['GET', 'POST', 'PATCH', 'DELETE'], data=None) -> Dict[str, Any]:
-        headers = {'Authorization': f'Bearer {self._get_access_token()}', 'Content-Type': 'application/json'}
+    def get_order_details_many(
+        self, order_ids: Iterable[str], concurrency: int = 10, rate_limit: Optional[float] = None, lazy: bool = False
+    ) -> Iterator[OrderDetailResult]:
+        """
+        Fetch the details of many orders, with up to `concurrency` requests in flight and at most `rate_limit` requests per second.
+        Results are yielded as they complete. Errors are reported per order in `OrderDetailResult.error` instead of being raised.
+        The requests have PRIORITY_LOW for the PAYPAL_RATE_LIMITS.
+        With `lazy` the responses are LazyViews.
+        """
+        order_ids = list(dict.fromkeys(order_ids))
+        orders = PaypalOrder.objects.in_bulk(order_ids, field_name='order_id')
+        yield from self._get_missing_order_results(order_ids, orders)
+        yield from self._fetch_order_details(list(orders), concurrency=concurrency, rate_limit=rate_limit, lazy=lazy)
 
+    def _fetch_order_details(
+        self, order_ids: Iterable[str], concurrency: int = 10, rate_limit: Optional[float] = None, lazy: bool = False
+    ) -> Iterator[OrderDetailResult]:
+        rate_limiter = TokenBucket(rate_limit) if rate_limit else None
+
+        def fetch(order_id: str) -> OrderDetailResult:
+            try:
+                if rate_limiter:
+                    rate_limiter.acquire()
+                url = f'{self.api_url}{self.orders_api_endpoint}/{order_id}'
+                return OrderDetailResult(
+                    order_id,
+                    self._parse_order_response(
+                        OrderDetailAPIResponse,
+                        self.call_api(url=url, method='GET', operation=PaypalAPIOperation.DETAILS, priority=PRIORITY_LOW),
+                        lazy,
+                    ),
+                )
+            except Exception as e:
+                return OrderDetailResult(order_id, None, e)
+
+        order_ids = iter(order_ids)
+        pending: Set[Future] = set()
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='django-paypal-order-details')
         try:
-            if method == 'GET':
-                response = requests.get(url, headers=headers)
-            elif method == 'POST':
-                response = requests.post(url, headers=headers, json=data)
-            elif method == 'PATCH':
-                response = requests.patch(url, headers=headers, json=data)
-            elif method == 'DELETE':
-                response = requests.delete(url, headers=headers)
-                response.raise_for_status()
-                return {'deleted': True}
-            else:
-                raise ValueError('Invalid method')
+            while True:
+                # keep the queue short, so huge batches are never materialized as futures all at once
+                for order_id in order_ids:
+                    pending.add(executor.submit(fetch, order_id))
+                    if len(pending) >= concurrency * 2:
+                        break
+                if not pending:
+                    return
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def call_api(
+        self,
+        url: str,
+        method: Literal['GET', 'POST', 'PATCH', 'DELETE'],
+        data=None,
+        headers: Optional[Dict[str, str]] = None,
+        operation: str = '',
+        timeout: Optional[float] = None,
+        priority: str = PRIORITY_HIGH,
+    ) -> Dict[str, Any]:
+        """
+        Call the API with an access token, retrying failed requests. With `timeout` (seconds) the whole call, including the token
+        and retries, is bounded: requests get at most the remaining time, retries that wouldn't finish in time are skipped and
+        PaypalDeadlineExceeded is raised when no time is left to start one. With `PAYPAL_RATE_LIMITS`, requests wait for the rate
+        limit of their endpoint family; `priority` PRIORITY_LOW leaves part of the budget to PRIORITY_HIGH calls.
+        """
+        deadline = self._get_deadline(timeout)
+        api_request_started.send(sender=self.__class__, url=url, method=method, operation=operation)
+        start = time.monotonic()
+        status_code, exception = None, None
+        try:
+            status_code, response_dict = self._call_api(url, method, data, headers, operation, deadline, priority)
+            return response_dict
+        except BaseException as e:
+            exception = e
+            status_code = getattr(getattr(e, 'response', None), 'status_code', None)
+            raise
+        finally:
+            duration = time.monotonic() - start
+            self._record_api_call(url, operation, duration, status_code, exception)
+            api_request_finished.send(
+                sender=self.__class__,
+                url=url,
+                method=method,
+                operation=operation,
+                duration=duration,
+                status_code=status_code,
+                exception=exception,
+            )
+
+    def _call_api(
+        self,
+        url: str,
+        method: str,
+        data,
+        headers: Optional[Dict[str, str]],
+        operation: str,
+        deadline: Optional[float] = None,
+        priority: str = PRIORITY_HIGH,
+    ) -> Tuple[int, Dict[str, Any]]:
+        access_token = self._get_access_token(deadline)
+        try:
+            return self._send_api_request(
+                url, method, data, self._build_request_headers(access_token, headers), operation, deadline, priority
+            )
+        except PaypalAPIError as e:
+            if e.response is None or e.response.status_code != 401:
+                raise e
+            # the token was revoked or expired early: drop it and retry once with a fresh one
+            self._invalidate_access_token(access_token)
+            return self._send_api_request(
+                url, method, data, self._build_request_headers(self._get_access_token(deadline), headers), operation, deadline, priority
+            )
+
+    def _send_api_request(
+        self,
+        url: str,
+        method: str,
+        data,
+        headers: Dict[str, str],
+        operation: str = '',
+        deadline: Optional[float] = None,
+        priority: str = PRIORITY_HIGH,
+    ) -> Tuple[int, Dict[str, Any]]:
+        endpoint = self._get_endpoint(url)
+        breaker = get_circuit_breaker(endpoint)
+        rate_limiter = get_rate_limiter(endpoint, self.api_auth_hash)
+        attempt = 0
+        while True:
+            attempt += 1
+            if rate_limiter:
+                rate_limiter.acquire(priority, deadline)
+            timeout = self._get_timeout(operation, deadline)
+            if breaker:
+                breaker.before_call()
+            start = time.monotonic()
+            try:
+                status_code, response_dict = self._perform_api_request(url, method, data, headers, timeout)
+            except (PaypalAPIError, requests.ConnectionError, requests.Timeout) as e:
+                duration = time.monotonic() - start
+                tags = self._record_call_result(breaker, duration, e, endpoint=endpoint, operation=operation)
+                delay = self._get_retry_delay(
+                    attempt,
+                    method,
+                    headers,
+                    e,
+                    request_sent=not isinstance(e, requests.ConnectTimeout),
+                    deadline=deadline,
+                    operation=operation,
+                )
+                if delay is not None:
+                    get_metrics().increment(API_REQUEST_RETRIES, tags)
+                api_request_attempted.send(
+                    sender=self.__class__,
+                    url=url,
+                    method=method,
+                    operation=operation,
+                    attempt=attempt,
+                    duration=duration,
+                    status_code=getattr(getattr(e, 'response', None), 'status_code', None),
+                    exception=e,
+                    retrying=delay is not None,
+                )
+                if delay is None:
+                    raise e
+                time.sleep(delay)
+                continue
+            duration = time.monotonic() - start
+            self._record_call_result(breaker, duration, endpoint=endpoint, operation=operation, status_code=status_code)
+            api_request_attempted.send(
+                sender=self.__class__,
+                url=url,
+                method=method,
+                operation=operation,
+                attempt=attempt,
+                duration=duration,
+                status_code=status_code,
+                exception=None,
+                retrying=False,
+            )
+            return status_code, response_dict
+
+    def _perform_api_request(
+        self, url: str, method: str, data, headers: Dict[str, str], timeout: Optional[Tuple[float, float]] = None
+    ) -> Tuple[int, Dict[str, Any]]:
+        if method not in ('GET', 'POST', 'PATCH', 'DELETE'):
+            raise ValueError('Invalid method')
+        body = dumps(data) if method in ('POST', 'PATCH') and data is not None else None
+
+        try:
+            response = self._get_transport().send(
+                method, url, headers, data=body, timeout=timeout or (self.connect_timeout, self.read_timeout)
+            )
             response.raise_for_status()
-            response_json = response.json()
-            return response_json
+            if method == 'DELETE':
+                return response.status_code, {'deleted': True}
+            return response.status_code, loads(response.content)
         except requests.HTTPError as e:
             raise PaypalAPIError(str(e), response=e.response)
 
-    def setup_webhooks(self, webhook_listener: str) -> PaypalWebhook:
+    def setup_webhooks(self, webhook_listener: str, event_types: Optional[Iterable[str]] = None) -> PaypalWebhook:
+        """
+        Register `webhook_listener` for `event_types`, by default WebhookEvents.ORDERS.
+        Pass WebhookEvents.ALL to also receive the PAYMENT.CAPTURE.* events.
+        """
         if PaypalWebhook.objects.filter(url=webhook_listener, auth_hash=self.api_auth_hash).exists():
             raise ValueError(f'Webhook listener ({webhook_listener}) already exists')
         from django_paypal.webhooks import WebhookEvents
 
-        data = {'url': webhook_listener, 'event_types': [{'name': event} for event in WebhookEvents.ORDERS]}
+        if event_types is None:
+            event_types = WebhookEvents.ORDERS
+        data = {'url': webhook_listener, 'event_types': [{'name': event} for event in event_types]}
         webhook_api = '{0}{1}'.format(self.api_url, '/v1/notifications/webhooks')
         try:
-            response_dict = self.call_api(url=webhook_api, method='POST', data=data)
+            response_dict = self.call_api(url=webhook_api, method='POST', data=data, operation=PaypalAPIOperation.WEBHOOK_SETUP)
             return PaypalWebhook.objects.create(
                 webhook_id=response_dict['id'],
                 auth_hash=self.api_auth_hash,
@@ -166,14 +615,17 @@ class PaypalWrapper(object):
                 event_types=response_dict['event_types'],
             )
         except PaypalAPIError as e:
-            if e.response:
+            if e.response is not None:
                 response_json = e.response.json()
                 if response_json.get('name') == 'WEBHOOK_URL_ALREADY_EXISTS':
-                    webhook_list = self.call_api(url=webhook_api, method='GET')
+                    webhook_list = self.call_api(url=webhook_api, method='GET', operation=PaypalAPIOperation.WEBHOOK_LIST)
                     for webhook in webhook_list.get('webhooks', []):
                         if webhook['url'] == webhook_listener:
                             return PaypalWebhook.objects.create(
-                                webhook_id=webhook['id'], url=webhook['url'], event_types=webhook['event_types'], auth_hash=self.api_auth_hash
+                                webhook_id=webhook['id'],
+                                url=webhook['url'],
+                                event_types=webhook['event_types'],
+                                auth_hash=self.api_auth_hash,
                             )
             raise e
 
@@ -184,7 +636,7 @@ class PaypalWrapper(object):
             warnings.warn(f'Webhook with id {webhook_id} does not exist in the database. Set up webhooks by calling "setup_webhooks"')
             raise e
         url = '{0}{1}'.format(self.api_url, f'/v1/notifications/webhooks/{paypal_webhook.webhook_id}')
-        webhook_response_dict = self.call_api(url=url, method='PATCH', data=patch_data)
+        webhook_response_dict = self.call_api(url=url, method='PATCH', data=patch_data, operation=PaypalAPIOperation.WEBHOOK_UPDATE)
         paypal_webhook.url = webhook_response_dict['url']
         paypal_webhook.event_types = webhook_response_dict['event_types']
         paypal_webhook.save()
@@ -196,29 +648,23 @@ class PaypalWrapper(object):
         except PaypalWebhook.DoesNotExist as e:
             raise e
         url = '{0}{1}'.format(self.api_url, f'/v1/notifications/webhooks/{paypal_webhook.webhook_id}')
-        self.call_api(url=url, method='DELETE')
+        self.call_api(url=url, method='DELETE', operation=PaypalAPIOperation.WEBHOOK_DELETE)
         paypal_webhook.delete()
         return True
 
     def verify_webhook_event(self, request: HttpRequest, webhook_id: str) -> bool:
-        headers = request.headers
-        auth_algo = headers.get('Paypal-Auth-Algo')
-        cert_url = headers.get('Paypal-Cert-Url')
-        transmission_id = headers.get('Paypal-Transmission-Id')
-        transmission_time = headers.get('Paypal-Transmission-Time')
-        transmission_sig = headers.get('Paypal-Transmission-Sig')
-        request_data = json.loads(request.body.decode('utf-8'))
-        verification_payload = {
-            'auth_algo': auth_algo,
-            'cert_url': cert_url,
-            'transmission_id': transmission_id,
-            'transmission_time': transmission_time,
-            'transmission_sig': transmission_sig,
-            'webhook_id': webhook_id,
-            'webhook_event': request_data,
-        }
+        return self.verify_webhook_delivery(request.headers, request.body, webhook_id)
+
+    def verify_webhook_delivery(self, headers: Mapping[str, str], body: Union[bytes, str], webhook_id: str) -> bool:
+        """
+        Verify a webhook delivery from its headers and raw body, e.g. one stored as PaypalWebhookDelivery.
+        The signature is checked locally against PayPal's certificate first, the verify-webhook-signature API is only called if that fails.
+        """
+        if verify_webhook_signature(headers, body, webhook_id):
+            return True
+        verification_payload = self._build_webhook_verification_payload(headers, body, webhook_id)
         url = f'{self.api_url}/v1/notifications/verify-webhook-signature'
-        res = self.call_api(url=url, method='POST', data=verification_payload)
+        res = self.call_api(url=url, method='POST', data=verification_payload, operation=PaypalAPIOperation.WEBHOOK_VERIFY)
         if res.get('verification_status') == 'SUCCESS':
             return True
         raise PaypalWebhookVerificationError('Webhook verification failed', res)
@@ -227,40 +673,129 @@ class PaypalWrapper(object):
         self._get_access_token()
         return True
 
-    def _get_access_token(self) -> str:
+    def _get_access_token(self, deadline: Optional[float] = None) -> str:
         if not self.auth_cache_timeout:
-            auth_response = self._authorize_client()
+            auth_response = self._authorize_client(deadline)
             return auth_response.access_token
         else:
             cache_key = self.auth_cache_key.format(auth_hash=self.api_auth_hash)
-            access_token = cache.get(cache_key)
-            if not access_token:
-                auth_response = self._authorize_client()
-                access_token = auth_response.access_token
-                cache.set(cache_key, access_token, self.auth_cache_timeout)
+            access_token, expires_at = local_token_cache.get(self.api_auth_hash)
+            if access_token:
+                get_metrics().increment(ACCESS_TOKEN_CACHE, {'result': 'local'})
+            else:
+                access_token, expires_at = read_cache_entry(cache.get(cache_key))
+                if not access_token:
+                    get_metrics().increment(ACCESS_TOKEN_CACHE, {'result': 'miss'})
+                    return self._refresh_access_token(cache_key, deadline)
+                get_metrics().increment(ACCESS_TOKEN_CACHE, {'result': 'shared'})
+                local_token_cache.set(self.api_auth_hash, access_token, expires_at)
+            if needs_renewal(expires_at, self.auth_refresh_margin):
+                self._renew_access_token_in_background(cache_key)
+            return access_token
+
+    def _refresh_access_token(self, cache_key: str, deadline: Optional[float] = None) -> str:
+        # single-flight: only one thread per process mints a token, all others wait for it and read it from the cache
+        lock = get_token_lock(cache_key)
+        if not lock.acquire(timeout=-1 if deadline is None else max(deadline - time.monotonic(), 0)):
+            raise PaypalDeadlineExceeded('Deadline exceeded waiting for the PayPal access token')
+        try:
+            access_token, expires_at = read_cache_entry(cache.get(cache_key))
+            if access_token:
+                local_token_cache.set(self.api_auth_hash, access_token, expires_at)
+                return access_token
+            return self._mint_access_token(cache_key, deadline=deadline)
+        finally:
+            lock.release()
+
+    def _renew_access_token_in_background(self, cache_key: str):
+        lock = get_token_lock(cache_key)
+        if not lock.acquire(blocking=False):
+            return  # a refresh is already in flight in this process
+
+        def renew():
+            try:
+                access_token, expires_at = read_cache_entry(cache.get(cache_key))
+                if access_token and not needs_renewal(expires_at, self.auth_refresh_margin):
+                    local_token_cache.set(self.api_auth_hash, access_token, expires_at)  # renewed by another process
+                else:
+                    self._mint_access_token(cache_key, renewal=True)
+            except Exception:
+                logger.exception('Renewing the PayPal access token failed')
+            finally:
+                lock.release()
+
+        threading.Thread(target=renew, name='django-paypal-token-renewal', daemon=True).start()
+
+    def _mint_access_token(self, cache_key: str, renewal: bool = False, deadline: Optional[float] = None) -> str:
+        if not self.auth_distributed_lock:
+            return self._store_access_token(cache_key, self._authorize_client(deadline))
+
+        lock_key = self.auth_lock_key.format(auth_hash=self.api_auth_hash)
+        if cache.add(lock_key, 1, self.auth_lock_timeout):
+            try:
+                return self._store_access_token(cache_key, self._authorize_client(deadline))
+            finally:
+                cache.delete(lock_key)
+
+        # another process is minting a token right now
+        access_token, _expires_at = read_cache_entry(cache.get(cache_key))
+        if renewal and access_token:
             return access_token
+        wait_until = time.monotonic() + self.auth_lock_timeout
+        if deadline is not None:
+            wait_until = min(wait_until, deadline)
+        while time.monotonic() < wait_until:
+            time.sleep(0.05)
+            access_token, _expires_at = read_cache_entry(cache.get(cache_key))
+            if access_token:
+                return access_token
+        return self._store_access_token(cache_key, self._authorize_client(deadline))
+
+    def _store_access_token(self, cache_key: str, auth_response: OAuthResponse) -> str:
+        cache_entry, timeout = build_cache_entry(auth_response, self.auth_cache_timeout)
+        cache.set(cache_key, cache_entry, timeout)
+        local_token_cache.set(self.api_auth_hash, cache_entry['access_token'], cache_entry['expires_at'])
+        return auth_response.access_token
+
+    def _invalidate_access_token(self, access_token: str):
+        local_token_cache.delete(self.api_auth_hash, access_token)
+        if self.auth_cache_timeout:
+            cache_key = self.auth_cache_key.format(auth_hash=self.api_auth_hash)
+            cached_token, _expires_at = read_cache_entry(cache.get(cache_key))
+            if cached_token == access_token:
+                cache.delete(cache_key)
 
-    def _authorize_client(self) -> OAuthResponse:
+    def _authorize_client(self, deadline: Optional[float] = None) -> OAuthResponse:
         if not self.auth:
             raise ValueError('Auth credentials not set')
-        
+
         # preparing request
         url = f'{self.api_url}{self.auth_url}'
 
         api_auth = HTTPBasicAuth(self.auth.client_id, self.auth.client_secret)
         headers = {'Accept': 'application/json', 'Content-Type': 'application/x-www-form-urlencoded'}
         data = {'grant_type': 'client_credentials'}
+        rate_limiter = get_rate_limiter(ENDPOINT_OAUTH, self.api_auth_hash)
+        if rate_limiter:
+            rate_limiter.acquire(PRIORITY_HIGH, deadline)
+        timeout = self._get_timeout(PaypalAPIOperation.OAUTH, deadline)
+
+        breaker = get_circuit_breaker(ENDPOINT_OAUTH)
+        if breaker:
+            breaker.before_call()
+        start = time.monotonic()
 
         try:
-            response = requests.post(url, headers=headers, data=data, auth=api_auth)
+            response = self._get_transport().send('POST', url, headers, data=data, auth=api_auth, timeout=timeout)
             response.raise_for_status()  # Raise an exception for HTTP errors
-            response_json = response.json()
-            return OAuthResponse(**response_json)
         except requests.HTTPError as e:
+            self._record_call_result(breaker, time.monotonic() - start, e, endpoint=ENDPOINT_OAUTH, operation=PaypalAPIOperation.OAUTH)
             raise PaypalAuthFailure(str(e), response=e.response)
-
-    @property
-    def api_auth_hash(self) -> str:
-        if not self.auth:
-            raise ValueError('Auth credentials not set')
-        return hashlib.md5(f'{self.auth.client_id}{self.auth.client_secret}'.encode()).hexdigest()
+        except (requests.ConnectionError, requests.Timeout) as e:
+            self._record_call_result(breaker, time.monotonic() - start, e, endpoint=ENDPOINT_OAUTH, operation=PaypalAPIOperation.OAUTH)
+            raise e
+        self._record_call_result(
+            breaker, time.monotonic() - start, endpoint=ENDPOINT_OAUTH, operation=PaypalAPIOperation.OAUTH, status_code=response.status_code
+        )
+        response_json = response.json()
+        return OAuthResponse(**response_json)
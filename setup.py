@@ -51,6 +51,15 @@ REQUIREMENTS = [
     "dataclass-wizard>=0.2.2",
 ]
 
+EXTRAS_REQUIREMENTS = {
+    # AsyncPaypalWrapper also requires Django>=4.2 (async ORM and cache)
+    "async": ["httpx>=0.23.0"],
+    "zstd": ["zstandard"],
+    "webhooks": ["cryptography"],
+    "orjson": ["orjson"],
+    "prometheus": ["prometheus-client"],
+}
+
 version = get_version("django_paypal")
 
 if sys.argv[-1] == "publish":
@@ -85,5 +94,6 @@ setup(
         "Topic :: Software Development :: Libraries :: Python Modules",
     ],
     install_requires=REQUIREMENTS,
+    extras_require=EXTRAS_REQUIREMENTS,
     zip_safe=False,
 )